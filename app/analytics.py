@@ -0,0 +1,322 @@
+"""
+Columnar statistics of the dataset for the `/api/v1/stats/` endpoints.
+
+The store is built after each import by `load_datasets`, or by the `build_stats`
+command, and served from memory-mapped NumPy files. A request only sums rows of
+small dense matrices, instead of running a GROUP BY over the Rating table.
+
+Building:
+    The ratings are read once as (movie, rate, year) columns and reduced per movie
+    with `np.bincount` into matrices whose rows follow `movie_ids`:
+        bin_counts: (movies, RATE_BINS) ratings per half-point bin, `round(rate * 2)`.
+        year_counts, year_sums: (movies, years) count and sum of the ratings given
+            in each year of `years`.
+    An incremental build only reads the ratings of the changed movies, and copies
+    the rows of the other movies from the previous store.
+
+Files, in `ANALYTICS_STORE_DIR`:
+    store.json: build time and the version of the array files.
+    movie_ids, movie_years, movie_genre_masks: the movie columns, sorted by ID.
+    bin_counts, years, year_counts, year_sums: the rating reductions.
+    tag_names, tag_ids, tag_movies: the movie tag links. `tag_ids` index
+        `tag_names`, `tag_movies` index `movie_ids`.
+"""
+
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+from app.models import GENRE_BITS, GENRES, Movie, MovieTag, Rating, Tag
+from app.utils.arrays import ColumnBuffer, load_arrays, save_arrays
+from app.utils.database import is_postgresql
+
+ARRAYS = [
+    "movie_ids",
+    "movie_years",
+    "movie_genre_masks",
+    "bin_counts",
+    "years",
+    "year_counts",
+    "year_sums",
+    "tag_names",
+    "tag_ids",
+    "tag_movies",
+]
+# Half-point bins of the rates, from 0 to 10.
+RATE_BINS = 21
+FETCH_SIZE = 100_000
+# Movie IDs per `IN` list of an incremental build.
+IN_BATCH_SIZE = 500
+
+
+@dataclass
+class StatsStore:
+    movie_ids: np.ndarray
+    movie_years: np.ndarray
+    movie_genre_masks: np.ndarray
+    bin_counts: np.ndarray
+    years: np.ndarray
+    year_counts: np.ndarray
+    year_sums: np.ndarray
+    tag_names: np.ndarray
+    tag_ids: np.ndarray
+    tag_movies: np.ndarray
+    built_at: float
+
+    def rows(self, movie_ids):
+        """
+        Rows of the given movie IDs, -1 for the movies that are not in the store.
+        """
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        if len(self.movie_ids) == 0:
+            return np.full(len(movie_ids), -1)
+        rows = np.searchsorted(self.movie_ids, movie_ids)
+        rows = np.minimum(rows, len(self.movie_ids) - 1)
+        return np.where(self.movie_ids[rows] == movie_ids, rows, -1)
+
+    def genre_rows(self, genre=None):
+        """
+        Mask of the movies of `genre`, a GENRE_BITS key, or of every movie.
+        """
+        if genre is None:
+            return np.ones(len(self.movie_ids), dtype=bool)
+        return (self.movie_genre_masks & GENRE_BITS[genre.lower()]) != 0
+
+    def histogram(self, movie_id):
+        """
+        (rate, count) pairs of the ratings of a movie, None when it is not stored.
+        """
+        row = self.rows([movie_id])[0]
+        if row < 0:
+            return None
+        counts = self.bin_counts[row]
+        found = np.flatnonzero(counts)
+        return list(zip((found / 2).tolist(), counts[found].tolist()))
+
+    def ratings_per_year(self, genre=None):
+        """
+        (year, count, mean rate) of the ratings given each year.
+        """
+        rows = self.genre_rows(genre)
+        counts = self.year_counts[rows].sum(axis=0)
+        sums = self.year_sums[rows].sum(axis=0)
+        found = np.flatnonzero(counts)
+        return list(
+            zip(
+                self.years[found].tolist(),
+                counts[found].tolist(),
+                (sums[found] / counts[found]).tolist(),
+            )
+        )
+
+    def genre_popularity(self, year_min=None, year_max=None):
+        """
+        {genre: [(year, count)]} of the ratings given to the movies of each genre.
+        """
+        columns = np.ones(len(self.years), dtype=bool)
+        if year_min is not None:
+            columns &= self.years >= year_min
+        if year_max is not None:
+            columns &= self.years <= year_max
+
+        bits = np.array([GENRE_BITS[genre.lower()] for genre in GENRES])
+        members = (self.movie_genre_masks[None, :] & bits[:, None]) != 0
+        counts = members.astype(np.int64) @ self.year_counts[:, columns]
+        years = self.years[columns].tolist()
+        return {
+            genre: [(year, count) for year, count in zip(years, row) if count]
+            for genre, row in zip(GENRES, counts.tolist())
+            if any(row)
+        }
+
+    def top_tags(self, limit=20, genre=None):
+        """
+        (tag, movies) pairs of the tags set on the most movies.
+        """
+        links = self.genre_rows(genre)[self.tag_movies]
+        counts = np.bincount(self.tag_ids[links], minlength=len(self.tag_names))
+
+        limit = min(limit, int((counts > 0).sum()))
+        if not limit:
+            return []
+        best = np.argpartition(-counts, limit - 1)[:limit]
+        best = best[np.lexsort((self.tag_names[best], -counts[best]))]
+        return list(zip(self.tag_names[best].tolist(), counts[best].tolist()))
+
+
+def get_store_dir():
+    return Path(settings.ANALYTICS_STORE_DIR)
+
+
+def year_sql(column):
+    if is_postgresql(connection):
+        return f"CAST(EXTRACT(YEAR FROM {column}) AS INTEGER)"
+    return f"CAST(strftime('%%Y', {column}) AS INTEGER)"
+
+
+def read_rating_columns(movie_ids=None):
+    """
+    (movie IDs, rates, years) arrays of the ratings of every movie or of
+    `movie_ids`, fetched in batches into typed columns. The year is extracted by
+    the database.
+    """
+    sql = f"SELECT movie_id, rate, {year_sql('timestamp')} FROM {Rating._meta.db_table}"
+    if movie_ids is None:
+        queries = [(sql, [])]
+        # Read in one query, so the full table is counted for the columns.
+        size = Rating.objects.count()
+    else:
+        queries = [
+            (
+                f"{sql} WHERE movie_id IN ({', '.join(['%s'] * len(batch))})",
+                batch,
+            )
+            for batch in (
+                movie_ids[start : start + IN_BATCH_SIZE]
+                for start in range(0, len(movie_ids), IN_BATCH_SIZE)
+            )
+        ]
+        size = 0
+
+    buffer = ColumnBuffer([np.int32, np.float32, np.int32], size)
+    with connection.cursor() as cursor:
+        for query, params in queries:
+            cursor.execute(query, params)
+            buffer.fetch(cursor, FETCH_SIZE)
+    return buffer.arrays()
+
+
+def reduce_ratings(movie_ids, years, rating_movies, rates, rating_years):
+    """
+    The bin_counts, year_counts and year_sums rows of `movie_ids` over `years`.
+    Every rating year must be in `years`.
+    """
+    rows = np.searchsorted(movie_ids, rating_movies)
+    found = rows < len(movie_ids)
+    found[found] = movie_ids[rows[found]] == rating_movies[found]
+    rows, rates, rating_years = rows[found], rates[found], rating_years[found]
+
+    movies = len(movie_ids)
+    bins = np.clip(np.rint(rates * 2), 0, RATE_BINS - 1).astype(np.int64)
+    cells = rows * len(years) + np.searchsorted(years, rating_years)
+    return (
+        np.bincount(rows * RATE_BINS + bins, minlength=movies * RATE_BINS)
+        .reshape(movies, RATE_BINS)
+        .astype(np.int32),
+        np.bincount(cells, minlength=movies * len(years))
+        .reshape(movies, len(years))
+        .astype(np.int32),
+        np.bincount(cells, weights=rates, minlength=movies * len(years)).reshape(
+            movies, len(years)
+        ),
+    )
+
+
+def read_tags(movie_ids):
+    """
+    The tag_names, tag_ids and tag_movies arrays of the movie tag links.
+    """
+    tags = list(Tag.objects.order_by("id").values_list("id", "name"))
+    tag_pks = np.array([pk for pk, _ in tags], dtype=np.int64)
+    tag_names = np.array([name for _, name in tags], dtype=str)
+
+    links = np.array(
+        MovieTag.objects.values_list("tag_id", "movie_id"), dtype=np.int64
+    ).reshape(-1, 2)
+    links = links[np.isin(links[:, 1], movie_ids)]
+    return (
+        tag_names,
+        np.searchsorted(tag_pks, links[:, 0]),
+        np.searchsorted(movie_ids, links[:, 1]),
+    )
+
+
+def build_store(previous=None, changed=None):
+    """
+    The StatsStore of the database. With a `previous` store and the `changed` movie
+    IDs, only the ratings of those movies and of the new movies are read.
+    """
+    movies = np.array(
+        Movie.objects.order_by("id").values_list("id", "year", "genre_mask"),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    movie_ids = movies[:, 0]
+
+    incremental = previous is not None and changed is not None
+    if incremental:
+        previous_rows = previous.rows(movie_ids)
+        read = np.union1d(
+            np.asarray(list(changed), dtype=np.int64), movie_ids[previous_rows < 0]
+        )
+        read = np.intersect1d(read, movie_ids)
+        rating_movies, rates, rating_years = read_rating_columns(read.tolist())
+        years = np.union1d(rating_years, previous.years)
+    else:
+        rating_movies, rates, rating_years = read_rating_columns()
+        years = np.unique(rating_years)
+
+    bin_counts, year_counts, year_sums = reduce_ratings(
+        movie_ids, years, rating_movies, rates, rating_years
+    )
+    if incremental:
+        kept = np.flatnonzero((previous_rows >= 0) & ~np.isin(movie_ids, read))
+        source = previous_rows[kept]
+        columns = np.searchsorted(years, previous.years)
+        bin_counts[kept] = previous.bin_counts[source]
+        year_counts[np.ix_(kept, columns)] = previous.year_counts[source]
+        year_sums[np.ix_(kept, columns)] = previous.year_sums[source]
+
+    tag_names, tag_ids, tag_movies = read_tags(movie_ids)
+    return StatsStore(
+        movie_ids=movie_ids,
+        movie_years=movies[:, 1].astype(np.int16),
+        movie_genre_masks=movies[:, 2].astype(np.int32),
+        bin_counts=bin_counts,
+        years=years.astype(np.int16),
+        year_counts=year_counts,
+        year_sums=year_sums,
+        tag_names=tag_names,
+        tag_ids=tag_ids,
+        tag_movies=tag_movies,
+        built_at=time.time(),
+    )
+
+
+def save_store(store, store_dir=None):
+    """
+    Write the store arrays under a new version and switch store.json to it.
+    """
+    save_arrays(
+        store_dir or get_store_dir(),
+        "store.json",
+        {name: getattr(store, name) for name in ARRAYS},
+        {"built_at": store.built_at, "movies": len(store.movie_ids)},
+    )
+
+
+def load_store(store_dir=None):
+    """
+    The memory-mapped store of `store_dir`, or None when none was built.
+
+    The store is kept per process and reloaded when store.json changes.
+    """
+
+    def make_store(meta, arrays):
+        return StatsStore(**arrays, built_at=meta["built_at"])
+
+    return load_arrays(store_dir or get_store_dir(), "store.json", ARRAYS, make_store)
+
+
+def refresh_store(changed=None):
+    """
+    Rebuild and save the store after an import. When a store exists, only the rows
+    of the `changed` movie IDs are recomputed.
+    """
+    previous = load_store() if changed is not None else None
+    store = build_store(previous, changed if previous is not None else None)
+    save_store(store)
+    return store
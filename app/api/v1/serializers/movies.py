@@ -1,11 +1,97 @@
+from operator import attrgetter
+
+from django.db.models import FloatField, OuterRef, QuerySet, Subquery, Value
+from django.db.models.manager import BaseManager
 from rest_framework import serializers
 
-from app.models import Movie, Rating
+from app.metrics import TimedDataMixin
+from app.models import IMDB_URL, TMDB_URL, Movie, Rating
+
+# Columns always read with `fields`, they are the keys of the cursor pagination.
+KEYSET_COLUMNS = ["id", "title", "year", "rate"]
+
+
+def optional_float(value):
+    return None if value is None else float(value)
+
+
+def url_formatter(template):
+    format_url = template.format
+
+    def url(value):
+        return format_url(value) if value else None
+
+    return url
+
+
+class MovieListSerializer(TimedDataMixin, serializers.ListSerializer):
+    """
+    Serializes many movies to the output of the child serializer, without its field
+    by field pass. Querysets are read as `.values_list()` tuples of the columns the
+    fields need, other movies through their attributes.
+    """
+
+    # The column of the fields that are computed from another one.
+    sources = {"imdb_url": "imdb_id", "tmdb_url": "tmdb_id"}
+    converters = {
+        "rate": optional_float,
+        "score": optional_float,
+        "my_rating": optional_float,
+        "imdb_url": url_formatter(IMDB_URL),
+        "tmdb_url": url_formatter(TMDB_URL),
+    }
+
+    def to_representation(self, data):
+        fields = list(self.child.fields)
+        return [dict(zip(fields, row)) for row in self.iter_rows(data)]
+
+    def iter_rows(self, data, chunk_size=None):
+        """
+        The values of the fields of each movie, in the order of `child.fields`. With
+        a `chunk_size`, a queryset is streamed from the database in batches of that
+        many rows instead of being read at once.
+        """
+        fields = list(self.child.fields)
+        columns = [self.sources.get(field, field) for field in fields]
+        if isinstance(data, BaseManager):
+            data = data.all()
+        if isinstance(data, QuerySet):
+            rows = data.values_list(*columns)
+            if chunk_size is not None:
+                rows = rows.iterator(chunk_size=chunk_size)
+        else:
+            get_row = attrgetter(*columns)
+            if len(columns) == 1:
+                # attrgetter of one name returns the bare value.
+                rows = ((get_row(movie),) for movie in data)
+            else:
+                rows = (get_row(movie) for movie in data)
+
+        converters = [
+            (index, self.converters[field])
+            for index, field in enumerate(fields)
+            if field in self.converters
+        ]
+        for row in rows:
+            row = list(row)
+            for index, convert in converters:
+                row[index] = convert(row[index])
+            yield row
+
 
+class MovieSerializer(TimedDataMixin, serializers.ModelSerializer):
+    """
+    Serializes the `fields` of a movie, by default every field but the optional
+    ones, which are only sent when asked for:
+        rating_count: the number of ratings of the movie.
+        my_rating: the rate given by the user, annotated by `select_movie_fields`.
+    """
+
+    my_rating = serializers.FloatField(read_only=True, allow_null=True)
 
-class MovieSerializer(serializers.ModelSerializer):
     class Meta:
         model = Movie
+        list_serializer_class = MovieListSerializer
         fields = [
             "id",
             "title",
@@ -15,7 +101,56 @@ class MovieSerializer(serializers.ModelSerializer):
             "tags",
             "imdb_url",
             "tmdb_url",
+            "rating_count",
+            "my_rating",
         ]
+        optional_fields = ["rating_count", "my_rating"]
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            fields = [
+                field for field in self.fields if field not in self.Meta.optional_fields
+            ]
+        for field in set(self.fields) - set(fields):
+            self.fields.pop(field)
+
+
+def parse_movie_fields(value, serializer_class=MovieSerializer):
+    """
+    The field names of a comma separated `fields` parameter, None when it is empty.
+    """
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = sorted(set(fields) - set(serializer_class.Meta.fields))
+    if unknown:
+        raise serializers.ValidationError(
+            {"fields": [f"Unknown fields: {', '.join(unknown)}."]}
+        )
+    return fields
+
+
+def select_movie_fields(queryset, fields, user=None):
+    """
+    `queryset` reading only the columns of `fields`, or of the default fields, with
+    the rate of `user` annotated as `my_rating` when it is asked for. The rate is
+    read by a subquery of the same query, it is null for anonymous users.
+    """
+    if fields is not None:
+        sources = MovieListSerializer.sources
+        columns = {sources.get(field, field) for field in fields}
+        concrete = {field.name for field in Movie._meta.concrete_fields}
+        queryset = queryset.only(*KEYSET_COLUMNS, *(columns & concrete))
+
+    if fields is not None and "my_rating" in fields:
+        if user is not None and user.is_authenticated:
+            rates = Rating.objects.filter(movie=OuterRef("pk"), user=user)
+            my_rating = Subquery(rates.values("rate")[:1])
+        else:
+            my_rating = Value(None, output_field=FloatField())
+        queryset = queryset.annotate(my_rating=my_rating)
+    return queryset
 
 
 class MovieCreateSerializer(serializers.ModelSerializer):
@@ -29,7 +164,20 @@ class RateSerializer(serializers.Serializer):
     rate = serializers.FloatField(min_value=1, max_value=10)
 
 
-class RatingSerializer(serializers.ModelSerializer):
+class BulkRatingSerializer(serializers.Serializer):
+    movie = serializers.IntegerField()
+    rate = serializers.FloatField(min_value=1, max_value=10)
+
+
+class TopMoviesQuerySerializer(serializers.Serializer):
+    genre = serializers.CharField(required=False)
+    year = serializers.IntegerField(required=False, min_value=0)
+    year_min = serializers.IntegerField(required=False, min_value=0)
+    year_max = serializers.IntegerField(required=False, min_value=0)
+    min_count = serializers.IntegerField(required=False, min_value=0, default=1)
+
+
+class RatingSerializer(TimedDataMixin, serializers.ModelSerializer):
     class Meta:
         model = Rating
         fields = ["user", "movie", "rate", "timestamp"]
@@ -0,0 +1,10 @@
+from rest_framework import serializers
+
+from app.api.v1.serializers.movies import MovieSerializer
+
+
+class ScoredMovieSerializer(MovieSerializer):
+    score = serializers.FloatField(read_only=True)
+
+    class Meta(MovieSerializer.Meta):
+        fields = MovieSerializer.Meta.fields + ["score"]
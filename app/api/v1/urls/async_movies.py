@@ -0,0 +1,9 @@
+from django.urls import path
+
+from app.api.v1.views.async_movies import movie_detail, movie_list, movie_search
+
+urlpatterns = [
+    path("", movie_list, name="async-movie-list"),
+    path("search/", movie_search, name="async-movie-search"),
+    path("<int:pk>/", movie_detail, name="async-movie-detail"),
+]
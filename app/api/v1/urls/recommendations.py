@@ -0,0 +1,7 @@
+from django.urls import path
+
+from app.api.v1.views.recommendations import recommendations
+
+urlpatterns = [
+    path("", recommendations, name="recommendations"),
+]
@@ -0,0 +1,21 @@
+from django.urls import path
+
+from app.api.v1.views.stats import (
+    genre_popularity,
+    movie_histogram,
+    ratings_per_year,
+    summary,
+    tag_frequency,
+)
+
+urlpatterns = [
+    path("", summary, name="stats"),
+    path(
+        "movies/<int:movie_id>/histogram/",
+        movie_histogram,
+        name="stats-movie-histogram",
+    ),
+    path("ratings-per-year/", ratings_per_year, name="stats-ratings-per-year"),
+    path("genres/", genre_popularity, name="stats-genres"),
+    path("tags/", tag_frequency, name="stats-tags"),
+]
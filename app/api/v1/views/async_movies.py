@@ -0,0 +1,171 @@
+"""
+Native async read views of the movies, for the ASGI server.
+
+They serve the same data as the `list` and `retrieve` actions of MovieViewSet,
+which keeps every write, through the async ORM. Under ASGI the queries of each
+request run in a thread of its own instead of a fixed pool of worker threads, so one
+worker serves many reads at once while they wait on the database or the cache.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage, Paginator
+from django_filters.utils import translate_validation
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from app.api.v1.serializers.movies import (
+    MovieSerializer,
+    parse_movie_fields,
+    select_movie_fields,
+)
+from app.cache import LIST_VERSION_KEY, MOVIE_VERSION_KEY, acached_response
+from app.filters import MovieFilter
+from app.models import Movie
+from app.paginations import MoviesPagination, cached_count
+from app.renderers import render_json
+from app.search import get_search_backend
+
+ORDERING_FIELDS = ["title", "year", "rate"]
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    """
+    The JSON response of `data`, rendered like the responses of the sync API.
+    """
+    return HttpResponse(
+        render_json(data), content_type="application/json", status=status
+    )
+
+
+def get_ordering(request):
+    """
+    The valid fields of the `ordering` parameter, `title` by default.
+    """
+    fields = [
+        field
+        for field in request.GET.get("ordering", "").split(",")
+        if field.strip().lstrip("-") in ORDERING_FIELDS
+    ]
+    return [field.strip() for field in fields] or ["title"]
+
+
+def get_page_size(request):
+    try:
+        page_size = int(request.GET[MoviesPagination.page_size_query_param])
+    except (KeyError, ValueError):
+        return MoviesPagination.page_size
+    return min(max(page_size, 1), MoviesPagination.max_page_size)
+
+
+def bad_request_response(exc):
+    return json_response(exc.detail, status=status.HTTP_400_BAD_REQUEST)
+
+
+def filter_movies(request, fields):
+    """
+    The movies matching the `genre`, `tag`, `search` and `q` parameters, ordered
+    like MovieViewSet, reading the columns of `fields`. The queryset is lazy,
+    nothing is read here. Raises ValidationError on invalid filter values, like the
+    filter backend of MovieViewSet.
+    """
+    queryset = select_movie_fields(Movie.objects.all(), fields)
+    if any(name in request.GET for name in MovieFilter.base_filters):
+        filterset = MovieFilter(request.GET, queryset)
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        queryset = filterset.qs
+    if title := request.GET.get("search", "").strip():
+        queryset = queryset.filter(title__icontains=title)
+    if query := request.GET.get("q", "").strip():
+        return get_search_backend().search(queryset, query)
+    return queryset.order_by(*get_ordering(request))
+
+
+async def movies_response(request):
+    """
+    The page of the filtered movies asked for by `page` and `page_size`, in the
+    format of MoviesPagination. The count goes through the count cache.
+    """
+    try:
+        fields = parse_movie_fields(request.GET.get("fields"))
+        queryset = filter_movies(request, fields)
+    except ValidationError as exc:
+        return bad_request_response(exc)
+
+    page_size = get_page_size(request)
+    count = await sync_to_async(cached_count)(queryset)
+    paginator = Paginator(range(count), page_size)
+    try:
+        page = paginator.page(request.GET.get("page", 1))
+    except InvalidPage:
+        return json_response(
+            {"detail": "Invalid page."}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    movies = []
+    if count:
+        start = (page.number - 1) * page_size
+        rows = queryset[start : start + page_size]
+        movies = [movie async for movie in rows.aiterator()]
+
+    url = request.build_absolute_uri()
+    next_url = previous_url = None
+    if page.has_next():
+        next_url = replace_query_param(url, "page", page.next_page_number())
+    if page.has_previous():
+        previous_url = (
+            replace_query_param(url, "page", page.previous_page_number())
+            if page.previous_page_number() > 1
+            else remove_query_param(url, "page")
+        )
+    return json_response(
+        {
+            "count": count,
+            "next": next_url,
+            "previous": previous_url,
+            "results": MovieSerializer(movies, many=True, fields=fields).data,
+        }
+    )
+
+
+@require_GET
+async def movie_list(request):
+    return await acached_response(
+        request, "async-list", [LIST_VERSION_KEY], movies_response
+    )
+
+
+@require_GET
+async def movie_detail(request, pk):
+    async def view(request):
+        try:
+            fields = parse_movie_fields(request.GET.get("fields"))
+        except ValidationError as exc:
+            return bad_request_response(exc)
+        try:
+            movie = await select_movie_fields(Movie.objects.all(), fields).aget(pk=pk)
+        except Movie.DoesNotExist:
+            return json_response(
+                {"detail": "No Movie matches the given query."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return json_response(MovieSerializer(movie, fields=fields).data)
+
+    version_key = MOVIE_VERSION_KEY.format(pk)
+    return await acached_response(request, version_key, [version_key], view)
+
+
+@require_GET
+async def movie_search(request):
+    async def view(request):
+        if not request.GET.get("q", "").strip():
+            return json_response(
+                {"q": ["This field is required."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return await movies_response(request)
+
+    return await acached_response(request, "async-search", [LIST_VERSION_KEY], view)
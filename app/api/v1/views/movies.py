@@ -1,46 +1,187 @@
+import re
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
 from django.db import IntegrityError
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.utils.text import compress_sequence
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.filters import SearchFilter
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter, SearchFilter
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from app.api.v1.serializers.movies import (
+    BulkRatingSerializer,
     MovieSerializer,
     MovieCreateSerializer,
     RateSerializer,
     RatingSerializer,
+    TopMoviesQuerySerializer,
+    parse_movie_fields,
+    select_movie_fields,
+)
+from app.api.v1.serializers.recommendations import ScoredMovieSerializer
+from app.api.v1.views.recommendations import (
+    get_limit,
+    limit_parameter,
+    model_missing_response,
+    scored_movies_response,
+)
+from app.autocomplete import get_index
+from app.cache import LIST_VERSION_KEY, MovieCacheMixin, invalidate_movies
+from app.filters import FullTextSearchFilter, MovieFilter
+from app.models import Genre, LeaderboardEntry, Movie, Rating
+from app.paginations import MoviesCursorPagination, MoviesPagination
+from app.recommender import load_model
+from app.renderers import CSVRenderer, NDJSONRenderer
+
+MAX_BULK_RATINGS = 5000
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+# Rows of an export fetched from the database and rendered at once.
+EXPORT_CHUNK_SIZE = 2000
+ACCEPTS_GZIP = re.compile(r"\bgzip\b")
+
+fields_parameter = openapi.Parameter(
+    "fields",
+    openapi.IN_QUERY,
+    description="Comma separated fields to return, the default ones when empty. "
+    "`rating_count` and `my_rating`, the rate of the user, are only returned when "
+    "asked for.",
+    type=openapi.TYPE_STRING,
 )
-from app.models import Movie, Rating
-from app.paginations import MoviesPagination
+top_parameters = [
+    openapi.Parameter(
+        "genre",
+        openapi.IN_QUERY,
+        description="Rank the movies of this genre, all movies by default.",
+        type=openapi.TYPE_STRING,
+    ),
+    openapi.Parameter(
+        "year", openapi.IN_QUERY, description="Release year.", type=openapi.TYPE_INTEGER
+    ),
+    openapi.Parameter(
+        "year_min",
+        openapi.IN_QUERY,
+        description="Earliest release year.",
+        type=openapi.TYPE_INTEGER,
+    ),
+    openapi.Parameter(
+        "year_max",
+        openapi.IN_QUERY,
+        description="Latest release year.",
+        type=openapi.TYPE_INTEGER,
+    ),
+    openapi.Parameter(
+        "min_count",
+        openapi.IN_QUERY,
+        description="Minimum number of ratings, 1 by default.",
+        type=openapi.TYPE_INTEGER,
+    ),
+    limit_parameter,
+]
+export_parameters = [
+    fields_parameter,
+    openapi.Parameter(
+        "format",
+        openapi.IN_QUERY,
+        description="`ndjson`, one JSON object per line, by default, or `csv`. The "
+        "Accept header is honored as well.",
+        type=openapi.TYPE_STRING,
+        enum=["ndjson", "csv"],
+    ),
+]
+autocomplete_parameters = [
+    openapi.Parameter(
+        "q",
+        openapi.IN_QUERY,
+        description="Beginning of a word of the title, accents and case are ignored.",
+        type=openapi.TYPE_STRING,
+        required=True,
+    ),
+    openapi.Parameter(
+        "limit",
+        openapi.IN_QUERY,
+        description=f"Number of titles to return, {AUTOCOMPLETE_LIMIT} by default and "
+        f"at most {MAX_AUTOCOMPLETE_LIMIT}.",
+        type=openapi.TYPE_INTEGER,
+    ),
+]
 
 
-class MovieViewSet(viewsets.ModelViewSet):
+@method_decorator(
+    name="list", decorator=swagger_auto_schema(manual_parameters=[fields_parameter])
+)
+@method_decorator(
+    name="retrieve",
+    decorator=swagger_auto_schema(manual_parameters=[fields_parameter]),
+)
+class MovieViewSet(MovieCacheMixin, viewsets.ModelViewSet):
     """
     ViewSet for handling Movie data.
 
     Supports listing, creating, retrieving, updating, and deleting movies.
-    Allows searching by title and filtering by tags and genres.
+    Allows searching by title, ranked full-text search on title, genres and tags
+    with `q`, filtering by tags and genres, see MovieFilter, and ordering by title,
+    year or rate. Lists are paginated by page number, or by keyset with
+    `pagination=cursor`. `fields` selects the fields of list and retrieve, and
+    only their columns are read. Anonymous list and retrieve responses are cached,
+    see MovieCacheMixin. `similar` lists the nearest movies of the item-item
+    recommendation model, and `top` ranks movies by the Bayesian average of their
+    ratings from the precomputed LeaderboardEntry rows. `autocomplete` completes
+    titles from the in-process prefix index of app.autocomplete. `export` streams
+    every movie matching the list parameters as NDJSON or CSV, without pagination.
     Uses different serializers for listing and creating movies.
     Authentication varies based on action (GET: None, Others: Required).
     """
 
     queryset = Movie.objects.all().order_by("title")
-    filter_backends = [SearchFilter, DjangoFilterBackend]
+    filter_backends = [
+        SearchFilter,
+        FullTextSearchFilter,
+        DjangoFilterBackend,
+        OrderingFilter,
+    ]
     search_fields = ["title"]
-    filterset_fields = ["tags", "genres"]
+    filterset_class = MovieFilter
+    ordering_fields = ["title", "year", "rate"]
     pagination_class = MoviesPagination
 
+    @property
+    def paginator(self):
+        """
+        The page number paginator, or the keyset one when the request opts in.
+        """
+        if not hasattr(self, "_paginator"):
+            request = getattr(self, "request", None)
+            if request is not None and MoviesCursorPagination.is_requested(request):
+                self._paginator = MoviesCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_permissions(self):
         """
         Instantiates and returns the list of permissions that this view requires.
         """
-        if self.action in ["list", "retrieve"]:
+        if self.action in [
+            "list",
+            "retrieve",
+            "similar",
+            "top",
+            "autocomplete",
+            "export",
+        ]:
             permission_classes = [AllowAny]
         else:
             permission_classes = [IsAuthenticated]
@@ -51,10 +192,29 @@ class MovieViewSet(viewsets.ModelViewSet):
         Return the class to use for the serializer.
         Depending on the request method, different serializers are used.
         """
-        if self.action == "list" or self.action == "retrieve":
+        if self.action in ["list", "retrieve", "export"]:
             return MovieSerializer
         return MovieCreateSerializer
 
+    def get_fields(self):
+        """
+        The fields asked for with the `fields` parameter, None for the defaults.
+        """
+        return parse_movie_fields(self.request.query_params.get("fields"))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ["list", "retrieve", "export"]:
+            queryset = select_movie_fields(
+                queryset, self.get_fields(), self.request.user
+            )
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ["list", "retrieve", "export"]:
+            kwargs.setdefault("fields", self.get_fields())
+        return super().get_serializer(*args, **kwargs)
+
     @swagger_auto_schema(
         request_body=RatingSerializer,
         responses={
@@ -95,3 +255,234 @@ class MovieViewSet(viewsets.ModelViewSet):
                 )
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @swagger_auto_schema(
+        request_body=BulkRatingSerializer(many=True),
+        responses={
+            200: openapi.Response("Per-item results, in the order of the input"),
+            400: "Invalid input",
+        },
+        operation_description="Rate many movies at once. Existing ratings of the "
+        "user are replaced. Items are validated one by one, the valid ones are "
+        "saved in a single transaction.",
+        operation_summary="Bulk Rate Movies",
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[IsAuthenticated],
+        url_path="ratings/bulk",
+    )
+    def bulk_rate(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {"error": "Expected a list of ratings"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > MAX_BULK_RATINGS:
+            return Response(
+                {"error": f"At most {MAX_BULK_RATINGS} ratings per request"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # One serializer validates every item, errors are reported per item.
+        serializer = BulkRatingSerializer()
+        results, rates = [], {}
+        for item in items:
+            try:
+                data = serializer.run_validation(item)
+            except ValidationError as exc:
+                movie = item.get("movie") if isinstance(item, dict) else None
+                results.append(
+                    {"movie": movie, "status": "error", "errors": exc.detail}
+                )
+            else:
+                results.append({"movie": data["movie"]})
+                rates[data["movie"]] = data["rate"]
+
+        found = set(Movie.objects.filter(id__in=rates).values_list("id", flat=True))
+        seen = set()
+        # The last rating of a movie wins, earlier duplicates are reported.
+        for result in reversed(results):
+            if "status" in result:
+                continue
+            movie = result["movie"]
+            if movie not in found:
+                result.update(status="error", errors={"movie": ["Movie not found"]})
+            elif movie in seen:
+                result.update(
+                    status="error", errors={"movie": ["Duplicate movie in the batch"]}
+                )
+            seen.add(movie)
+
+        rates = {movie: rate for movie, rate in rates.items() if movie in found}
+        existing = set()
+        if rates:
+            existing = Rating.upsert_many(request.user, rates)
+            invalidate_movies(list(rates))
+        for result in results:
+            if "status" not in result:
+                created = result["movie"] not in existing
+                result["status"] = "created" if created else "updated"
+
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        manual_parameters=[limit_parameter],
+        responses={
+            200: ScoredMovieSerializer(many=True),
+            404: "Movie not found",
+            503: "Recommendation model is not built",
+        },
+        operation_description="Movies most similar to a movie, from the ratings of "
+        "the users who rated both.",
+        operation_summary="Similar Movies",
+    )
+    @action(detail=True, methods=["get"], url_path="similar")
+    def similar(self, request, pk=None):
+        try:
+            movie_id = int(pk)
+        except ValueError:
+            movie_id = None
+        if movie_id is None or not Movie.objects.filter(id=movie_id).exists():
+            return Response(
+                {"error": "Movie not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        model = load_model()
+        if model is None:
+            return model_missing_response()
+        return scored_movies_response(model.similar(movie_id, get_limit(request)))
+
+    @swagger_auto_schema(
+        manual_parameters=top_parameters,
+        responses={
+            200: ScoredMovieSerializer(many=True),
+            400: "Invalid parameters",
+            404: "Genre not found",
+        },
+        operation_description="Top rated movies, overall or of a genre, ranked by "
+        "the Bayesian average of their ratings so movies with few ratings do not "
+        "dominate. The `score` is that average.",
+        operation_summary="Top Movies",
+    )
+    @action(detail=False, methods=["get"], url_path="top")
+    def top(self, request):
+        return self.cached_response(request, "top", [LIST_VERSION_KEY], self.top_movies)
+
+    def top_movies(self, request):
+        serializer = TopMoviesQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        genre = None
+        if "genre" in params:
+            genre = Genre.objects.filter(name__iexact=params["genre"]).first()
+            if genre is None:
+                return Response(
+                    {"error": "Genre not found"}, status=status.HTTP_404_NOT_FOUND
+                )
+
+        # Served from the (genre, -score, movie, year, rating_count) index alone.
+        entries = LeaderboardEntry.objects.filter(
+            genre=genre, rating_count__gte=params["min_count"]
+        )
+        if "year" in params:
+            entries = entries.filter(year=params["year"])
+        if "year_min" in params:
+            entries = entries.filter(year__gte=params["year_min"])
+        if "year_max" in params:
+            entries = entries.filter(year__lte=params["year_max"])
+
+        pairs = entries.order_by("-score", "movie").values_list("movie_id", "score")
+        return scored_movies_response(list(pairs[: get_limit(request)]))
+
+    @swagger_auto_schema(
+        manual_parameters=autocomplete_parameters,
+        responses={200: "Matching titles", 400: "Missing query"},
+        operation_description="Titles with a word starting with `q`, the most "
+        "rated movies first. Served from an in-process index, without a query.",
+        operation_summary="Autocomplete Titles",
+    )
+    @action(detail=False, methods=["get"], url_path="autocomplete")
+    def autocomplete(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response(
+                {"q": ["This field is required."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = int(request.query_params["limit"])
+        except (KeyError, ValueError):
+            limit = AUTOCOMPLETE_LIMIT
+        limit = min(max(limit, 1), MAX_AUTOCOMPLETE_LIMIT)
+
+        matches = get_index().search(query, limit)
+        return Response(
+            {
+                "results": [
+                    {"id": pk, "title": title, "year": year}
+                    for pk, title, year in matches
+                ]
+            }
+        )
+
+    @swagger_auto_schema(
+        manual_parameters=export_parameters,
+        responses={200: "The movies, streamed", 400: "Invalid parameters"},
+        operation_description="Every movie matching the search, filter and ordering "
+        "parameters of the list, streamed in one response without pagination. The "
+        "movies are read from the database in batches, and compressed on the fly "
+        "for clients accepting gzip.",
+        operation_summary="Export Movies",
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="export",
+        renderer_classes=[NDJSONRenderer, CSVRenderer],
+    )
+    def export(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer(queryset, many=True)
+        fields = list(serializer.child.fields)
+        renderer = request.accepted_renderer
+
+        content = export_batches(
+            renderer, fields, serializer.iter_rows(queryset, EXPORT_CHUNK_SIZE)
+        )
+        gzip = ACCEPTS_GZIP.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if gzip:
+            content = compress_sequence(content)
+        if isinstance(request._request, ASGIRequest):
+            content = iterate_in_thread(content)
+
+        response = StreamingHttpResponse(content, content_type=renderer.media_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="movies.{renderer.format}"'
+        )
+        if gzip:
+            response["Content-Encoding"] = "gzip"
+        patch_vary_headers(response, ["Accept", "Accept-Encoding"])
+        return response
+
+
+def export_batches(renderer, fields, rows):
+    """
+    The rendered header, then the rows by batches of EXPORT_CHUNK_SIZE.
+    """
+    yield renderer.render_header(fields)
+    while batch := list(islice(rows, EXPORT_CHUNK_SIZE)):
+        yield renderer.render_rows(fields, batch)
+
+
+async def iterate_in_thread(iterator):
+    """
+    Pulls the items of a sync iterator in the sync thread, so an ASGI server streams
+    them as they come instead of reading the whole iterator first.
+    """
+    pull = sync_to_async(next)
+    done = object()
+    while (item := await pull(iterator, done)) is not done:
+        yield item
@@ -0,0 +1,67 @@
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from app.api.v1.serializers.recommendations import ScoredMovieSerializer
+from app.models import Rating
+from app.recommender import load_model, scored_movies
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Only the most recent ratings of a user vote, to bound the work per request.
+MAX_USER_RATINGS = 500
+
+limit_parameter = openapi.Parameter(
+    "limit",
+    openapi.IN_QUERY,
+    description=f"Number of movies to return, at most {MAX_LIMIT}.",
+    type=openapi.TYPE_INTEGER,
+)
+
+
+def get_limit(request):
+    try:
+        limit = int(request.query_params["limit"])
+    except (KeyError, ValueError):
+        return DEFAULT_LIMIT
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def scored_movies_response(pairs):
+    movies = scored_movies(pairs)
+    return Response({"results": ScoredMovieSerializer(movies, many=True).data})
+
+
+def model_missing_response():
+    return Response(
+        {"error": "Recommendation model is not built"},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
+@swagger_auto_schema(
+    method="get",
+    manual_parameters=[limit_parameter],
+    responses={
+        200: ScoredMovieSerializer(many=True),
+        503: "Recommendation model is not built",
+    },
+    operation_description="Recommend movies to the user from the movies they rated.",
+    operation_summary="Recommended Movies",
+)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def recommendations(request):
+    model = load_model()
+    if model is None:
+        return model_missing_response()
+
+    ratings = dict(
+        Rating.objects.filter(user=request.user)
+        .order_by("-timestamp")
+        .values_list("movie_id", "rate")[:MAX_USER_RATINGS]
+    )
+    return scored_movies_response(model.recommend(ratings, get_limit(request)))
@@ -0,0 +1,189 @@
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from app.analytics import load_store
+from app.api.v1.views.recommendations import get_limit, limit_parameter
+from app.models import GENRE_BITS
+
+genre_parameter = openapi.Parameter(
+    "genre",
+    openapi.IN_QUERY,
+    description="Only count the movies of this genre.",
+    type=openapi.TYPE_STRING,
+)
+year_parameters = [
+    openapi.Parameter(
+        name,
+        openapi.IN_QUERY,
+        description=description,
+        type=openapi.TYPE_INTEGER,
+    )
+    for name, description in (
+        ("year_min", "Earliest year of the ratings."),
+        ("year_max", "Latest year of the ratings."),
+    )
+]
+
+
+def store_missing_response():
+    return Response(
+        {"error": "Statistics are not built"},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
+def genre_not_found_response():
+    return Response({"error": "Genre not found"}, status=status.HTTP_404_NOT_FOUND)
+
+
+def get_year(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: ["A valid integer is required."]})
+
+
+@swagger_auto_schema(
+    method="get",
+    responses={200: "Size and build time of the statistics", 503: "Not built"},
+    operation_description="Size and build time of the statistics store. The store "
+    "is rebuilt after each dataset import.",
+    operation_summary="Statistics",
+)
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def summary(request):
+    store = load_store()
+    if store is None:
+        return store_missing_response()
+    return Response(
+        {
+            "built_at": store.built_at,
+            "movies": len(store.movie_ids),
+            "ratings": int(store.bin_counts.sum()),
+            "tags": len(store.tag_names),
+        }
+    )
+
+
+@swagger_auto_schema(
+    method="get",
+    responses={
+        200: "Number of ratings per half-point rate",
+        404: "Movie not found",
+        503: "Not built",
+    },
+    operation_description="Histogram of the ratings of a movie.",
+    operation_summary="Rating Histogram",
+)
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def movie_histogram(request, movie_id):
+    store = load_store()
+    if store is None:
+        return store_missing_response()
+    bins = store.histogram(movie_id)
+    if bins is None:
+        return Response({"error": "Movie not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(
+        {
+            "movie": movie_id,
+            "results": [{"rate": rate, "count": count} for rate, count in bins],
+        }
+    )
+
+
+@swagger_auto_schema(
+    method="get",
+    manual_parameters=[genre_parameter],
+    responses={
+        200: "Count and mean rate of the ratings given each year",
+        404: "Genre not found",
+        503: "Not built",
+    },
+    operation_description="Ratings given each year, of all movies or of a genre.",
+    operation_summary="Ratings per Year",
+)
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def ratings_per_year(request):
+    store = load_store()
+    if store is None:
+        return store_missing_response()
+    genre = request.query_params.get("genre")
+    if genre is not None and genre.lower() not in GENRE_BITS:
+        return genre_not_found_response()
+    return Response(
+        {
+            "results": [
+                {"year": year, "count": count, "mean": mean}
+                for year, count, mean in store.ratings_per_year(genre)
+            ]
+        }
+    )
+
+
+@swagger_auto_schema(
+    method="get",
+    manual_parameters=year_parameters,
+    responses={200: "Ratings per year of each genre", 503: "Not built"},
+    operation_description="Popularity of the genres over time: the number of "
+    "ratings given to the movies of each genre per year.",
+    operation_summary="Genre Popularity",
+)
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def genre_popularity(request):
+    store = load_store()
+    if store is None:
+        return store_missing_response()
+    popularity = store.genre_popularity(
+        get_year(request, "year_min"), get_year(request, "year_max")
+    )
+    return Response(
+        {
+            "results": {
+                genre: [{"year": year, "count": count} for year, count in years]
+                for genre, years in popularity.items()
+            }
+        }
+    )
+
+
+@swagger_auto_schema(
+    method="get",
+    manual_parameters=[genre_parameter, limit_parameter],
+    responses={
+        200: "Tags with their number of movies",
+        404: "Genre not found",
+        503: "Not built",
+    },
+    operation_description="The tags set on the most movies, of all movies or of a "
+    "genre.",
+    operation_summary="Tag Frequency",
+)
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def tag_frequency(request):
+    store = load_store()
+    if store is None:
+        return store_missing_response()
+    genre = request.query_params.get("genre")
+    if genre is not None and genre.lower() not in GENRE_BITS:
+        return genre_not_found_response()
+    return Response(
+        {
+            "results": [
+                {"tag": tag, "movies": movies}
+                for tag, movies in store.top_tags(get_limit(request), genre)
+            ]
+        }
+    )
@@ -0,0 +1,232 @@
+"""
+In-process prefix index of the movie titles for `/api/v1/movies/autocomplete/`.
+
+Titles are normalized to lower case words without accents or punctuation, and each
+word of a title starts a key, so "matr" finds "The Matrix". The keys are kept as
+sorted UTF-8 bytes: the matches of a prefix are one range found by binary search,
+ranked by the popularity of the movies, their number of ratings.
+
+The index is saved as NumPy files and memory-mapped by the processes that serve it,
+see app.utils.arrays. `load_datasets` rebuilds it after each import. Movie changes
+bump a version in the movies cache. The next lookup that finds the index older
+starts one rebuild in a background thread, and the old index is served until the
+new one is saved. A file lock next to the index keeps the other threads and
+processes from building at the same time. With the default per-process movies
+cache, only the process that changed a movie sees the new version, and the others
+load the index it saved. Ratings do not bump the version, the popularity is
+refreshed by the next rebuild.
+
+Files, in `AUTOCOMPLETE_INDEX_DIR`:
+    index.json: build time and the version of the array files.
+    build.lock: held while the index is built.
+    keys: the sorted keys, the normalized title from one of its words, cut to
+        KEY_BYTES bytes.
+    key_ranks: the rank of the movie of each key.
+    movie_ids, years: the movies by rank, the most rated first.
+    title_bytes, title_offsets: the UTF-8 titles by rank, title `i` is
+        `title_bytes[title_offsets[i]:title_offsets[i + 1]]`.
+"""
+
+import logging
+import re
+import time
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock, Thread
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+from app.cache import get_cache
+from app.models import Movie
+from app.utils.arrays import file_lock, load_arrays, save_arrays, try_file_lock
+
+ARRAYS = ["keys", "key_ranks", "movie_ids", "years", "title_bytes", "title_offsets"]
+INDEX_VERSION_KEY = "movies:version:autocomplete"
+# Keys and queries are compared on their first bytes only.
+KEY_BYTES = 32
+# Sorts after every key that starts with a prefix, 0xff is never part of UTF-8.
+PREFIX_END = b"\xff"
+
+logger = logging.getLogger(__name__)
+_build_lock = Lock()
+_rebuild_lock = Lock()
+_rebuild_thread = None
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def title_keys(title):
+    words = normalize(title).split()
+    return {" ".join(words[start:]).encode()[:KEY_BYTES] for start in range(len(words))}
+
+
+def smallest_unique(values, limit):
+    """
+    The `limit` smallest distinct values, sorted, without sorting every value.
+    """
+    size = limit
+    while size < len(values):
+        found = np.unique(np.partition(values, size - 1)[:size])
+        if len(found) >= limit:
+            return found[:limit]
+        size *= 2
+    return np.unique(values)[:limit]
+
+
+@dataclass
+class PrefixIndex:
+    keys: np.ndarray
+    key_ranks: np.ndarray
+    movie_ids: np.ndarray
+    years: np.ndarray
+    title_bytes: np.ndarray
+    title_offsets: np.ndarray
+    built_at: float
+
+    def title(self, rank):
+        start, end = self.title_offsets[rank], self.title_offsets[rank + 1]
+        return self.title_bytes[start:end].tobytes().decode()
+
+    def search(self, query, limit=10):
+        """
+        (movie ID, title, year) of the most rated movies with a word starting
+        with `query`.
+        """
+        prefix = normalize(query).encode()[:KEY_BYTES]
+        if not prefix or limit < 1:
+            return []
+        start = np.searchsorted(self.keys, prefix, side="left")
+        end = np.searchsorted(self.keys, prefix + PREFIX_END, side="left")
+        ranks = smallest_unique(self.key_ranks[start:end], limit).tolist()
+        return [
+            (int(self.movie_ids[rank]), self.title(rank), int(self.years[rank]))
+            for rank in ranks
+        ]
+
+
+def get_index_dir():
+    return Path(settings.AUTOCOMPLETE_INDEX_DIR)
+
+
+def build_index():
+    """
+    The PrefixIndex of every movie.
+    """
+    built_at = time.time()
+    movies = list(
+        Movie.objects.order_by("-rating_count", "title", "id").values_list(
+            "id", "title", "year"
+        )
+    )
+
+    keys, key_ranks = [], []
+    for rank, (_, title, _) in enumerate(movies):
+        for key in title_keys(title):
+            keys.append(key)
+            key_ranks.append(rank)
+    keys = np.array(keys, dtype=f"S{KEY_BYTES}")
+    order = np.argsort(keys, kind="stable")
+
+    titles = [title.encode() for _, title, _ in movies]
+    title_offsets = np.zeros(len(titles) + 1, dtype=np.int64)
+    np.cumsum([len(title) for title in titles], out=title_offsets[1:])
+    return PrefixIndex(
+        keys=keys[order],
+        key_ranks=np.array(key_ranks, dtype=np.int32)[order],
+        movie_ids=np.array([pk for pk, _, _ in movies], dtype=np.int64),
+        years=np.array([year for _, _, year in movies], dtype=np.int16),
+        title_bytes=np.frombuffer(b"".join(titles), dtype=np.uint8),
+        title_offsets=title_offsets,
+        built_at=built_at,
+    )
+
+
+def save_index(index, index_dir=None):
+    save_arrays(
+        index_dir or get_index_dir(),
+        "index.json",
+        {name: getattr(index, name) for name in ARRAYS},
+        {"built_at": index.built_at, "movies": len(index.movie_ids)},
+    )
+
+
+def load_index(index_dir=None):
+    """
+    The memory-mapped index of `index_dir`, or None when none was built.
+    """
+
+    def make_index(meta, arrays):
+        return PrefixIndex(**arrays, built_at=meta["built_at"])
+
+    return load_arrays(index_dir or get_index_dir(), "index.json", ARRAYS, make_index)
+
+
+def refresh_index():
+    index = build_index()
+    save_index(index)
+    return index
+
+
+def expire_index():
+    get_cache().set(INDEX_VERSION_KEY, time.time(), None)
+
+
+def get_lock_path():
+    index_dir = get_index_dir()
+    index_dir.mkdir(parents=True, exist_ok=True)
+    return index_dir / "build.lock"
+
+
+def rebuild_index(lock_file):
+    """
+    Rebuilds the index, then releases the build lock held by `lock_file`.
+    """
+    try:
+        refresh_index()
+    except Exception:
+        logger.exception("Autocomplete index rebuild failed")
+    finally:
+        lock_file.close()
+        connection.close()
+
+
+def rebuild_in_background():
+    """
+    Start a rebuild of the index in a thread, unless one is running in this process
+    or another process holds the build lock. Returns the thread, or None.
+    """
+    global _rebuild_thread
+    with _rebuild_lock:
+        if _rebuild_thread is not None and _rebuild_thread.is_alive():
+            return None
+        lock_file = try_file_lock(get_lock_path())
+        if lock_file is None:
+            return None
+        _rebuild_thread = Thread(target=rebuild_index, args=[lock_file], daemon=True)
+        _rebuild_thread.start()
+        return _rebuild_thread
+
+
+def get_index():
+    """
+    The current index. When none was saved, the first lookup builds it while the
+    others wait. When a movie changed since it was built, it is still returned, and
+    a rebuild starts in the background.
+    """
+    index = load_index()
+    if index is None:
+        with _build_lock, file_lock(get_lock_path()):
+            index = load_index() or refresh_index()
+        return index
+
+    version = get_cache().get(INDEX_VERSION_KEY)
+    if version is not None and index.built_at < version:
+        rebuild_in_background()
+    return index
@@ -0,0 +1,148 @@
+"""
+Response cache of the anonymous movie `list` and `retrieve` endpoints.
+
+Entries live in the `movies` cache alias and are keyed on the normalized query
+string. Instead of deleting entries, writes bump version stamps that are part of
+the keys:
+    - the catalogue version, bumped by bulk changes such as `load_datasets`,
+    - the list version, bumped by any movie change,
+    - one version per movie, bumped when that movie or its ratings change.
+The versions are timestamps, so they also serve the `Last-Modified` header, and
+the `ETag` is derived from the key and the versions. `acached_response` is the same
+cache for the async views, through the async cache API.
+"""
+
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOGUE_VERSION_KEY = "movies:version"
+LIST_VERSION_KEY = "movies:version:list"
+MOVIE_VERSION_KEY = "movies:version:{}"
+
+
+def get_cache():
+    return caches[getattr(settings, "MOVIES_CACHE_ALIAS", "movies")]
+
+
+def get_versions(keys):
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate_movies(movie_ids=None):
+    """
+    Expire the cached lists and the given movies, or the whole catalogue when no
+    IDs are given.
+    """
+    now = time.time()
+    if movie_ids is None:
+        keys = [CATALOGUE_VERSION_KEY]
+    else:
+        keys = [LIST_VERSION_KEY, *(MOVIE_VERSION_KEY.format(pk) for pk in movie_ids)]
+    get_cache().set_many({key: now for key in keys}, None)
+
+
+def cache_key(params, scope, versions):
+    params = sorted((key, value) for key, values in params.lists() for value in values)
+    digest = hashlib.md5(repr((scope, params, versions)).encode()).hexdigest()
+    return f"movies:response:{digest}"
+
+
+def response_headers(key, versions):
+    return {
+        "ETag": quote_etag(key.rsplit(":", 1)[1]),
+        "Last-Modified": http_date(max(versions)),
+    }
+
+
+def is_not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")]
+
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since"))
+    return if_modified_since is not None and int(last_modified) <= if_modified_since
+
+
+def cached_content(params, scope, version_keys):
+    """
+    The versions, key and cached value of a response.
+    """
+    versions = get_versions([CATALOGUE_VERSION_KEY, *version_keys])
+    key = cache_key(params, scope, versions)
+    return versions, key, get_cache().get(key)
+
+
+async def acached_response(request, scope, version_keys, view, timeout=300):
+    """
+    The JSON response of the async `view`, served from the movies cache and answering
+    conditional requests with 304 Not Modified. The rendered content of the 200
+    responses is cached, so a hit is served without serializing again.
+
+    The cache backends are sync and their async methods run every call in a thread,
+    so the lookups of a request are grouped into one call.
+    """
+    versions, key, content = await sync_to_async(cached_content)(
+        request.GET, scope, version_keys
+    )
+    headers = response_headers(key, versions)
+    if is_not_modified(request, headers["ETag"], max(versions)):
+        return HttpResponseNotModified(headers=headers)
+
+    if content is None:
+        response = await view(request)
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        content = response.content
+        await get_cache().aset(key, content, timeout)
+    return HttpResponse(content, content_type="application/json", headers=headers)
+
+
+class MovieCacheMixin:
+    """
+    Serves `list` and `retrieve` to anonymous users from the movies cache and
+    answers conditional requests with 304 Not Modified.
+    """
+
+    cache_timeout = 300
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, "list", [LIST_VERSION_KEY], super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        version_key = MOVIE_VERSION_KEY.format(kwargs[self.lookup_field])
+        return self.cached_response(
+            request, version_key, [version_key], super().retrieve, *args, **kwargs
+        )
+
+    def cached_response(self, request, scope, version_keys, view, *args, **kwargs):
+        if request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+
+        versions, key, data = cached_content(request.query_params, scope, version_keys)
+        headers = response_headers(key, versions)
+        if is_not_modified(request, headers["ETag"], max(versions)):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        if data is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            get_cache().set(key, data, self.cache_timeout)
+        return Response(data, headers=headers)
@@ -0,0 +1,90 @@
+from django.db.models import Count, F
+from django.db.models.functions import Lower
+from django_filters import rest_framework as filters
+from rest_framework.filters import BaseFilterBackend
+
+from app.models import GENRE_BITS, Movie, MovieGenre, MovieTag
+from app.search import get_search_backend
+
+MATCH_CHOICES = [("all", "all"), ("any", "any")]
+
+
+class MovieFilter(filters.FilterSet):
+    """
+    Filters movies by any number of `genre` and `tag` parameters, resolved through
+    the indexed Genre and Tag link tables. `genre_match` and `tag_match` switch
+    between requiring all (default) or any of the names. Genres that are all among
+    the fixed MovieLens genres are matched on the `genre_mask` bits instead.
+    """
+
+    genre = filters.CharFilter(method="filter_genre", label="Genre, can be repeated")
+    genre_match = filters.ChoiceFilter(choices=MATCH_CHOICES, method="filter_match")
+    tag = filters.CharFilter(method="filter_tag", label="Tag, can be repeated")
+    tag_match = filters.ChoiceFilter(choices=MATCH_CHOICES, method="filter_match")
+
+    class Meta:
+        model = Movie
+        fields = ["tags", "genres"]
+
+    def filter_match(self, queryset, name, value):
+        # Only read by the genre and tag filters.
+        return queryset
+
+    def match_all(self, name):
+        return self.data.get(f"{name}_match", "all") != "any"
+
+    def filter_genre(self, queryset, name, value):
+        names = {genre.lower() for genre in self.data.getlist(name)}
+        if names <= GENRE_BITS.keys():
+            mask = sum(GENRE_BITS[genre] for genre in names)
+            queryset = queryset.alias(matched_genres=F("genre_mask").bitand(mask))
+            if self.match_all(name):
+                return queryset.filter(matched_genres=mask)
+            return queryset.filter(matched_genres__gt=0)
+
+        # Genre names keep their case, they are matched regardless of it like the bits.
+        links = MovieGenre.objects.alias(name=Lower("genre__name")).filter(
+            name__in=names
+        )
+        return self.filter_links(queryset, links, names, self.match_all(name))
+
+    def filter_tag(self, queryset, name, value):
+        names = [tag.strip().lower() for tag in self.data.getlist(name)]
+        links = MovieTag.objects.alias(name=F("tag__name")).filter(name__in=names)
+        return self.filter_links(queryset, links, names, self.match_all(name))
+
+    def filter_links(self, queryset, links, names, match_all):
+        movies = links.values("movie")
+        if match_all:
+            movies = (
+                movies.annotate(matched=Count("name", distinct=True))
+                .filter(matched=len(set(names)))
+                .values("movie")
+            )
+        return queryset.filter(id__in=movies)
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    Ranked full-text search with prefix matching, through the configured
+    `MOVIE_SEARCH_BACKEND`. The best matches come first.
+    """
+
+    search_param = "q"
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "").strip()
+        if not query:
+            return queryset
+        return get_search_backend().search(queryset, query)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.search_param,
+                "required": False,
+                "in": "query",
+                "description": "Full-text search on title, genres and tags, ranked by relevance.",
+                "schema": {"type": "string"},
+            },
+        ]
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.recommender import (
+    build_model,
+    load_model,
+    read_ratings,
+    read_ratings_csv,
+    save_model,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the item-item recommendation model from the Rating table. Only the "
+        "movies whose ratings changed are recomputed, unless --full is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Optional: Recompute every movie instead of the changed ones.",
+        )
+        parser.add_argument(
+            "--ratings-csv",
+            type=str,
+            help="Optional: Read the ratings from a MovieLens ratings.csv file.",
+        )
+        parser.add_argument(
+            "--neighbours",
+            type=int,
+            default=50,
+            help="Optional: Number of similar movies kept per movie.",
+        )
+        parser.add_argument(
+            "--min-ratings",
+            type=int,
+            default=5,
+            help="Optional: Minimum number of ratings of the movies in the model.",
+        )
+
+    def handle(self, *args, **kwargs):
+        start_time = time.time()
+        csv_path = kwargs.get("ratings_csv")
+
+        self.stdout.write("Reading ratings...")
+        ratings = read_ratings_csv(csv_path) if csv_path else read_ratings()
+
+        previous = None if kwargs["full"] else load_model()
+        self.stdout.write("Building recommendation model...")
+        model, recomputed = build_model(
+            ratings,
+            neighbours=kwargs["neighbours"],
+            min_ratings=kwargs["min_ratings"],
+            previous=previous,
+        )
+        if previous is not None and not recomputed:
+            self.stdout.write(self.style.SUCCESS("The model is up to date."))
+            return
+
+        save_model(model)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Built the model of {len(model.movie_ids)} movies, recomputed "
+                f"{recomputed} in {time.time() - start_time:.2f} seconds."
+            )
+        )
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.snapshot import export_snapshot, get_snapshot_dir
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports the imported movies, their genre and tag links and the MovieLens "
+        "ratings as a binary snapshot, which import_snapshot loads without parsing "
+        "the CSV files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dir",
+            type=str,
+            help="Optional: Directory of the snapshot, SNAPSHOT_DIR by default.",
+        )
+
+    def handle(self, *args, **kwargs):
+        directory = kwargs.get("dir") or get_snapshot_dir()
+        start_time = time.time()
+
+        self.stdout.write(f"Exporting the snapshot to {directory}...")
+        counts = export_snapshot(directory)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Exported {', '.join(f'{count} {name}' for name, count in counts.items())} "
+                f"in {time.time() - start_time:.2f} seconds."
+            )
+        )
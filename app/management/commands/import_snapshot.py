@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.snapshot import get_snapshot_dir, import_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Replaces the movies and ratings with a snapshot written by export_snapshot, "
+        "then rebuilds the rates, the search index and the stores."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dir",
+            type=str,
+            help="Optional: Directory of the snapshot, SNAPSHOT_DIR by default.",
+        )
+
+    def handle(self, *args, **kwargs):
+        directory = kwargs.get("dir") or get_snapshot_dir()
+        start_time = time.time()
+
+        self.stdout.write(f"Importing the snapshot of {directory}...")
+        try:
+            import_snapshot(directory)
+        except (FileNotFoundError, ValueError) as e:
+            raise CommandError(str(e)) from e
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported the snapshot in {time.time() - start_time:.2f} seconds."
+            )
+        )
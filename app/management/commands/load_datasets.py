@@ -1,4 +1,4 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from app.utils.load_datasets import load_data
 
 
@@ -11,13 +11,45 @@ class Command(BaseCommand):
             type=str,
             help="Optional: Directory path where `ml-20m` dataset is located.",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=0,
+            help="Optional: Parse and transform chunks in this many processes.",
+        )
+        parser.add_argument(
+            "--sync",
+            action="store_true",
+            help="Optional: Apply only the changes since the last load, keeping the "
+            "ratings of the users.",
+        )
+        parser.add_argument(
+            "--memory-budget",
+            type=int,
+            help="Optional: Memory in MB to size the chunks for, "
+            "LOAD_MEMORY_BUDGET_MB by default.",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Optional: Continue an interrupted load after its last committed "
+            "chunks.",
+        )
 
     def handle(self, *args, **kwargs):
         dataset_path = kwargs.get("dir") or "datasets/ml-20m"
+        workers = kwargs.get("workers") or 0
+        sync = kwargs.get("sync") or False
+        memory_budget = kwargs.get("memory_budget")
+        resume = kwargs.get("resume") or False
+        if resume and sync:
+            raise CommandError("--resume only applies to a full load, not to --sync.")
+        if memory_budget is not None:
+            memory_budget *= 1024**2
 
         self.stdout.write("Starting data load...")
         try:
-            load_data(dataset_path)
+            load_data(dataset_path, workers, sync, memory_budget, resume)
             self.stdout.write(self.style.SUCCESS("Data load completed successfully."))
         except Exception as e:
             self.stderr.write(self.style.ERROR(f"Error during data load: {e}"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from app.models import Movie
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the rating aggregates of movies from the Rating table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--movie",
+            type=int,
+            nargs="+",
+            help="Optional: Only rebuild the aggregates of these movie IDs.",
+        )
+
+    def handle(self, *args, **kwargs):
+        movie_ids = kwargs.get("movie")
+
+        self.stdout.write("Rebuilding movie rates...")
+        updated = Movie.rebuild_rates(movie_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rates of {updated} movies."))
@@ -0,0 +1,382 @@
+"""
+Request metrics of the API, exposed on `/metrics` in the Prometheus text format and
+per response in a `Server-Timing` header.
+
+MetricsMiddleware times each request and labels it with the name of its URL
+pattern, such as `movie-list`, so the number of series stays bounded. Within a
+request, the SQL queries are counted and timed by a database execute wrapper, and
+the `serialize` and `render` phases by `timed`, around the `.data` of the movie
+serializers and FastJSONRenderer. A phase does not count the queries run inside
+it, they belong to `db`.
+
+Queries slower than METRICS_SLOW_QUERY_SECONDS are counted, and a sample of
+METRICS_SLOW_QUERY_SAMPLE_RATE of them is logged with their SQL.
+
+Only the clients of METRICS_ALLOWED_IPS read `/metrics`. They and staff users get
+the `Server-Timing` header, other clients never see query counts or timings.
+
+The metrics are kept per process: each worker reports its own requests.
+"""
+
+import ipaddress
+import logging
+import random
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from threading import Lock
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.functional import SimpleLazyObject, empty
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets, in seconds and in queries.
+DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+QUERY_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100]
+UNMATCHED_ROUTE = "unmatched"
+
+_current = ContextVar("request_metrics", default=None)
+
+
+@dataclass
+class RequestMetrics:
+    path: str
+    queries: int = 0
+    query_seconds: float = 0.0
+    slow_queries: int = 0
+    phases: dict = field(default_factory=dict)
+    timing: bool = False
+
+    def server_timing(self, duration):
+        """
+        The `Server-Timing` header value, `app` being the time outside the queries
+        and phases.
+        """
+        phases = sum(self.phases.values())
+        entries = [
+            f'db;dur={self.query_seconds * 1000:.2f};desc="{self.queries} queries"',
+            *(
+                f"{phase};dur={seconds * 1000:.2f}"
+                for phase, seconds in self.phases.items()
+            ),
+            f"app;dur={(duration - self.query_seconds - phases) * 1000:.2f}",
+            f"total;dur={duration * 1000:.2f}",
+        ]
+        return ", ".join(entries)
+
+
+@dataclass
+class RouteMetrics:
+    statuses: dict = field(default_factory=dict)
+    durations: list = field(default_factory=lambda: [0] * (len(DURATION_BUCKETS) + 1))
+    duration_seconds: float = 0.0
+    queries: list = field(default_factory=lambda: [0] * (len(QUERY_BUCKETS) + 1))
+    query_count: int = 0
+    query_seconds: float = 0.0
+    slow_queries: int = 0
+    phases: dict = field(default_factory=dict)
+
+
+class Registry:
+    """
+    The metrics of the requests served by this process, by method and route.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.routes = {}
+
+    def record(self, method, route, status, metrics, duration):
+        with self.lock:
+            route_metrics = self.routes.get((method, route))
+            if route_metrics is None:
+                route_metrics = self.routes[(method, route)] = RouteMetrics()
+            statuses = route_metrics.statuses
+            statuses[status] = statuses.get(status, 0) + 1
+            route_metrics.durations[bisect_left(DURATION_BUCKETS, duration)] += 1
+            route_metrics.duration_seconds += duration
+            route_metrics.queries[bisect_left(QUERY_BUCKETS, metrics.queries)] += 1
+            route_metrics.query_count += metrics.queries
+            route_metrics.query_seconds += metrics.query_seconds
+            route_metrics.slow_queries += metrics.slow_queries
+            for phase, seconds in metrics.phases.items():
+                phases = route_metrics.phases
+                phases[phase] = phases.get(phase, 0.0) + seconds
+
+    def reset(self):
+        with self.lock:
+            self.routes = {}
+
+    def render(self):
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+        with self.lock:
+            routes = sorted(self.routes.items())
+            lines = []
+
+            def family(name, kind, description):
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {kind}")
+
+            family("http_requests_total", "counter", "Requests by route and status.")
+            for (method, route), metrics in routes:
+                for status, count in sorted(metrics.statuses.items()):
+                    labels = format_labels(method=method, route=route, status=status)
+                    lines.append(f"http_requests_total{labels} {count}")
+
+            family("http_request_duration_seconds", "histogram", "Request durations.")
+            for (method, route), metrics in routes:
+                histogram_lines(
+                    lines,
+                    "http_request_duration_seconds",
+                    {"method": method, "route": route},
+                    DURATION_BUCKETS,
+                    metrics.durations,
+                    metrics.duration_seconds,
+                )
+
+            family("http_request_db_queries", "histogram", "SQL queries per request.")
+            for (method, route), metrics in routes:
+                histogram_lines(
+                    lines,
+                    "http_request_db_queries",
+                    {"method": method, "route": route},
+                    QUERY_BUCKETS,
+                    metrics.queries,
+                    metrics.query_count,
+                )
+
+            family(
+                "http_request_db_seconds_total", "counter", "Time spent in SQL queries."
+            )
+            for (method, route), metrics in routes:
+                labels = format_labels(method=method, route=route)
+                lines.append(
+                    f"http_request_db_seconds_total{labels} {metrics.query_seconds}"
+                )
+
+            family(
+                "http_request_db_slow_queries_total",
+                "counter",
+                "SQL queries slower than METRICS_SLOW_QUERY_SECONDS.",
+            )
+            for (method, route), metrics in routes:
+                labels = format_labels(method=method, route=route)
+                lines.append(
+                    f"http_request_db_slow_queries_total{labels} {metrics.slow_queries}"
+                )
+
+            family(
+                "http_request_phase_seconds_total",
+                "counter",
+                "Time spent serializing and rendering, without the SQL queries.",
+            )
+            for (method, route), metrics in routes:
+                for phase, seconds in sorted(metrics.phases.items()):
+                    labels = format_labels(method=method, route=route, phase=phase)
+                    lines.append(f"http_request_phase_seconds_total{labels} {seconds}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def escape_label(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def format_labels(**labels):
+    pairs = ",".join(
+        f'{name}="{escape_label(value)}"' for name, value in labels.items()
+    )
+    return f"{{{pairs}}}"
+
+
+def histogram_lines(lines, name, labels, buckets, counts, total):
+    cumulative = 0
+    for bound, count in zip([*buckets, "+Inf"], counts):
+        cumulative += count
+        bucket_labels = format_labels(**labels, le=bound)
+        lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+    lines.append(f"{name}_sum{format_labels(**labels)} {total}")
+    lines.append(f"{name}_count{format_labels(**labels)} {cumulative}")
+
+
+@contextmanager
+def timed(phase):
+    """
+    Adds the time of the block to `phase` of the current request, without the
+    queries it runs. Nested blocks only count once, in the outermost phase.
+    """
+    metrics = _current.get()
+    if metrics is None or metrics.timing:
+        yield
+        return
+
+    metrics.timing = True
+    query_seconds = metrics.query_seconds
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        elapsed -= metrics.query_seconds - query_seconds
+        metrics.phases[phase] = metrics.phases.get(phase, 0.0) + elapsed
+        metrics.timing = False
+
+
+class TimedDataMixin:
+    """
+    Serializer mixin timing `.data` as the `serialize` phase.
+    """
+
+    @property
+    def data(self):
+        with timed("serialize"):
+            return super().data
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting and timing the queries of the request.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.queries += 1
+        metrics.query_seconds += elapsed
+        if elapsed >= settings.METRICS_SLOW_QUERY_SECONDS:
+            metrics.slow_queries += 1
+            if random.random() < settings.METRICS_SLOW_QUERY_SAMPLE_RATE:
+                logger.warning(
+                    "Slow query, %.1f ms on %s: %s", elapsed * 1000, metrics.path, sql
+                )
+
+
+def install_query_recorder(connection):
+    # A connection wrapper stays the same across reconnections.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@lru_cache(maxsize=1)
+def parse_networks(networks):
+    return tuple(ipaddress.ip_network(network, strict=False) for network in networks)
+
+
+def allowed_networks():
+    # Parsed once, and again only when the setting is overridden.
+    return parse_networks(tuple(settings.METRICS_ALLOWED_IPS))
+
+
+def is_allowed_client(request):
+    """
+    Whether the client address is in METRICS_ALLOWED_IPS.
+    """
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(address in network for network in allowed_networks())
+
+
+def can_see_timing(request):
+    """
+    Whether the response of `request` gets the `Server-Timing` header. Called once
+    the view has run: DRF sets the user it authenticated, such as a JWT user, on the
+    Django request too.
+    """
+    if is_allowed_client(request):
+        return True
+    user = getattr(request, "user", None)
+    return bool(user and user.is_staff)
+
+
+async def acan_see_timing(request):
+    if is_allowed_client(request):
+        return True
+    user = getattr(request, "user", None)
+    # The session user is only loaded on access, which an async context can't do.
+    if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+        user = await request.auser()
+    return bool(user and user.is_staff)
+
+
+def get_route(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Records the metrics of each request in the registry and adds the
+    `Server-Timing` header when METRICS_SERVER_TIMING is set, for the allowed
+    clients and staff users. Sync and async, so it adds no thread switch under
+    either server.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics(request.path)
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        show_timing = settings.METRICS_SERVER_TIMING and can_see_timing(request)
+        return self.finish(request, response, metrics, started, show_timing)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics(request.path)
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        show_timing = settings.METRICS_SERVER_TIMING and await acan_see_timing(request)
+        return self.finish(request, response, metrics, started, show_timing)
+
+    def finish(self, request, response, metrics, started, show_timing):
+        duration = time.perf_counter() - started
+        registry.record(
+            request.method, get_route(request), response.status_code, metrics, duration
+        )
+        if show_timing:
+            response["Server-Timing"] = metrics.server_timing(duration)
+        return response
+
+
+def metrics_view(request):
+    if not is_allowed_client(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:58
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Movie = apps.get_model("app", "Movie")
+    Rating = apps.get_model("app", "Rating")
+
+    ratings = Rating.objects.filter(movie=OuterRef("pk")).values("movie")
+    Movie.objects.update(
+        rating_count=Coalesce(
+            Subquery(ratings.annotate(count=Count("id")).values("count")), 0
+        ),
+        rating_sum=Coalesce(
+            Subquery(ratings.annotate(total=Sum("rate")).values("total")), 0.0
+        ),
+    )
+    Movie.objects.update(
+        rate=Case(
+            When(rating_count__gt=0, then=F("rating_sum") / F("rating_count")),
+            default=Value(0.0),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_alter_movie_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_sum',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
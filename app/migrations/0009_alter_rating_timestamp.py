@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_movie_rating_count_movie_rating_sum'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rating',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def create_movie_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE app_movie_fts USING fts5("
+        "title, genres, tags, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    schema_editor.execute(
+        "INSERT INTO app_movie_fts (rowid, title, genres, tags) "
+        "SELECT id, title, genres, tags FROM app_movie"
+    )
+
+
+def drop_movie_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE app_movie_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_alter_rating_timestamp'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_movie_fts, drop_movie_fts),
+    ]
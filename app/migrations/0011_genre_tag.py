@@ -0,0 +1,209 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:11
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copies of the app.models helpers as of this migration, so it keeps backfilling
+# the same values when they change.
+GENRES = [
+    "Action",
+    "Adventure",
+    "Animation",
+    "Children",
+    "Comedy",
+    "Crime",
+    "Documentary",
+    "Drama",
+    "Fantasy",
+    "Film-Noir",
+    "Horror",
+    "IMAX",
+    "Musical",
+    "Mystery",
+    "Romance",
+    "Sci-Fi",
+    "Thriller",
+    "War",
+    "Western",
+    "(no genres listed)",
+]
+GENRE_BITS = {genre.lower(): 1 << bit for bit, genre in enumerate(GENRES)}
+
+
+def split_genres(genres):
+    return [genre for genre in re.split(r"\s*[|,]\s*", genres or "") if genre]
+
+
+def split_tags(tags):
+    return [
+        tag for tag in (tag.strip().lower() for tag in (tags or "").split(",")) if tag
+    ]
+
+
+def genre_mask(genres):
+    return sum(GENRE_BITS.get(genre.lower(), 0) for genre in set(genres))
+
+
+def backfill_genres_and_tags(apps, schema_editor):
+    Movie = apps.get_model("app", "Movie")
+    Genre = apps.get_model("app", "Genre")
+    Tag = apps.get_model("app", "Tag")
+    MovieGenre = apps.get_model("app", "MovieGenre")
+    MovieTag = apps.get_model("app", "MovieTag")
+
+    movies = {
+        movie_id: (split_genres(genres), split_tags(tags))
+        for movie_id, genres, tags in Movie.objects.values_list("id", "genres", "tags")
+    }
+    for model, link_model, field, position in (
+        (Genre, MovieGenre, "genre_id", 0),
+        (Tag, MovieTag, "tag_id", 1),
+    ):
+        names = {name for names in movies.values() for name in names[position]}
+        model.objects.bulk_create(
+            [model(name=name) for name in names], ignore_conflicts=True
+        )
+        ids = dict(model.objects.values_list("name", "id"))
+        link_model.objects.bulk_create(
+            [
+                link_model(movie_id=movie_id, **{field: ids[name]})
+                for movie_id, names in movies.items()
+                for name in set(names[position])
+            ],
+            ignore_conflicts=True,
+        )
+
+    Movie.objects.bulk_update(
+        [
+            Movie(id=movie_id, genre_mask=genre_mask(genres))
+            for movie_id, (genres, _) in movies.items()
+        ],
+        ["genre_mask"],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0010_movie_fts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Genre",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Tag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="genre_mask",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name="MovieGenre",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "genre",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="app.genre"
+                    ),
+                ),
+                (
+                    "movie",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="app.movie"
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("genre", "movie")},
+            },
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="genre_list",
+            field=models.ManyToManyField(
+                editable=False,
+                related_name="movies",
+                through="app.MovieGenre",
+                to="app.genre",
+            ),
+        ),
+        migrations.CreateModel(
+            name="MovieTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "movie",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="app.movie"
+                    ),
+                ),
+                (
+                    "tag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="app.tag"
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("tag", "movie")},
+            },
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="tag_list",
+            field=models.ManyToManyField(
+                editable=False,
+                related_name="movies",
+                through="app.MovieTag",
+                to="app.tag",
+            ),
+        ),
+        migrations.RunPython(backfill_genres_and_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0011_genre_tag"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["title", "id"], name="app_movie_title_229fce_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(fields=["year", "id"], name="app_movie_year_eecfb6_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(fields=["rate", "id"], name="app_movie_rate_29fd68_idx"),
+        ),
+    ]
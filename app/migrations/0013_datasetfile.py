@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0012_movie_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DatasetFile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("size", models.BigIntegerField()),
+                ("mtime", models.FloatField()),
+                ("digest", models.CharField(max_length=64)),
+                ("chunks", models.JSONField(default=dict)),
+                ("keys", models.JSONField(default=list)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
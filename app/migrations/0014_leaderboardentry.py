@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_leaderboards(apps, schema_editor):
+    Movie = apps.get_model("app", "Movie")
+    MovieGenre = apps.get_model("app", "MovieGenre")
+    LeaderboardEntry = apps.get_model("app", "LeaderboardEntry")
+    prior = getattr(settings, "LEADERBOARD_PRIOR_COUNT", 25)
+
+    stats = {
+        movie_id: (year, count, total)
+        for movie_id, year, count, total in Movie.objects.values_list(
+            "id", "year", "rating_count", "rating_sum"
+        )
+    }
+    boards = [(None, movie_id) for movie_id in stats] + list(
+        MovieGenre.objects.values_list("genre_id", "movie_id")
+    )
+    totals = {}
+    for genre_id, movie_id in boards:
+        count, total = totals.get(genre_id, (0, 0.0))
+        totals[genre_id] = (count + stats[movie_id][1], total + stats[movie_id][2])
+    means = {
+        genre_id: total / count if count else 0.0
+        for genre_id, (count, total) in totals.items()
+    }
+
+    LeaderboardEntry.objects.bulk_create(
+        [
+            LeaderboardEntry(
+                genre_id=genre_id,
+                movie_id=movie_id,
+                year=stats[movie_id][0],
+                rating_count=stats[movie_id][1],
+                prior_mean=means[genre_id],
+                score=(prior * means[genre_id] + stats[movie_id][2])
+                / (prior + stats[movie_id][1]),
+            )
+            for genre_id, movie_id in boards
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0013_datasetfile"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaderboardEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("year", models.PositiveSmallIntegerField()),
+                ("rating_count", models.PositiveIntegerField()),
+                ("prior_mean", models.FloatField()),
+                ("score", models.FloatField()),
+                (
+                    "genre",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="app.genre",
+                    ),
+                ),
+                (
+                    "movie",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="app.movie",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["genre", "-score", "movie", "year", "rating_count"],
+                        name="leaderboard_top_idx",
+                    )
+                ],
+                "unique_together": {("genre", "movie")},
+            },
+        ),
+        migrations.RunPython(backfill_leaderboards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0015_importcheckpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MovieSearchEntry",
+            fields=[
+                (
+                    "movie",
+                    models.OneToOneField(
+                        db_column="rowid",
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_entry",
+                        serialize=False,
+                        to="app.movie",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "app_movie_fts",
+                "managed": False,
+            },
+        ),
+    ]
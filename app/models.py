@@ -1,46 +1,482 @@
+import re
+
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.db.models import (
+    Case,
+    Count,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# The fixed MovieLens genres, their position is the bit of the genre in `genre_mask`.
+GENRES = [
+    "Action",
+    "Adventure",
+    "Animation",
+    "Children",
+    "Comedy",
+    "Crime",
+    "Documentary",
+    "Drama",
+    "Fantasy",
+    "Film-Noir",
+    "Horror",
+    "IMAX",
+    "Musical",
+    "Mystery",
+    "Romance",
+    "Sci-Fi",
+    "Thriller",
+    "War",
+    "Western",
+    "(no genres listed)",
+]
+GENRE_BITS = {genre.lower(): 1 << bit for bit, genre in enumerate(GENRES)}
+IMDB_URL = "http://www.imdb.com/title/tt{}/"
+TMDB_URL = "https://www.themoviedb.org/movie/{}"
+
+
+def split_genres(genres):
+    return [genre for genre in re.split(r"\s*[|,]\s*", genres or "") if genre]
+
+
+def split_tags(tags):
+    return [
+        tag for tag in (tag.strip().lower() for tag in (tags or "").split(",")) if tag
+    ]
+
+
+def genre_mask(genres):
+    return sum(GENRE_BITS.get(genre.lower(), 0) for genre in set(genres))
+
+
+class Genre(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
 
 
 class Movie(models.Model):
     title = models.CharField(max_length=255)
     year = models.PositiveSmallIntegerField(default=0)
     rate = models.FloatField(default=0.0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.FloatField(default=0.0, editable=False)
     genres = models.CharField(max_length=255, blank=True)
     tags = models.CharField(max_length=1000, blank=True)
     imdb_id = models.CharField(max_length=20, blank=True, null=True)
     tmdb_id = models.CharField(max_length=20, blank=True, null=True)
+    genre_mask = models.PositiveIntegerField(default=0, editable=False)
+    genre_list = models.ManyToManyField(
+        Genre, through="MovieGenre", related_name="movies", editable=False
+    )
+    tag_list = models.ManyToManyField(
+        Tag, through="MovieTag", related_name="movies", editable=False
+    )
 
     class Meta:
         unique_together = ("title", "year")
+        # Keyset pagination reads pages in (field, id) order.
+        indexes = [
+            models.Index(fields=["title", "id"]),
+            models.Index(fields=["year", "id"]),
+            models.Index(fields=["rate", "id"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.genre_mask = genre_mask(split_genres(self.genres))
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        # The ratings go first with a plain DELETE, so the cascade does not load
+        # them one by one to adjust the aggregates of a movie about to be deleted.
+        with transaction.atomic():
+            Rating.delete_movies([self.id])
+            return super().delete(*args, **kwargs)
+
+    def sync_taxonomy(self):
+        """
+        Mirror the `genres` and `tags` strings into the Genre and Tag tables.
+        """
+        for model, link_model, names in (
+            (Genre, MovieGenre, split_genres(self.genres)),
+            (Tag, MovieTag, split_tags(self.tags)),
+        ):
+            field = model._meta.model_name
+            link_model.objects.filter(movie=self).delete()
+            model.objects.bulk_create(
+                [model(name=name) for name in names], ignore_conflicts=True
+            )
+            link_model.objects.bulk_create(
+                [
+                    link_model(movie=self, **{f"{field}_id": pk})
+                    for pk in model.objects.filter(name__in=names).values_list(
+                        "id", flat=True
+                    )
+                ],
+                ignore_conflicts=True,
+            )
 
     def imdb_url(self):
         if self.imdb_id:
-            return f"http://www.imdb.com/title/tt{self.imdb_id}/"
+            return IMDB_URL.format(self.imdb_id)
         return None
 
     def tmdb_url(self):
         if self.tmdb_id:
-            return f"https://www.themoviedb.org/movie/{self.tmdb_id}"
+            return TMDB_URL.format(self.tmdb_id)
         return None
 
     def __str__(self):
         return f"{self.title} ({self.year})"
 
-    def update_rate(self):
-        total_rating = sum(rating.rate for rating in self.rating_set.all())
-        self.rate = total_rating / self.rating_set.count()
-        self.save()
+    @classmethod
+    def adjust_rate(cls, movie_id, count_delta, sum_delta, rescore=True):
+        """
+        Shift the running rating aggregates of a movie in a single UPDATE.
+        The new average is computed by the database from the stored pair,
+        so no Rating rows are read. The leaderboard scores follow, unless
+        `rescore` is False for a caller that rescores several movies at once.
+        """
+        count = F("rating_count") + count_delta
+        total = F("rating_sum") + sum_delta
+        updated = cls.objects.filter(id=movie_id).update(
+            rating_count=count,
+            rating_sum=total,
+            rate=Case(
+                When(rating_count__gt=-count_delta, then=total / count),
+                default=Value(0.0),
+            ),
+        )
+        if rescore:
+            LeaderboardEntry.update_scores([movie_id])
+        return updated
+
+    @classmethod
+    def rebuild_rates(cls, movie_ids=None):
+        """
+        Recompute `rating_count`, `rating_sum` and `rate` from the Rating table
+        with set-based UPDATEs, for every movie or only for `movie_ids`. The
+        leaderboards are rebuilt, or only rescored for `movie_ids`.
+        """
+        movies = cls.objects.all()
+        if movie_ids is not None:
+            movies = movies.filter(id__in=movie_ids)
+
+        ratings = Rating.objects.filter(movie=OuterRef("pk")).values("movie")
+        updated = movies.update(
+            rating_count=Coalesce(
+                Subquery(ratings.annotate(count=Count("id")).values("count")), 0
+            ),
+            rating_sum=Coalesce(
+                Subquery(ratings.annotate(total=Sum("rate")).values("total")), 0.0
+            ),
+        )
+        movies.update(
+            rate=Case(
+                When(rating_count__gt=0, then=F("rating_sum") / F("rating_count")),
+                default=Value(0.0),
+            )
+        )
+        if movie_ids is None:
+            LeaderboardEntry.rebuild()
+        else:
+            LeaderboardEntry.update_scores(movie_ids)
+        return updated
 
 
 class Rating(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
     rate = models.FloatField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         unique_together = ("user", "movie")
 
+    @classmethod
+    def upsert_many(cls, user, rates):
+        """
+        Create or update the ratings of a user from a {movie ID: rate} mapping in one
+        transaction, then shift the aggregates of each movie by the difference with
+        the previous rates. bulk_create sends no signals. Returns the movie IDs that
+        were already rated.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            existing = dict(
+                cls.objects.filter(user=user, movie_id__in=list(rates)).values_list(
+                    "movie_id", "rate"
+                )
+            )
+            cls.objects.bulk_create(
+                [
+                    cls(user=user, movie_id=movie_id, rate=rate, timestamp=now)
+                    for movie_id, rate in rates.items()
+                ],
+                update_conflicts=True,
+                unique_fields=["user", "movie"],
+                update_fields=["rate", "timestamp"],
+            )
+            changed = []
+            for movie_id, rate in rates.items():
+                previous = existing.get(movie_id)
+                if previous is None:
+                    Movie.adjust_rate(movie_id, 1, rate, rescore=False)
+                elif previous != rate:
+                    Movie.adjust_rate(movie_id, 0, rate - previous, rescore=False)
+                else:
+                    continue
+                changed.append(movie_id)
+            LeaderboardEntry.update_scores(changed)
+        return set(existing)
+
+    @classmethod
+    def delete_movies(cls, movie_ids):
+        """
+        Delete the ratings of `movie_ids` without loading them or sending signals,
+        for movies that are deleted next.
+        """
+        return cls.objects.filter(movie_id__in=movie_ids)._raw_delete(cls.objects.db)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so signals can apply rating deltas.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def __str__(self):
         return f"{self.user.username} rating for {self.movie.title}: {self.rating}"
+
+
+class MovieGenre(models.Model):
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE)
+
+    class Meta:
+        # Leads with the genre so "movies of a genre" is an index range scan.
+        unique_together = ("genre", "movie")
+
+
+class MovieTag(models.Model):
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ("tag", "movie")
+
+
+class MovieSearchEntry(models.Model):
+    """
+    A row of the FTS5 table of app.search, created by migration 0010. Unmanaged, it
+    only lets a movie queryset join the table on its rowid.
+    """
+
+    movie = models.OneToOneField(
+        Movie,
+        primary_key=True,
+        db_column="rowid",
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name="search_entry",
+    )
+
+    class Meta:
+        managed = False
+        db_table = "app_movie_fts"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    A movie on the overall leaderboard, without genre, or on the leaderboard of one
+    of its genres, ranked by the Bayesian average of its ratings:
+        (prior_count * prior_mean + rating_sum) / (prior_count + rating_count)
+    `prior_mean` is the mean rating of the leaderboard at its last full rebuild, so
+    movies with few ratings are pulled towards it. The index covers the top-N
+    queries: rows are read in score order and filtered on year and count without
+    reading the table.
+    """
+
+    genre = models.ForeignKey(
+        Genre, null=True, on_delete=models.CASCADE, related_name="+"
+    )
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="+")
+    year = models.PositiveSmallIntegerField()
+    rating_count = models.PositiveIntegerField()
+    prior_mean = models.FloatField()
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ("genre", "movie")
+        indexes = [
+            models.Index(
+                fields=["genre", "-score", "movie", "year", "rating_count"],
+                name="leaderboard_top_idx",
+            ),
+        ]
+
+    @staticmethod
+    def prior_count():
+        return getattr(settings, "LEADERBOARD_PRIOR_COUNT", 25)
+
+    @classmethod
+    def prior_means(cls, genre_ids, reuse=True):
+        """
+        The mean rating of the leaderboards of `genre_ids`, None for the overall one.
+        With `reuse`, the mean stored on a leaderboard is kept, so its rows stay
+        comparable, and only empty leaderboards are computed.
+        """
+        means = {}
+        if reuse:
+            for genre_id in genre_ids:
+                stored = list(
+                    cls.objects.filter(genre_id=genre_id).values_list(
+                        "prior_mean", flat=True
+                    )[:1]
+                )
+                if stored:
+                    means[genre_id] = stored[0]
+
+        missing = [genre_id for genre_id in genre_ids if genre_id not in means]
+        totals = []
+        if None in missing:
+            totals.append(
+                (
+                    None,
+                    Movie.objects.aggregate(s=Sum("rating_sum"), c=Sum("rating_count")),
+                )
+            )
+        genres = (
+            MovieGenre.objects.filter(
+                genre_id__in=[g for g in missing if g is not None]
+            )
+            .values("genre")
+            .annotate(s=Sum("movie__rating_sum"), c=Sum("movie__rating_count"))
+        )
+        totals.extend((row["genre"], row) for row in genres)
+        for genre_id, total in totals:
+            means[genre_id] = total["s"] / total["c"] if total["c"] else 0.0
+        return {genre_id: means.get(genre_id, 0.0) for genre_id in genre_ids}
+
+    @classmethod
+    def rebuild(cls, movie_ids=None):
+        """
+        Recreate the leaderboard rows of every movie, with new prior means, or only
+        of `movie_ids`, keeping the prior means of their leaderboards.
+        """
+        movies = Movie.objects.all()
+        links = MovieGenre.objects.all()
+        entries = cls.objects.all()
+        if movie_ids is not None:
+            movies = movies.filter(id__in=movie_ids)
+            links = links.filter(movie_id__in=movie_ids)
+            entries = entries.filter(movie_id__in=movie_ids)
+
+        with transaction.atomic():
+            stats = {
+                movie_id: (year, count, total)
+                for movie_id, year, count, total in movies.values_list(
+                    "id", "year", "rating_count", "rating_sum"
+                )
+            }
+            boards = [(None, movie_id) for movie_id in stats] + list(
+                links.values_list("genre_id", "movie_id")
+            )
+            means = cls.prior_means(
+                {genre_id for genre_id, _ in boards} | {None},
+                reuse=movie_ids is not None,
+            )
+            prior = cls.prior_count()
+
+            entries.delete()
+            cls.objects.bulk_create(
+                [
+                    cls(
+                        genre_id=genre_id,
+                        movie_id=movie_id,
+                        year=stats[movie_id][0],
+                        rating_count=stats[movie_id][1],
+                        prior_mean=means[genre_id],
+                        score=(prior * means[genre_id] + stats[movie_id][2])
+                        / (prior + stats[movie_id][1]),
+                    )
+                    for genre_id, movie_id in boards
+                    if movie_id in stats
+                ],
+                batch_size=1000,
+            )
+
+    @classmethod
+    def update_scores(cls, movie_ids):
+        """
+        Refresh the counts and scores of the rows of `movie_ids` from the movie
+        aggregates in one UPDATE, keeping their prior means.
+        """
+        movie = Movie.objects.filter(id=OuterRef("movie"))
+        count = Subquery(movie.values("rating_count"))
+        total = Subquery(movie.values("rating_sum"))
+        prior = cls.prior_count()
+        return cls.objects.filter(movie_id__in=movie_ids).update(
+            rating_count=count,
+            score=ExpressionWrapper(
+                (F("prior_mean") * prior + total) / (count + prior),
+                output_field=models.FloatField(),
+            ),
+        )
+
+
+class DatasetFile(models.Model):
+    """
+    Fingerprint of an imported dataset file. The incremental sync skips the files
+    whose size, mtime or content hash did not change, and the rating buckets whose
+    `chunks` digest did not change.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    mtime = models.FloatField()
+    digest = models.CharField(max_length=64)
+    # {bucket: digest} of the files synced by key range.
+    chunks = models.JSONField(default=dict)
+    # The movie IDs imported from the file, so a sync only deletes dataset movies.
+    keys = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of a full import of a dataset file: its rows before `offset`, in bytes,
+    are committed. Saved with each chunk, so `load_datasets --resume` continues an
+    interrupted import from there. Removed once the import completes.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    mtime = models.FloatField()
+    offset = models.BigIntegerField()
+    rows = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
@@ -1,7 +1,218 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import hashlib
+import json
+
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import InvalidPage
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from app.cache import CATALOGUE_VERSION_KEY, LIST_VERSION_KEY, get_cache, get_versions
+
+COUNT_CACHE_TIMEOUT = 60
+
+
+def cached_count(queryset):
+    """
+    COUNT(*) of a queryset, cached for `COUNT_CACHE_TIMEOUT` seconds per SQL query
+    in the movies cache. The key holds the catalogue and list versions of app.cache,
+    so a movie change starts a new count.
+    """
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        # A .none() queryset, such as a search without any term.
+        return 0
+    versions = get_versions([CATALOGUE_VERSION_KEY, LIST_VERSION_KEY])
+    digest = hashlib.md5(repr((sql, versions)).encode()).hexdigest()
+    return get_cache().get_or_set(
+        f"movies:count:{digest}", queryset.count, COUNT_CACHE_TIMEOUT
+    )
+
+
+class CachedCountPaginator(DjangoPaginator):
+    @cached_property
+    def count(self):
+        return cached_count(self.object_list)
 
 
 class MoviesPagination(PageNumberPagination):
+    """
+    Page number pagination that returns the page as a lazy queryset instead of a
+    list of movies, so the list serializer can read it with `.values_list()`.
+    """
+
     page_size = 25
     page_size_query_param = "page_size"
     max_page_size = 100
+    django_paginator_class = CachedCountPaginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return self.page.object_list
+
+
+class MoviesCursorPagination(BasePagination):
+    """
+    Keyset pagination, opted into with `pagination=cursor` or a `cursor` parameter.
+
+    Pages are read with `WHERE (field, id) > (last field, last id)` on the
+    (field, id) composite indexes of Movie instead of an OFFSET, so deep pages cost
+    the same as the first one. The field is the first ordering of the queryset, one
+    of `keyset_fields`, or `title` when it is unordered. Other orderings, such as the
+    rank of a `q` search, are rejected. The total is only counted, through the count
+    cache, when `count=true` is passed.
+    """
+
+    page_size = 25
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    # The fields pages can be keyed on, and the JSON types of their cursor values.
+    keyset_fields = {"title": (str,), "year": (int,), "rate": (int, float)}
+    default_field = "title"
+
+    @classmethod
+    def is_requested(cls, request):
+        params = request.query_params
+        return cls.cursor_query_param in params or params.get("pagination") == "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.field, self.descending = self.get_keyset(queryset)
+        value, pk, self.reverse = self.decode_cursor(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) == "true":
+            self.count = cached_count(queryset)
+
+        # Reading backwards inverts the ordering, and the page is flipped afterwards.
+        descending = self.descending != self.reverse
+        prefix = "-" if descending else ""
+        queryset = queryset.order_by(f"{prefix}{self.field}", f"{prefix}id")
+        if pk is not None:
+            lookup = "lt" if descending else "gt"
+            queryset = queryset.filter(
+                Q(**{f"{self.field}__{lookup}": value})
+                | Q(**{self.field: value, f"id__{lookup}": pk})
+            )
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = pk is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, pk is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_keyset(self, queryset):
+        ordering = list(queryset.query.order_by)
+        if not ordering:
+            return self.default_field, False
+        first = ordering[0] if isinstance(ordering[0], str) else ""
+        if first.lstrip("-") not in self.keyset_fields:
+            raise ValidationError(
+                {
+                    "pagination": "Only orderings by "
+                    f"{', '.join(self.keyset_fields)} can be paged with a cursor."
+                }
+            )
+        return first.lstrip("-"), first.startswith("-")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, None, False
+        try:
+            value, pk, reverse = json.loads(base64.urlsafe_b64decode(encoded))
+            pk = int(pk)
+        except (binascii.Error, ValueError, TypeError):
+            raise NotFound("Invalid cursor")
+        # bool is an int, but never a keyset value.
+        types = self.keyset_fields[self.field]
+        if isinstance(value, bool) or not isinstance(value, types):
+            raise NotFound("Invalid cursor")
+        return value, pk, bool(reverse)
+
+    def encode_cursor(self, instance, reverse):
+        position = [getattr(instance, self.field), instance.pk, reverse]
+        encoded = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param
+            )
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        response = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+        if self.count is not None:
+            response = {"count": self.count, **response}
+        return Response(response)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Include the total count when `true`.",
+                "schema": {"type": "boolean"},
+            },
+        ]
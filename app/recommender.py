@@ -0,0 +1,321 @@
+"""
+Item-item collaborative filtering over the Rating table.
+
+The model is built offline by the `build_recommender` management command and
+served from memory-mapped NumPy files, so a request only reads the neighbour rows
+it needs.
+
+Building:
+    Every movie with at least `min_ratings` ratings is a row of a sparse movie x user
+    matrix of its item-mean-centred ratings. Rows are L2 normalized, so the
+    similarity of two movies is the cosine of their rows. It is damped by
+    `common / (common + shrinkage)`, where `common` is the number of users who
+    rated both. The similarities are computed in blocks of rows with sparse matrix
+    products. Only the `neighbours` best positive ones are kept per movie.
+
+    An incremental build only recomputes the rows of movies whose rating count or
+    sum changed since the previous build. The new scores are merged into the
+    neighbour lists of the other movies. A neighbour whose similarity dropped can
+    leave a list shorter than a full build would give, until the next full build.
+
+Files, in `RECOMMENDER_MODEL_DIR`:
+    model.json: build parameters and the version of the array files.
+    movie_ids.<version>.npy: sorted movie IDs, the row of a movie is its position.
+    neighbours.<version>.npy: (movies, neighbours) rows of the neighbours, -1 pads.
+    scores.<version>.npy: (movies, neighbours) similarities of the neighbours.
+    rating_counts.<version>.npy, rating_sums.<version>.npy: the ratings the rows
+        were built from, compared by incremental builds.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection
+from scipy import sparse
+
+from app.models import Movie, Rating
+from app.utils.arrays import ColumnBuffer, load_arrays, save_arrays
+
+ARRAYS = ["movie_ids", "neighbours", "scores", "rating_counts", "rating_sums"]
+BLOCK_SIZE = 256
+FETCH_SIZE = 100_000
+
+
+@dataclass
+class SimilarityModel:
+    movie_ids: np.ndarray
+    neighbours: np.ndarray
+    scores: np.ndarray
+    rating_counts: np.ndarray
+    rating_sums: np.ndarray
+    params: dict
+
+    def rows(self, movie_ids):
+        """
+        Rows of the given movie IDs, -1 for the movies that are not in the model.
+        """
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        if len(self.movie_ids) == 0:
+            return np.full(len(movie_ids), -1)
+        rows = np.searchsorted(self.movie_ids, movie_ids)
+        rows = np.minimum(rows, len(self.movie_ids) - 1)
+        return np.where(self.movie_ids[rows] == movie_ids, rows, -1)
+
+    def similar(self, movie_id, limit=20):
+        """
+        (movie ID, similarity) pairs of the most similar movies.
+        """
+        row = self.rows([movie_id])[0]
+        if row < 0:
+            return []
+        neighbours = self.neighbours[row]
+        found = neighbours >= 0
+        return list(
+            zip(
+                self.movie_ids[neighbours[found]][:limit].tolist(),
+                self.scores[row][found][:limit].tolist(),
+            )
+        )
+
+    def recommend(self, ratings, limit=20):
+        """
+        (movie ID, score) pairs for a user with the given {movie ID: rate} ratings.
+
+        Every rated movie votes for its neighbours with its similarity, weighted by
+        how much the user's rate is above their mean rate.
+        """
+        rated = self.rows(list(ratings))
+        rates = np.fromiter(ratings.values(), dtype=np.float32, count=len(ratings))
+        found = rated >= 0
+        rated, rates = rated[found], rates[found]
+        if not len(rated):
+            return []
+
+        weights = rates - rates.mean()
+        if not weights.any():
+            weights = np.ones_like(rates)
+
+        neighbours = self.neighbours[rated]
+        votes = self.scores[rated] * weights[:, None]
+        found = neighbours >= 0
+        totals = np.bincount(
+            neighbours[found], weights=votes[found], minlength=len(self.movie_ids)
+        )
+        totals[rated] = 0
+
+        limit = min(limit, int((totals > 0).sum()))
+        if not limit:
+            return []
+        best = np.argpartition(-totals, limit - 1)[:limit]
+        best = best[np.argsort(-totals[best], kind="stable")]
+        return list(zip(self.movie_ids[best].tolist(), totals[best].tolist()))
+
+
+def get_model_dir():
+    return Path(settings.RECOMMENDER_MODEL_DIR)
+
+
+def read_ratings():
+    """
+    (user IDs, movie IDs, rates) arrays of the Rating table, fetched in batches into
+    typed columns.
+    """
+    buffer = ColumnBuffer([np.int32, np.int32, np.float32], Rating.objects.count())
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT user_id, movie_id, rate FROM {Rating._meta.db_table}")
+        buffer.fetch(cursor, FETCH_SIZE)
+    return buffer.arrays()
+
+
+def read_ratings_csv(file_path):
+    """
+    (user IDs, movie IDs, rates) arrays of a MovieLens ratings.csv file.
+    """
+    frame = pd.read_csv(
+        file_path,
+        usecols=["userId", "movieId", "rating"],
+        dtype={"userId": np.int32, "movieId": np.int32, "rating": np.float32},
+    )
+    return (
+        frame["userId"].to_numpy(),
+        frame["movieId"].to_numpy(),
+        frame["rating"].to_numpy(),
+    )
+
+
+def rating_matrices(users, movies, rates, min_ratings):
+    """
+    Movie IDs, rating counts and sums, the normalized centred rating matrix and the
+    binary rating matrix of the movies with at least `min_ratings` ratings.
+    """
+    movie_ids, movie_rows, counts = np.unique(
+        movies, return_inverse=True, return_counts=True
+    )
+    sums = np.bincount(movie_rows, weights=rates)
+    kept = counts >= min_ratings
+    ratings = kept[movie_rows]
+    movie_ids, counts, sums = movie_ids[kept], counts[kept], sums[kept]
+
+    rows = np.cumsum(kept)[movie_rows[ratings]] - 1
+    _, columns = np.unique(users[ratings], return_inverse=True)
+    shape = (len(movie_ids), int(columns.max()) + 1 if len(columns) else 0)
+
+    centred = rates[ratings] - (sums / np.maximum(counts, 1))[rows]
+    matrix = sparse.csr_matrix(
+        (centred.astype(np.float32), (rows, columns)), shape=shape
+    )
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    matrix = sparse.diags(scale.astype(np.float32)) @ matrix
+
+    rated = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=shape
+    )
+    return movie_ids, counts.astype(np.int64), sums, matrix.tocsr(), rated
+
+
+def similarity_block(matrix, rated, rows, shrinkage):
+    """
+    Damped similarities of the given rows to every row, with the diagonal removed.
+    """
+    scores = (matrix[rows] @ matrix.T).toarray()
+    if shrinkage:
+        common = (rated[rows] @ rated.T).toarray()
+        scores *= common / (common + shrinkage)
+    scores[np.arange(len(rows)), rows] = 0
+    return scores
+
+
+def top_k(candidates, scores, k):
+    """
+    The `k` best positive (candidate, score) pairs of every row, best first, padded
+    with -1 and 0.
+    """
+    scores = np.where(candidates >= 0, scores, 0)
+    if scores.shape[1] > k:
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidates = np.take_along_axis(candidates, best, axis=1)
+        scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    candidates = np.take_along_axis(candidates, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+
+    missing = scores <= 0
+    candidates[missing], scores[missing] = -1, 0
+    if scores.shape[1] < k:
+        padding = ((0, 0), (0, k - scores.shape[1]))
+        candidates = np.pad(candidates, padding, constant_values=-1)
+        scores = np.pad(scores, padding)
+    return candidates, scores.astype(np.float32)
+
+
+def build_model(ratings, neighbours=50, min_ratings=5, shrinkage=10.0, previous=None):
+    """
+    Build a SimilarityModel from (user IDs, movie IDs, rates) arrays.
+
+    With a `previous` model built with the same parameters, only the rows of the
+    movies whose ratings changed are recomputed. Returns the model and the number of
+    recomputed rows.
+    """
+    movie_ids, counts, sums, matrix, rated = rating_matrices(*ratings, min_ratings)
+    params = {
+        "neighbours": neighbours,
+        "min_ratings": min_ratings,
+        "shrinkage": shrinkage,
+    }
+    size = len(movie_ids)
+    candidates = np.full((size, neighbours), -1, dtype=np.int32)
+    scores = np.zeros((size, neighbours), dtype=np.float32)
+
+    changed = np.ones(size, dtype=bool)
+    if previous is not None and previous.params == params:
+        old_rows = previous.rows(movie_ids)
+        known = old_rows >= 0
+        changed[known] = (counts[known] != previous.rating_counts[old_rows[known]]) | (
+            ~np.isclose(sums[known], previous.rating_sums[old_rows[known]])
+        )
+
+        # Remap the kept neighbour lists to the new rows, dropping the changed ones.
+        kept = np.flatnonzero(~changed)
+        old_neighbours = previous.neighbours[old_rows[kept]]
+        new_neighbours = np.full_like(old_neighbours, -1)
+        found = old_neighbours >= 0
+        remapped = np.full(len(previous.movie_ids), -1)
+        remapped[old_rows[known]] = np.flatnonzero(known)
+        new_neighbours[found] = remapped[old_neighbours[found]]
+        stale = (new_neighbours < 0) | changed[np.maximum(new_neighbours, 0)]
+        new_neighbours[stale] = -1
+        candidates[kept] = new_neighbours
+        scores[kept] = np.where(stale, 0, previous.scores[old_rows[kept]])
+
+    recomputed = np.flatnonzero(changed)
+    kept = np.flatnonzero(~changed)
+    for start in range(0, len(recomputed), BLOCK_SIZE):
+        rows = recomputed[start : start + BLOCK_SIZE]
+        block = similarity_block(matrix, rated, rows, shrinkage)
+
+        everything = np.broadcast_to(np.arange(size, dtype=np.int32), block.shape)
+        candidates[rows], scores[rows] = top_k(everything, block, neighbours)
+
+        # Similarities are symmetric, merge the block into the unchanged rows.
+        if len(kept):
+            merged = np.broadcast_to(rows.astype(np.int32), (len(kept), len(rows)))
+            candidates[kept], scores[kept] = top_k(
+                np.hstack([candidates[kept], merged]),
+                np.hstack([scores[kept], block[:, kept].T]),
+                neighbours,
+            )
+
+    model = SimilarityModel(
+        movie_ids=movie_ids,
+        neighbours=candidates,
+        scores=scores,
+        rating_counts=counts,
+        rating_sums=sums,
+        params=params,
+    )
+    return model, len(recomputed)
+
+
+def save_model(model, model_dir=None):
+    """
+    Write the model arrays under a new version, switch model.json to it and remove
+    the arrays of the previous versions.
+    """
+    save_arrays(
+        model_dir or get_model_dir(),
+        "model.json",
+        {name: getattr(model, name) for name in ARRAYS},
+        {**model.params, "movies": len(model.movie_ids)},
+    )
+
+
+def load_model(model_dir=None):
+    """
+    The memory-mapped model of `model_dir`, or None when none was built.
+
+    The model is kept per process and reloaded when model.json changes.
+    """
+
+    def make_model(meta, arrays):
+        meta.pop("movies")
+        return SimilarityModel(**arrays, params=meta)
+
+    return load_arrays(model_dir or get_model_dir(), "model.json", ARRAYS, make_model)
+
+
+def scored_movies(pairs):
+    """
+    Movies of (movie ID, score) pairs, in order, with the score set on `score`.
+    """
+    movies = Movie.objects.in_bulk([movie_id for movie_id, _ in pairs])
+    result = []
+    for movie_id, score in pairs:
+        if movie_id in movies:
+            movie = movies[movie_id]
+            movie.score = score
+            result.append(movie)
+    return result
@@ -0,0 +1,115 @@
+"""
+JSON renderer of the API on orjson, installed with the `fast-json` extra, and the
+NDJSON and CSV renderers of the streamed exports.
+"""
+
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from app.metrics import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LINE_SEPARATORS = [("\u2028".encode(), b"\\u2028"), ("\u2029".encode(), b"\\u2029")]
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Renders the same compact JSON as JSONRenderer with orjson. Falls back to
+    JSONRenderer without orjson, for indented output, when the settings ask for
+    ASCII or spaced JSON, and for values orjson cannot encode. Timed as the
+    `render` phase of the request metrics.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed("render"):
+            return self.render_data(data, accepted_media_type, renderer_context)
+
+    def render_data(self, data, accepted_media_type, renderer_context):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or data is None or indent or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            content = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Escaped like JSONRenderer, so the output stays a JavaScript subset.
+        for separator, escaped in LINE_SEPARATORS:
+            if separator in content:
+                content = content.replace(separator, escaped)
+        return content
+
+
+def render_json(data):
+    return FastJSONRenderer().render(data)
+
+
+def json_line(item):
+    if orjson is not None:
+        return orjson.dumps(item) + b"\n"
+    return json.dumps(item, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline delimited JSON, one object per line. `render` puts each item of a list
+    on its line, and anything else on a single line. Streams render a header, then
+    batches of rows with `render_rows`.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        items = data if isinstance(data, list) else [data]
+        return b"".join(json_line(item) for item in items)
+
+    def render_header(self, fields):
+        return b""
+
+    def render_rows(self, fields, rows):
+        return b"".join(json_line(dict(zip(fields, row))) for row in rows)
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    CSV with a header row, of a list of objects or of a single one such as an error.
+    List values are joined with spaces.
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        items = data if isinstance(data, list) else [data]
+        fields = list(items[0]) if items else []
+        rows = (
+            [
+                " ".join(map(str, value)) if isinstance(value, list) else value
+                for value in (item.get(field) for field in fields)
+            ]
+            for item in items
+        )
+        return self.render_header(fields) + self.render_rows(fields, rows)
+
+    def render_header(self, fields):
+        return self.render_rows(fields, [fields])
+
+    def render_rows(self, fields, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode()
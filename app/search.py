@@ -0,0 +1,138 @@
+"""
+Full-text search over the movie catalogue.
+
+The backend is selected with the `MOVIE_SEARCH_BACKEND` setting. Backends rank the
+movies matching a user query and keep their index in sync with the Movie table.
+
+Classes:
+    DatabaseSearchBackend:
+        Portable fallback, matching every term as a substring of the title, genres or
+        tags with `icontains`. Has no index to maintain.
+
+    SQLiteFTSSearchBackend:
+        Uses the `app_movie_fts` FTS5 virtual table created by the migrations, joined
+        through the unmanaged MovieSearchEntry model. Terms are prefix-matched through
+        the FTS prefix indexes and the results ranked with bm25.
+        Falls back to DatabaseSearchBackend on other database vendors.
+"""
+
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from app.models import Movie
+
+FTS_TABLE = "app_movie_fts"
+SEARCH_FIELDS = ["title", "genres", "tags"]
+
+
+def search_terms(query):
+    return re.findall(r"\w+", query)
+
+
+class DatabaseSearchBackend:
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        conditions = [
+            reduce(or_, (Q(**{f"{field}__icontains": term}) for field in SEARCH_FIELDS))
+            for term in terms
+        ]
+        if not conditions:
+            return queryset.none()
+        return queryset.filter(reduce(and_, conditions))
+
+    def index(self, movie):
+        pass
+
+    def remove(self, movie_id):
+        pass
+
+    def clear(self):
+        pass
+
+    def rebuild(self):
+        return 0
+
+
+class SQLiteFTSSearchBackend(DatabaseSearchBackend):
+    # bm25 weights of the title, genres and tags columns.
+    weights = (10.0, 1.0, 2.0)
+
+    def is_available(self):
+        return connection.vendor == "sqlite"
+
+    def search(self, queryset, query):
+        if not self.is_available():
+            return super().search(queryset, query)
+
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+
+        # Every term is quoted so user input never reaches the FTS query syntax.
+        match = " ".join(f'"{term}"*' for term in terms)
+        weights = ", ".join(str(weight) for weight in self.weights)
+        # Joined through MovieSearchEntry, as MATCH and bm25 need the FTS table in the
+        # query itself. The inner join lets SQLite start from the matches.
+        return (
+            queryset.filter(search_entry__isnull=False)
+            .filter(
+                RawSQL(f"{FTS_TABLE} MATCH %s", [match], output_field=BooleanField())
+            )
+            .annotate(
+                search_rank=RawSQL(
+                    f"bm25({FTS_TABLE}, {weights})", [], output_field=FloatField()
+                )
+            )
+            .order_by("search_rank", "title")
+        )
+
+    def index(self, movie):
+        if not self.is_available():
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [movie.id])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(SEARCH_FIELDS)}) "
+                "VALUES (%s, %s, %s, %s)",
+                [movie.id, movie.title, movie.genres, movie.tags],
+            )
+
+    def remove(self, movie_id):
+        if not self.is_available():
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [movie_id])
+
+    def clear(self):
+        if not self.is_available():
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+    def rebuild(self):
+        if not self.is_available():
+            return 0
+        self.clear()
+        columns = ", ".join(SEARCH_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, {columns}) "
+                f"SELECT id, {columns} FROM {Movie._meta.db_table}"
+            )
+            rows = cursor.rowcount
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        return rows
+
+
+def get_search_backend():
+    backend_class = import_string(
+        getattr(settings, "MOVIE_SEARCH_BACKEND", "app.search.DatabaseSearchBackend")
+    )
+    return backend_class()
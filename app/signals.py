@@ -1,9 +1,86 @@
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import Rating
+from .autocomplete import expire_index
+from .cache import invalidate_movies
+from .metrics import install_query_recorder
+from .models import LeaderboardEntry, Movie, Rating
+from .search import get_search_backend
+from .utils.database import set_pragmas
 
 
 @receiver(post_save, sender=Rating)
-def update_movie_rate(sender, instance, **kwargs):
-    instance.movie.update_rate()
+def update_movie_rate(sender, instance, created, **kwargs):
+    loaded = getattr(instance, "_loaded_values", None)
+
+    if created:
+        Movie.adjust_rate(instance.movie_id, 1, instance.rate)
+    elif loaded is None or not {"movie_id", "rate"} <= loaded.keys():
+        # The previous value is unknown, fall back to a recompute of this movie.
+        Movie.rebuild_rates([instance.movie_id])
+    elif loaded["movie_id"] != instance.movie_id:
+        Movie.adjust_rate(loaded["movie_id"], -1, -loaded["rate"])
+        Movie.adjust_rate(instance.movie_id, 1, instance.rate)
+    elif loaded["rate"] != instance.rate:
+        Movie.adjust_rate(instance.movie_id, 0, instance.rate - loaded["rate"])
+
+    instance._loaded_values = {"movie_id": instance.movie_id, "rate": instance.rate}
+
+
+@receiver(post_delete, sender=Rating)
+def revert_movie_rate(sender, instance, origin=None, **kwargs):
+    # Ratings deleted with their movie have no aggregates left to adjust.
+    if isinstance(origin, Movie) or getattr(origin, "model", None) is Movie:
+        return
+    Movie.adjust_rate(instance.movie_id, -1, -instance.rate)
+
+
+@receiver(post_save, sender=Movie)
+def index_movie(sender, instance, **kwargs):
+    get_search_backend().index(instance)
+
+
+@receiver(post_save, sender=Movie)
+def sync_movie_taxonomy(sender, instance, **kwargs):
+    instance.sync_taxonomy()
+
+
+@receiver(post_save, sender=Movie)
+def rank_movie(sender, instance, **kwargs):
+    # After sync_movie_taxonomy, the genre leaderboards follow the genre links.
+    LeaderboardEntry.rebuild([instance.id])
+
+
+@receiver(post_delete, sender=Movie)
+def unindex_movie(sender, instance, **kwargs):
+    get_search_backend().remove(instance.id)
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def expire_cached_movie(sender, instance, **kwargs):
+    invalidate_movies([instance.id])
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def expire_autocomplete_index(sender, instance, **kwargs):
+    expire_index()
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def expire_cached_rated_movie(sender, instance, **kwargs):
+    invalidate_movies([instance.movie_id])
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    set_pragmas(getattr(settings, "SQLITE_PRAGMAS", {}), connection)
+
+
+@receiver(connection_created)
+def record_connection_queries(sender, connection, **kwargs):
+    install_query_recorder(connection)
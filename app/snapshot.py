@@ -0,0 +1,379 @@
+"""
+Binary snapshot of the imported catalogue, to bootstrap a replica or a test
+environment without parsing the MovieLens CSV files again.
+
+`export_snapshot` writes the movies as imported, with their transformed titles,
+genres, tags and links, the genre and tag links, and the ratings of the MovieLens
+users, as columnar NumPy files. `import_snapshot` memory-maps them and inserts the
+rows in batches straight from the columns: no CSV is parsed and no title, tag or
+link is transformed again. It then rebuilds the rates, the search index and the
+stores like `load_datasets`, and restores the fingerprints of the dataset files, so
+`load_datasets --sync` can apply the next release. The ratings of the API users are
+not part of the snapshot.
+
+Strings are stored as UTF-8 bytes and offsets: value `i` of the column `c` is
+`c_bytes[c_offsets[i]:c_offsets[i + 1]]`, and a nullable column has a `c_null`
+mask. Timestamps are seconds since the epoch.
+
+Files, in `SNAPSHOT_DIR` by default:
+    snapshot.json: export time, row counts, the DatasetFile fingerprints and the
+        version of the array files.
+    movie_*: the Movie columns, sorted by ID.
+    genre_names, tag_names: the Genre and Tag names.
+    genre_movies, genre_links, tag_movies, tag_links: the movie links, the
+        `*_links` index the names.
+    rating_users, rating_movies, rating_rates, rating_timestamps: the ratings, by
+        MovieLens user ID.
+"""
+
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+
+from app.cache import invalidate_movies
+from app.models import DatasetFile, Genre, Movie, MovieGenre, MovieTag, Rating, Tag
+from app.utils.arrays import ColumnBuffer, load_arrays, rows_column, save_arrays
+from app.utils.database import is_postgresql, set_pragmas
+from app.utils.load_datasets import (
+    finish_import,
+    insert_rows,
+    map_users,
+    movielens_users,
+    report_stage,
+    reset_tables,
+)
+
+SNAPSHOT_FILE = "snapshot.json"
+SNAPSHOT_VERSION = 1
+STRING_COLUMNS = ["title", "genres", "tags", "imdb_id", "tmdb_id"]
+NULLABLE_COLUMNS = ["imdb_id", "tmdb_id"]
+NUMBER_COLUMNS = {"id": np.int64, "year": np.int32, "genre_mask": np.int64}
+# The rating columns, filled batch by batch without a float64 copy of the rows.
+RATING_COLUMNS = {
+    "rating_users": np.int32,
+    "rating_movies": np.int32,
+    "rating_rates": np.float32,
+    "rating_timestamps": np.int64,
+}
+ARRAYS = [
+    *(f"movie_{name}" for name in NUMBER_COLUMNS),
+    *(
+        f"movie_{name}_{part}"
+        for name in STRING_COLUMNS
+        for part in ("bytes", "offsets")
+    ),
+    *(f"movie_{name}_null" for name in NULLABLE_COLUMNS),
+    *(
+        f"{kind}_{part}"
+        for kind in ("genre", "tag")
+        for part in ("names_bytes", "names_offsets", "movies", "links")
+    ),
+    *RATING_COLUMNS,
+]
+FETCH_SIZE = 100_000
+# Rows per INSERT batch of an import, read from the memory-mapped columns.
+BATCH_ROWS = 200_000
+# MovieLens user IDs per `username IN` list.
+USER_BATCH_SIZE = 10_000
+
+
+@dataclass
+class Snapshot:
+    arrays: dict
+    meta: dict
+
+    def strings(self, name, start=0, end=None):
+        """
+        The values `start:end` of the string column `name`.
+        """
+        offsets = self.arrays[f"{name}_offsets"][
+            start : None if end is None else end + 1
+        ]
+        data = self.arrays[f"{name}_bytes"][offsets[0] : offsets[-1]].tobytes()
+        offsets = (offsets - offsets[0]).tolist()
+        values = [data[a:b].decode() for a, b in zip(offsets, offsets[1:])]
+        if f"{name}_null" in self.arrays:
+            null = self.arrays[f"{name}_null"][start:end].tolist()
+            values = [
+                None if missing else value for value, missing in zip(values, null)
+            ]
+        return values
+
+    def movies(self, start, end):
+        """
+        The Movie columns of the rows `start:end`, ready for insert_rows.
+        """
+        frame = pd.DataFrame(
+            {name: self.arrays[f"movie_{name}"][start:end] for name in NUMBER_COLUMNS}
+        )
+        for name in STRING_COLUMNS:
+            frame[name] = self.strings(f"movie_{name}", start, end)
+        return frame
+
+
+def get_snapshot_dir():
+    return Path(settings.SNAPSHOT_DIR)
+
+
+def encode_strings(values):
+    """
+    The UTF-8 bytes and offsets of `values`, None is stored as an empty string.
+    """
+    encoded = [(value or "").encode() for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def epoch_sql(column):
+    if is_postgresql(connection):
+        return f"CAST(EXTRACT(EPOCH FROM {column}) AS BIGINT)"
+    return f"CAST(strftime('%%s', {column}) AS INTEGER)"
+
+
+def datetime_values(seconds):
+    """
+    Database-ready values of the UTC datetimes of `seconds`, as insert_rows takes
+    them: text in Django's SQLite format, or timestamps for COPY on PostgreSQL.
+    """
+    if is_postgresql(connection):
+        return pd.to_datetime(seconds, unit="s", utc=True)
+    text = np.datetime_as_string(np.asarray(seconds, dtype="datetime64[s]"))
+    return np.char.replace(text, "T", " ")
+
+
+def read_movie_arrays():
+    columns = [*NUMBER_COLUMNS, *STRING_COLUMNS]
+    movies = list(Movie.objects.order_by("id").values_list(*columns))
+    arrays = {
+        f"movie_{name}": np.array([row[index] for row in movies], dtype=dtype)
+        for index, (name, dtype) in enumerate(NUMBER_COLUMNS.items())
+    }
+    for index, name in enumerate(STRING_COLUMNS, len(NUMBER_COLUMNS)):
+        values = [row[index] for row in movies]
+        arrays[f"movie_{name}_bytes"], arrays[f"movie_{name}_offsets"] = encode_strings(
+            values
+        )
+        if name in NULLABLE_COLUMNS:
+            arrays[f"movie_{name}_null"] = np.array(
+                [value is None for value in values], dtype=bool
+            )
+    return arrays
+
+
+def read_link_arrays(kind, model, link_model):
+    """
+    The names of `model` and the movie links of `link_model`, as `kind`_* arrays.
+    """
+    names = list(model.objects.order_by("id").values_list("id", "name"))
+    pks = np.array([pk for pk, _ in names], dtype=np.int64)
+    links = np.array(
+        link_model.objects.values_list("movie_id", f"{kind}_id"), dtype=np.int64
+    ).reshape(-1, 2)
+    names_bytes, names_offsets = encode_strings([name for _, name in names])
+    return {
+        f"{kind}_names_bytes": names_bytes,
+        f"{kind}_names_offsets": names_offsets,
+        f"{kind}_movies": links[:, 0],
+        f"{kind}_links": np.searchsorted(pks, links[:, 1]).astype(np.int32),
+    }
+
+
+def read_rating_arrays():
+    """
+    The ratings of the MovieLens users, by MovieLens user ID. They are fetched in
+    batches and copied into the typed columns as they arrive, so only one batch is
+    held as Python rows.
+    """
+    users = pd.Series(movielens_users(), dtype=np.int64)
+    movielens_ids = pd.Series(users.index, index=users.values, dtype=np.int64)
+
+    with transaction.atomic():
+        # An upper bound, the ratings of the API users are left out.
+        buffer = ColumnBuffer(list(RATING_COLUMNS.values()), Rating.objects.count())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT user_id, movie_id, rate, {epoch_sql('timestamp')} "
+                f"FROM {Rating._meta.db_table} ORDER BY user_id, movie_id",
+                [],
+            )
+            while rows := cursor.fetchmany(FETCH_SIZE):
+                user_pks = rows_column(rows, 0, np.int64)
+                kept = np.isin(user_pks, movielens_ids.index)
+                buffer.extend(
+                    movielens_ids.loc[user_pks[kept]].to_numpy(),
+                    rows_column(rows, 1, np.int32)[kept],
+                    rows_column(rows, 2, np.float32)[kept],
+                    rows_column(rows, 3, np.int64)[kept],
+                )
+    return dict(zip(RATING_COLUMNS, buffer.arrays()))
+
+
+def dataset_files():
+    return list(
+        DatasetFile.objects.order_by("name").values(
+            "name", "size", "mtime", "digest", "chunks", "keys"
+        )
+    )
+
+
+def export_snapshot(directory=None):
+    """
+    Writes the snapshot of the database to `directory`, and returns its row counts.
+    """
+    arrays = {
+        **read_movie_arrays(),
+        **read_link_arrays("genre", Genre, MovieGenre),
+        **read_link_arrays("tag", Tag, MovieTag),
+        **read_rating_arrays(),
+    }
+    counts = {
+        "movies": len(arrays["movie_id"]),
+        "genre links": len(arrays["genre_movies"]),
+        "tag links": len(arrays["tag_movies"]),
+        "ratings": len(arrays["rating_users"]),
+    }
+    save_arrays(
+        directory or get_snapshot_dir(),
+        SNAPSHOT_FILE,
+        arrays,
+        {
+            "snapshot_version": SNAPSHOT_VERSION,
+            "exported_at": time.time(),
+            "counts": counts,
+            "dataset_files": dataset_files(),
+        },
+    )
+    return counts
+
+
+def load_snapshot(directory=None):
+    """
+    The memory-mapped Snapshot of `directory`, or None when none was exported.
+    """
+    snapshot = load_arrays(
+        directory or get_snapshot_dir(),
+        SNAPSHOT_FILE,
+        ARRAYS,
+        lambda meta, arrays: Snapshot(arrays, meta),
+    )
+    if snapshot is not None and snapshot.meta["snapshot_version"] != SNAPSHOT_VERSION:
+        raise ValueError(
+            f"Snapshot version {snapshot.meta['snapshot_version']} is not supported, "
+            "export it again."
+        )
+    return snapshot
+
+
+def batches(length):
+    return (
+        (start, min(start + BATCH_ROWS, length))
+        for start in range(0, length, BATCH_ROWS)
+    )
+
+
+def import_movies(snapshot):
+    for start, end in batches(len(snapshot.arrays["movie_id"])):
+        insert_rows(Movie, snapshot.movies(start, end))
+
+
+def import_links(snapshot, kind, model, link_model):
+    names = snapshot.strings(f"{kind}_names")
+    model.objects.bulk_create(
+        [model(name=name) for name in names], ignore_conflicts=True
+    )
+    # The names may already exist under other IDs.
+    name_ids = dict(model.objects.values_list("name", "id"))
+    pks = np.array([name_ids[name] for name in names], dtype=np.int64)
+
+    movies, links = snapshot.arrays[f"{kind}_movies"], snapshot.arrays[f"{kind}_links"]
+    for start, end in batches(len(movies)):
+        insert_rows(
+            link_model,
+            pd.DataFrame(
+                {"movie_id": movies[start:end], f"{kind}_id": pks[links[start:end]]}
+            ),
+        )
+
+
+def import_genres(snapshot):
+    import_links(snapshot, "genre", Genre, MovieGenre)
+
+
+def import_tags(snapshot):
+    import_links(snapshot, "tag", Tag, MovieTag)
+
+
+def user_ids(movielens_ids):
+    """
+    The sorted MovieLens user IDs and the IDs of their placeholder users, created
+    when missing.
+    """
+    movielens_ids = np.unique(movielens_ids)
+    users = {}
+    for start in range(0, len(movielens_ids), USER_BATCH_SIZE):
+        users.update(map_users(movielens_ids[start : start + USER_BATCH_SIZE].tolist()))
+    return movielens_ids, np.array(
+        [users[user] for user in movielens_ids.tolist()], dtype=np.int64
+    )
+
+
+def import_ratings(snapshot):
+    arrays = snapshot.arrays
+    movielens_ids, pks = user_ids(arrays["rating_users"])
+    for start, end in batches(len(arrays["rating_users"])):
+        users = arrays["rating_users"][start:end]
+        insert_rows(
+            Rating,
+            pd.DataFrame(
+                {
+                    "user_id": pks[np.searchsorted(movielens_ids, users)],
+                    "movie_id": arrays["rating_movies"][start:end],
+                    "rate": arrays["rating_rates"][start:end].astype(np.float64),
+                    "timestamp": datetime_values(
+                        arrays["rating_timestamps"][start:end]
+                    ),
+                }
+            ),
+        )
+
+
+def import_snapshot(directory=None):
+    """
+    Replaces the movies and ratings with the snapshot of `directory`, then rebuilds
+    what `load_datasets` rebuilds after an import.
+    """
+    snapshot = load_snapshot(directory)
+    if snapshot is None:
+        raise FileNotFoundError(
+            f"No snapshot in {directory or get_snapshot_dir()}, run export_snapshot."
+        )
+    counts = snapshot.meta["counts"]
+    stages = [
+        ("movies", counts["movies"], import_movies),
+        ("genre links", counts["genre links"], import_genres),
+        ("tag links", counts["tag links"], import_tags),
+        ("ratings", counts["ratings"], import_ratings),
+    ]
+
+    previous_pragmas = set_pragmas(getattr(settings, "SQLITE_BULK_LOAD_PRAGMAS", {}))
+    try:
+        reset_tables()
+        for name, rows, stage in stages:
+            stage_start = time.time()
+            stage(snapshot)
+            report_stage(name, rows, stage_start)
+
+        finish_import()
+        DatasetFile.objects.bulk_create(
+            [DatasetFile(**fields) for fields in snapshot.meta["dataset_files"]]
+        )
+    finally:
+        set_pragmas(previous_pragmas)
+    invalidate_movies()
+    return counts
@@ -7,6 +7,8 @@ from app.api.v1.serializers.movies import (
     RateSerializer,
     RatingSerializer,
 )
+from app.api.v1.serializers.recommendations import ScoredMovieSerializer
+from app.models import Movie
 
 
 @pytest.mark.django_db
@@ -24,6 +26,24 @@ def test_movie_serializer(movie):
     }
 
 
+@pytest.mark.django_db
+def test_movie_list_serializer_matches_movie_serializer(create_movie):
+    create_movie(title="Heat", year=1995, imdb_id="0113277", tmdb_id="949")
+    create_movie(title="Amélie", year=2001, genres="Comedy, Romance", tags="paris")
+    movies = Movie.objects.order_by("title")
+    expected = [MovieSerializer(movie).data for movie in movies]
+
+    assert MovieSerializer(movies, many=True).data == expected
+    assert MovieSerializer(list(movies), many=True).data == expected
+
+    scored = list(movies)
+    for score, movie in enumerate(scored):
+        movie.score = score
+    assert ScoredMovieSerializer(scored, many=True).data == [
+        ScoredMovieSerializer(movie).data for movie in scored
+    ]
+
+
 @pytest.mark.django_db
 def test_movie_create_serializer():
     movie_data = {
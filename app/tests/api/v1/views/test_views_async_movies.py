@@ -0,0 +1,101 @@
+import pytest
+from django.test import Client
+from django.urls import reverse
+
+from app.models import Movie
+
+
+@pytest.fixture
+def client():
+    return Client()
+
+
+@pytest.mark.django_db
+def test_async_movie_list_view(client, api_client, create_movie):
+    for index in range(30):
+        create_movie(title=f"Movie {index:02}", year=1990 + index, genres="Drama")
+    create_movie(title="Comedy", year=2000, genres="Comedy")
+
+    response = client.get(reverse("async-movie-list"), {"genre": "Drama"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 30
+    assert [movie["title"] for movie in data["results"][:2]] == ["Movie 00", "Movie 01"]
+    assert len(data["results"]) == 25
+    assert data["previous"] is None
+
+    response = client.get(data["next"])
+    data = response.json()
+    assert len(data["results"]) == 5
+    assert data["next"] is None
+    assert "page=" not in data["previous"]
+
+    response = client.get(
+        reverse("async-movie-list"), {"ordering": "-year", "page_size": 2}
+    )
+    assert [movie["year"] for movie in response.json()["results"]] == [2019, 2018]
+
+    response = client.get(reverse("async-movie-list"), {"page": 9})
+    assert response.status_code == 404
+
+    response = client.get(
+        reverse("async-movie-list"), {"fields": "title", "page_size": 2}
+    )
+    assert response.status_code == 200
+    assert response.json()["results"] == [{"title": "Comedy"}, {"title": "Movie 00"}]
+
+    params = {"genre": "drama", "genre_match": "bogus"}
+    response = client.get(reverse("async-movie-list"), params)
+    assert response.status_code == 400
+    assert response.json() == api_client.get(reverse("movie-list"), params).json()
+
+
+@pytest.mark.django_db
+def test_async_movie_detail_view(client, movie):
+    url = reverse("async-movie-detail", args=[movie.id])
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.json()["title"] == "Inception"
+    assert client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code == 304
+
+    # Writes through the ORM expire the cached response.
+    Movie.objects.filter(id=movie.id).update(title="Inception (Director's Cut)")
+    movie.refresh_from_db()
+    movie.save()
+    response = client.get(url)
+    assert response.json()["title"] == "Inception (Director's Cut)"
+
+    response = client.get(url, {"fields": "id,title,my_rating"})
+    assert response.json() == {
+        "id": movie.id,
+        "title": "Inception (Director's Cut)",
+        "my_rating": None,
+    }
+    assert client.get(url, {"fields": "budget"}).status_code == 400
+
+    missing = client.get(reverse("async-movie-detail", args=[movie.id + 1]))
+    assert missing.status_code == 404
+    assert client.post(url).status_code == 405
+
+
+@pytest.mark.django_db
+def test_async_movie_search_view(client, create_movie):
+    create_movie(title="The Matrix", year=1999, genres="Sci-Fi")
+    create_movie(title="Matrix Reloaded", year=2003, genres="Sci-Fi")
+    create_movie(title="Heat", year=1995, genres="Crime")
+
+    response = client.get(reverse("async-movie-search"), {"q": "matrix"})
+    assert response.status_code == 200
+    assert {movie["title"] for movie in response.json()["results"]} == {
+        "The Matrix",
+        "Matrix Reloaded",
+    }
+
+    assert client.get(reverse("async-movie-search")).status_code == 400
+
+    # Punctuation only, there is no term to search.
+    for name in ["async-movie-search", "async-movie-list"]:
+        response = client.get(reverse(name), {"q": "!!!"})
+        assert response.status_code == 200
+        assert response.json()["count"] == 0
@@ -1,7 +1,15 @@
 # test_movies.py
+import base64
+import csv
+import gzip
+import io
+import json
+
+import numpy as np
 import pytest
 from django.urls import reverse
 from app.models import Movie, Rating
+from app.recommender import build_model, save_model
 
 
 @pytest.mark.django_db
@@ -16,6 +24,21 @@ def test_movie_list_view(api_client, create_movie):
     assert len(response.data["results"]) == 2
 
 
+@pytest.mark.django_db
+def test_movie_list_count_follows_new_movies(api_client, create_movie):
+    for year in (2019, 2020, 2021):
+        create_movie(title=f"Movie {year}", year=year)
+    assert api_client.get(reverse("movie-list")).data["count"] == 3
+
+    create_movie(title="Movie 2022", year=2022)
+    response = api_client.get(reverse("movie-list"), {"page": 1})
+
+    assert response.data["count"] == 4
+    assert len(response.data["results"]) == 4
+    response = api_client.get(reverse("async-movie-list"))
+    assert response.json()["count"] == 4
+
+
 @pytest.mark.django_db
 def test_movie_create_view(api_client, user):
     api_client.force_authenticate(user=user)
@@ -105,3 +128,388 @@ def test_rate_movie_view_duplicate_rating(api_client, create_user, create_movie)
 
     assert response.status_code == 400
     assert "You have already rated this movie" in response.data["error"]
+
+
+@pytest.mark.django_db
+def test_movie_list_view_full_text_search(api_client, create_movie):
+    create_movie(title="The Matrix", year=1999, tags="cyberpunk")
+    create_movie(title="The Matrix Reloaded", year=2003)
+    create_movie(title="Memento", year=2000, tags="matrix of memories")
+
+    url = reverse("movie-list")
+    response = api_client.get(url, {"q": "matri"})
+
+    assert response.status_code == 200
+    assert [movie["title"] for movie in response.data["results"]] == [
+        "The Matrix",
+        "The Matrix Reloaded",
+        "Memento",
+    ]
+
+    # Without any term, nothing matches and nothing is counted.
+    response = api_client.get(url, {"q": "!!!"})
+    assert response.status_code == 200
+    assert response.data["count"] == 0
+    assert response.data["results"] == []
+
+    # The ranking has no keyset, only an explicit ordering can be paged by cursor.
+    response = api_client.get(url, {"q": "matri", "pagination": "cursor"})
+    assert response.status_code == 400
+    response = api_client.get(
+        url, {"q": "matri", "pagination": "cursor", "ordering": "-year"}
+    )
+    assert [movie["year"] for movie in response.data["results"]] == [
+        2003,
+        2000,
+        1999,
+    ]
+
+
+@pytest.mark.django_db
+def test_movie_list_view_genre_and_tag_filters(api_client, create_movie):
+    create_movie(title="Heat", year=1995, genres="Action|Crime", tags="heist, LA")
+    create_movie(title="Fargo", year=1996, genres="Comedy|Crime", tags="snow")
+    create_movie(title="Up", year=2009, genres="Animation|Kids", tags="balloons")
+
+    url = reverse("movie-list")
+
+    def titles(params):
+        response = api_client.get(url, params)
+        assert response.status_code == 200
+        return [movie["title"] for movie in response.data["results"]]
+
+    assert titles({"genre": ["Crime", "Comedy"]}) == ["Fargo"]
+    assert titles({"genre": ["Action", "Comedy"], "genre_match": "any"}) == [
+        "Fargo",
+        "Heat",
+    ]
+    # "Kids" is not a MovieLens genre, so the link table is used.
+    assert titles({"genre": ["Kids", "Animation"]}) == ["Up"]
+    # Both paths ignore the case of the names.
+    assert titles({"genre": ["crime", "COMEDY"]}) == ["Fargo"]
+    assert titles({"genre": ["kids", "animation"]}) == ["Up"]
+    assert titles({"tag": "la"}) == ["Heat"]
+    assert titles({"tag": ["snow", "heist"], "tag_match": "any"}) == ["Fargo", "Heat"]
+    assert titles({"tag": ["snow", "heist"]}) == []
+
+    # A movie linked to "Kids" and "kids" matches one name.
+    create_movie(title="Cars", year=2006, genres="Kids|kids")
+    assert titles({"genre": "KIDS"}) == ["Cars", "Up"]
+
+
+@pytest.mark.django_db
+def test_movie_list_view_cursor_pagination(api_client, create_movie):
+    for index, title in enumerate(["Heat", "Alien", "Fargo", "Brazil", "Casino"]):
+        create_movie(title=title, year=1990 + index % 2)
+
+    url = reverse("movie-list")
+    response = api_client.get(url, {"pagination": "cursor", "page_size": 2})
+    assert "count" not in response.data
+    assert response.data["previous"] is None
+
+    pages = [[movie["title"] for movie in response.data["results"]]]
+    while response.data["next"]:
+        response = api_client.get(response.data["next"])
+        pages.append([movie["title"] for movie in response.data["results"]])
+    assert pages == [["Alien", "Brazil"], ["Casino", "Fargo"], ["Heat"]]
+
+    response = api_client.get(response.data["previous"])
+    assert [movie["title"] for movie in response.data["results"]] == [
+        "Casino",
+        "Fargo",
+    ]
+
+    response = api_client.get(
+        url, {"pagination": "cursor", "ordering": "-year", "count": "true"}
+    )
+    assert response.data["count"] == 5
+    assert [movie["year"] for movie in response.data["results"]] == [
+        1991,
+        1991,
+        1990,
+        1990,
+        1990,
+    ]
+
+    assert api_client.get(url, {"cursor": "invalid"}).status_code == 404
+    # Well-formed cursors whose value does not match the keyset field.
+    for position in [[None, 1, False], [["Heat"], 1, False], ["Heat", [1], False]]:
+        cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        assert api_client.get(url, {"cursor": cursor}).status_code == 404
+    cursor = base64.urlsafe_b64encode(b'["Heat", 1, false]').decode()
+    assert (
+        api_client.get(url, {"cursor": cursor, "ordering": "year"}).status_code == 404
+    )
+
+
+@pytest.fixture
+def similarity_model(settings, tmp_path):
+    settings.RECOMMENDER_MODEL_DIR = tmp_path
+    movies = [Movie.objects.create(title=f"Movie {i}", year=2000) for i in range(3)]
+    ratings = (
+        np.array([1, 1, 1, 2, 2, 2]),
+        np.array([movie.id for movie in movies] * 2),
+        np.array([5.0, 4.0, 1.0, 1.0, 2.0, 5.0], dtype=np.float32),
+    )
+    model, _ = build_model(ratings, neighbours=2, min_ratings=1, shrinkage=0)
+    save_model(model)
+    return movies
+
+
+@pytest.mark.django_db
+def test_similar_movies_view(api_client, similarity_model):
+    first, second, _ = similarity_model
+
+    url = reverse("movie-similar", args=[first.id])
+    response = api_client.get(url)
+
+    assert response.status_code == 200
+    assert [movie["id"] for movie in response.data["results"]] == [second.id]
+    assert response.data["results"][0]["score"] == pytest.approx(1.0)
+
+
+@pytest.mark.django_db
+def test_similar_movies_view_errors(api_client, settings, tmp_path, movie):
+    settings.RECOMMENDER_MODEL_DIR = tmp_path
+
+    response = api_client.get(reverse("movie-similar", args=[movie.id]))
+    assert response.status_code == 503
+
+    response = api_client.get(reverse("movie-similar", args=[movie.id + 1]))
+    assert response.status_code == 404
+
+    response = api_client.get(reverse("movie-similar", args=["abc"]))
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_bulk_rate_view(api_client, user, create_movie, django_assert_max_num_queries):
+    first = create_movie(title="Movie 1", year=2020)
+    second = create_movie(title="Movie 2", year=2021)
+    Rating.objects.create(user=user, movie=first, rate=2)
+    api_client.force_authenticate(user=user)
+
+    payload = [
+        {"movie": first.id, "rate": 4},
+        {"movie": second.id, "rate": 7},
+        {"movie": second.id + 100, "rate": 5},
+        {"movie": second.id, "rate": 11},
+        {"rate": 5},
+    ]
+    with django_assert_max_num_queries(10):
+        response = api_client.post(reverse("movie-bulk-rate"), payload, format="json")
+
+    assert response.status_code == 200
+    results = response.data["results"]
+    assert [result["status"] for result in results] == [
+        "updated",
+        "created",
+        "error",
+        "error",
+        "error",
+    ]
+    assert results[2]["errors"] == {"movie": ["Movie not found"]}
+    assert "rate" in results[3]["errors"]
+    assert "movie" in results[4]["errors"]
+
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert (first.rating_count, first.rate) == (1, 4.0)
+    assert (second.rating_count, second.rate) == (1, 7.0)
+
+
+@pytest.mark.django_db
+def test_bulk_rate_view_keeps_last_duplicate(api_client, user, movie):
+    api_client.force_authenticate(user=user)
+
+    payload = [{"movie": movie.id, "rate": 3}, {"movie": movie.id, "rate": 9}]
+    response = api_client.post(reverse("movie-bulk-rate"), payload, format="json")
+
+    assert [result["status"] for result in response.data["results"]] == [
+        "error",
+        "created",
+    ]
+    assert Rating.objects.get().rate == 9.0
+
+
+@pytest.mark.django_db
+def test_bulk_rate_view_expires_cached_movie(api_client, user, movie):
+    url = reverse("movie-detail", args=[movie.id])
+    assert api_client.get(url).data["rate"] == 0.0
+
+    api_client.force_authenticate(user=user)
+    payload = [{"movie": movie.id, "rate": 6}]
+    api_client.post(reverse("movie-bulk-rate"), payload, format="json")
+    api_client.force_authenticate(user=None)
+
+    assert api_client.get(url).data["rate"] == 6.0
+
+
+@pytest.mark.django_db
+def test_bulk_rate_view_rejects_invalid_body(api_client, user):
+    api_client.force_authenticate(user=user)
+    url = reverse("movie-bulk-rate")
+
+    assert api_client.post(url, {"movie": 1}, format="json").status_code == 400
+    assert api_client.post(url, [], format="json").data == {"results": []}
+
+
+@pytest.mark.django_db
+def test_top_movies_view(api_client, create_user, create_movie):
+    heat = create_movie(title="Heat", year=1995, genres="Action|Crime")
+    alien = create_movie(title="Alien", year=1979, genres="Horror|Sci-Fi")
+    obscure = create_movie(title="Obscure", year=1995, genres="Action")
+    users = [create_user(username=f"u{i}") for i in range(5)]
+    for user in users:
+        Rating.objects.create(user=user, movie=heat, rate=8.0)
+        Rating.objects.create(user=user, movie=alien, rate=9.0)
+    Rating.objects.create(user=users[0], movie=obscure, rate=10.0)
+
+    url = reverse("movie-top")
+    response = api_client.get(url)
+    assert response.status_code == 200
+    # A single perfect rating does not outrank many good ones.
+    assert [movie["id"] for movie in response.data["results"]] == [
+        alien.id,
+        heat.id,
+        obscure.id,
+    ]
+    assert response.data["results"][0]["score"] < 9.0
+
+    response = api_client.get(url, {"genre": "action", "min_count": 2})
+    assert [movie["id"] for movie in response.data["results"]] == [heat.id]
+
+    response = api_client.get(url, {"year_min": 1990, "year_max": 1999, "limit": 1})
+    assert [movie["id"] for movie in response.data["results"]] == [heat.id]
+
+    assert api_client.get(url, {"genre": "Unknown"}).status_code == 404
+    assert api_client.get(url, {"year": "soon"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_movie_list_view_fields(
+    api_client, user, create_movie, django_assert_num_queries
+):
+    heat = create_movie(title="Heat", year=1995, tags="heist, la")
+    ronin = create_movie(title="Ronin", year=1998)
+    Rating.objects.create(user=user, movie=heat, rate=9.0)
+
+    url = reverse("movie-list")
+    response = api_client.get(url, {"fields": "id,title,year"})
+    assert response.status_code == 200
+    assert response.data["results"][0] == {"id": heat.id, "title": "Heat", "year": 1995}
+
+    response = api_client.get(url, {"fields": "title,tags", "pagination": "cursor"})
+    assert [movie["tags"] for movie in response.data["results"]] == ["heist, la", ""]
+
+    # Cursor pages are movie instances, read a single field as a one-value row.
+    for field, values in [("id", [heat.id, ronin.id]), ("title", ["Heat", "Ronin"])]:
+        response = api_client.get(url, {"fields": field, "pagination": "cursor"})
+        assert response.status_code == 200
+        assert response.data["results"] == [{field: value} for value in values]
+
+    # The rate of the user is read by the page query, not once per movie.
+    api_client.force_authenticate(user=user)
+    with django_assert_num_queries(2):
+        response = api_client.get(url, {"fields": "title,rating_count,my_rating"})
+    assert response.data["results"] == [
+        {"title": "Heat", "rating_count": 1, "my_rating": 9.0},
+        {"title": "Ronin", "rating_count": 0, "my_rating": None},
+    ]
+
+    response = api_client.get(
+        reverse("movie-detail", args=[heat.id]), {"fields": "id,my_rating"}
+    )
+    assert response.data == {"id": heat.id, "my_rating": 9.0}
+
+    response = api_client.get(url, {"fields": "title,budget"})
+    assert response.status_code == 400
+    assert response.data == {"fields": ["Unknown fields: budget."]}
+
+
+@pytest.mark.django_db
+def test_autocomplete_view(api_client, create_movie, django_assert_num_queries):
+    create_movie(title="Heat", year=1995, rating_count=3)
+    heathers = create_movie(title="Heathers", year=1988, rating_count=7)
+    url = reverse("movie-autocomplete")
+    api_client.get(url, {"q": "he"})
+
+    with django_assert_num_queries(0):
+        response = api_client.get(url, {"q": "HEATH", "limit": 5})
+    assert response.status_code == 200
+    assert response.data["results"] == [
+        {"id": heathers.id, "title": "Heathers", "year": 1988}
+    ]
+
+    response = api_client.get(url, {"q": "hea", "limit": 1})
+    assert [movie["title"] for movie in response.data["results"]] == ["Heathers"]
+    assert api_client.get(url).status_code == 400
+
+
+def export_content(response):
+    content = b"".join(response.streaming_content)
+    if response.get("Content-Encoding") == "gzip":
+        content = gzip.decompress(content)
+    return content.decode()
+
+
+@pytest.mark.django_db
+def test_export_view_streams_ndjson(
+    api_client, create_movie, django_assert_num_queries
+):
+    create_movie(title="Heat", year=1995, genres="Action|Crime", imdb_id="0113277")
+    create_movie(title="Amélie", year=2001, genres="Romance")
+    url = reverse("movie-export")
+
+    with django_assert_num_queries(1):
+        response = api_client.get(url)
+        lines = export_content(response).splitlines()
+
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/x-ndjson"
+    assert response["Content-Disposition"] == 'attachment; filename="movies.ndjson"'
+    movies = [json.loads(line) for line in lines]
+    assert [movie["title"] for movie in movies] == ["Amélie", "Heat"]
+    assert movies[1]["imdb_url"] == "http://www.imdb.com/title/tt0113277/"
+
+
+@pytest.mark.django_db
+def test_export_view_filters_csv_and_gzip(api_client, create_movie):
+    for index in range(5):
+        create_movie(title=f"Heat {index}", year=1995 + index, genres="Action")
+    create_movie(title="Amélie", year=2001, genres="Romance")
+    url = reverse("movie-export")
+
+    response = api_client.get(
+        url,
+        {
+            "format": "csv",
+            "genre": "action",
+            "ordering": "-year",
+            "fields": "title,year",
+        },
+        HTTP_ACCEPT_ENCODING="gzip, deflate",
+    )
+
+    assert response["Content-Type"] == "text/csv"
+    assert response["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response["Vary"]
+    rows = list(csv.reader(io.StringIO(export_content(response))))
+    assert rows[0] == ["title", "year"]
+    assert rows[1:] == [
+        [f"Heat {index}", str(1995 + index)] for index in range(4, -1, -1)
+    ]
+
+    response = api_client.get(url, {"q": "amelie"}, HTTP_ACCEPT="text/csv")
+    assert [row[1] for row in csv.reader(io.StringIO(export_content(response)))] == [
+        "title",
+        "Amélie",
+    ]
+
+
+@pytest.mark.django_db
+def test_export_view_invalid_fields(api_client):
+    response = api_client.get(reverse("movie-export"), {"fields": "title,budget"})
+
+    assert response.status_code == 400
+    assert json.loads(response.content) == {"fields": ["Unknown fields: budget."]}
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from django.urls import reverse
+
+from app.models import Movie, Rating
+from app.recommender import build_model, save_model
+
+
+@pytest.fixture
+def movies(settings, tmp_path):
+    settings.RECOMMENDER_MODEL_DIR = tmp_path
+    movies = [Movie.objects.create(title=f"Movie {i}", year=2000) for i in range(4)]
+    ratings = (
+        np.array([1, 1, 1, 1, 2, 2, 2, 2]),
+        np.array([movie.id for movie in movies] * 2),
+        np.array([5.0, 4.0, 1.0, 2.0, 1.0, 2.0, 5.0, 4.0], dtype=np.float32),
+    )
+    model, _ = build_model(ratings, neighbours=3, min_ratings=1, shrinkage=0)
+    save_model(model)
+    return movies
+
+
+@pytest.mark.django_db
+def test_recommendations_view(api_client, user, movies):
+    Rating.objects.create(user=user, movie=movies[0], rate=9)
+    Rating.objects.create(user=user, movie=movies[2], rate=2)
+    api_client.force_authenticate(user=user)
+
+    response = api_client.get(reverse("recommendations"), {"limit": 5})
+
+    assert response.status_code == 200
+    assert [movie["id"] for movie in response.data["results"]] == [movies[1].id]
+    assert response.data["results"][0]["score"] > 0
+
+
+@pytest.mark.django_db
+def test_recommendations_view_without_ratings(api_client, user, movies):
+    api_client.force_authenticate(user=user)
+
+    response = api_client.get(reverse("recommendations"))
+
+    assert response.status_code == 200
+    assert response.data["results"] == []
+
+
+@pytest.mark.django_db
+def test_recommendations_view_requires_authentication(api_client, movies):
+    response = api_client.get(reverse("recommendations"))
+
+    assert response.status_code == 401
+
+
+@pytest.mark.django_db
+def test_recommendations_view_without_model(api_client, user, settings, tmp_path):
+    settings.RECOMMENDER_MODEL_DIR = tmp_path
+    api_client.force_authenticate(user=user)
+
+    response = api_client.get(reverse("recommendations"))
+
+    assert response.status_code == 503
@@ -0,0 +1,47 @@
+import pytest
+from django.urls import reverse
+
+from app.analytics import build_store, save_store
+from app.models import Movie, Rating
+
+
+@pytest.fixture
+def store(user):
+    movie = Movie.objects.create(
+        title="Heat", year=1995, genres="Action|Crime", tags="heist"
+    )
+    Rating.objects.create(user=user, movie=movie, rate=4.0)
+    save_store(build_store())
+    return movie
+
+
+@pytest.mark.django_db
+def test_stats_views(api_client, store):
+    response = api_client.get(reverse("stats"))
+    assert response.status_code == 200
+    assert (response.data["movies"], response.data["ratings"]) == (1, 1)
+
+    response = api_client.get(reverse("stats-movie-histogram", args=[store.id]))
+    assert response.data["results"] == [{"rate": 4.0, "count": 1}]
+
+    response = api_client.get(reverse("stats-ratings-per-year"), {"genre": "Crime"})
+    assert [row["count"] for row in response.data["results"]] == [1]
+
+    response = api_client.get(reverse("stats-genres"))
+    assert set(response.data["results"]) == {"Action", "Crime"}
+
+    response = api_client.get(reverse("stats-tags"))
+    assert response.data["results"] == [{"tag": "heist", "movies": 1}]
+
+
+@pytest.mark.django_db
+def test_stats_views_errors(api_client, store):
+    response = api_client.get(reverse("stats-movie-histogram", args=[store.id + 1]))
+    assert response.status_code == 404
+    assert api_client.get(reverse("stats-tags"), {"genre": "x"}).status_code == 404
+    assert api_client.get(reverse("stats-genres"), {"year_min": "x"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_stats_views_without_store(api_client):
+    assert api_client.get(reverse("stats")).status_code == 503
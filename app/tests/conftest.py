@@ -2,10 +2,17 @@ import pytest
 
 from rest_framework.test import APIClient
 from django.contrib.auth.models import User
+from django.core.cache import caches
 
 from app.models import Movie, Rating
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    for cache in caches.all():
+        cache.clear()
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
@@ -40,3 +47,13 @@ def user(db):
 @pytest.fixture
 def rating(user, movie):
     return Rating.objects.create(user=user, movie=movie, rate=8.0)
+
+
+@pytest.fixture(autouse=True)
+def analytics_store_dir(settings, tmp_path):
+    settings.ANALYTICS_STORE_DIR = tmp_path / "analytics"
+
+
+@pytest.fixture(autouse=True)
+def autocomplete_index_dir(settings, tmp_path):
+    settings.AUTOCOMPLETE_INDEX_DIR = tmp_path / "autocomplete"
@@ -0,0 +1,43 @@
+import pytest
+
+from django.core.management import call_command
+
+from app.models import Movie, Rating
+from app.recommender import load_model
+
+
+@pytest.fixture
+def model_dir(settings, tmp_path):
+    settings.RECOMMENDER_MODEL_DIR = tmp_path
+    return tmp_path
+
+
+@pytest.fixture
+def ratings(create_user):
+    movies = [Movie.objects.create(title=f"Movie {i}", year=2000) for i in range(3)]
+    for i in range(6):
+        user = create_user(username=f"user{i}", password="password")
+        for movie, rate in zip(movies, [i, i + 1, 6 - i]):
+            Rating.objects.create(user=user, movie=movie, rate=rate + 1)
+    return movies
+
+
+@pytest.mark.django_db
+def test_build_recommender_command(model_dir, ratings, capsys):
+    first, second, third = ratings
+
+    call_command("build_recommender")
+
+    model = load_model(model_dir)
+    assert [movie_id for movie_id, _ in model.similar(first.id)] == [second.id]
+    assert "recomputed 3" in capsys.readouterr().out
+
+    call_command("build_recommender")
+    assert "up to date" in capsys.readouterr().out
+
+    Rating.objects.filter(movie=third).first().delete()
+    call_command("build_recommender")
+    assert "recomputed 1" in capsys.readouterr().out
+
+    call_command("build_recommender", "--full")
+    assert "recomputed 3" in capsys.readouterr().out
@@ -0,0 +1,16 @@
+import pytest
+
+from django.core.management import call_command
+
+from app.models import Movie
+
+
+@pytest.mark.django_db
+def test_rebuild_movie_rates_command(rating, movie):
+    Movie.objects.update(rating_count=0, rating_sum=0.0, rate=0.0)
+
+    call_command("rebuild_movie_rates")
+
+    movie.refresh_from_db()
+    assert movie.rating_count == 1
+    assert movie.rate == 8.0
@@ -0,0 +1,24 @@
+import pytest
+
+from django.core.management import CommandError, call_command
+
+from app.models import Movie, Rating
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_and_import_snapshot_commands(rating, movie, tmp_path, capsys):
+    call_command("export_snapshot", dir=str(tmp_path))
+    assert "Exported 1 movies" in capsys.readouterr().out
+    Movie.objects.all().delete()
+
+    call_command("import_snapshot", dir=str(tmp_path))
+
+    assert Movie.objects.get().title == movie.title
+    # Only the ratings of the MovieLens users are exported.
+    assert not Rating.objects.exists()
+
+
+@pytest.mark.django_db
+def test_import_snapshot_command_without_snapshot(tmp_path):
+    with pytest.raises(CommandError, match="export_snapshot"):
+        call_command("import_snapshot", dir=str(tmp_path))
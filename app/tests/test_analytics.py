@@ -0,0 +1,70 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from app.analytics import build_store, load_store, refresh_store, save_store
+from app.models import Movie, Rating
+
+
+@pytest.fixture
+def rated_movies(create_user):
+    heat = Movie.objects.create(
+        title="Heat", year=1995, genres="Action|Crime", tags="heist, la"
+    )
+    alien = Movie.objects.create(
+        title="Alien", year=1979, genres="Horror|Sci-Fi", tags="space, heist"
+    )
+    users = [create_user(username=f"u{i}") for i in range(4)]
+    for user, rate in ((users[0], 4.0), (users[1], 3.5)):
+        Rating.objects.create(user=user, movie=heat, rate=rate)
+    for user, rate in ((users[2], 5.0), (users[3], 4.0)):
+        Rating.objects.create(user=user, movie=alien, rate=rate)
+    for year, rating in zip((2001, 2002, 2002, 2003), Rating.objects.order_by("id")):
+        Rating.objects.filter(id=rating.id).update(
+            timestamp=datetime.datetime(year, 6, 1, tzinfo=datetime.timezone.utc)
+        )
+    return heat, alien
+
+
+@pytest.mark.django_db
+def test_build_store(rated_movies):
+    heat, alien = rated_movies
+    store = build_store()
+
+    assert store.histogram(heat.id) == [(3.5, 1), (4.0, 1)]
+    assert store.histogram(alien.id + 1) is None
+    assert store.ratings_per_year() == [(2001, 1, 4.0), (2002, 2, 4.25), (2003, 1, 4.0)]
+    assert store.ratings_per_year("crime") == [(2001, 1, 4.0), (2002, 1, 3.5)]
+    assert store.genre_popularity(year_min=2002)["Horror"] == [(2002, 1), (2003, 1)]
+    assert "Drama" not in store.genre_popularity()
+    assert store.top_tags() == [("heist", 2), ("la", 1), ("space", 1)]
+    assert store.top_tags(limit=1, genre="horror") == [("heist", 1)]
+
+
+@pytest.mark.django_db
+def test_incremental_store_matches_full_build(rated_movies, user):
+    heat, alien = rated_movies
+    save_store(build_store())
+
+    jaws = Movie.objects.create(title="Jaws", year=1975, genres="Thriller")
+    Rating.objects.create(user=user, movie=jaws, rate=2.0)
+    Rating.objects.create(user=user, movie=heat, rate=1.0)
+
+    incremental = refresh_store([heat.id])
+    full = build_store()
+    for name in ("movie_ids", "bin_counts", "year_counts", "year_sums"):
+        assert np.array_equal(getattr(incremental, name), getattr(full, name))
+
+
+@pytest.mark.django_db
+def test_save_and_load_store(rated_movies, tmp_path):
+    assert load_store(tmp_path) is None
+
+    save_store(build_store(), tmp_path)
+    save_store(build_store(), tmp_path)
+    loaded = load_store(tmp_path)
+
+    assert len(list(tmp_path.glob("bin_counts.*.npy"))) == 1
+    assert isinstance(loaded.bin_counts, np.memmap)
+    assert loaded.top_tags(limit=1) == [("heist", 2)]
@@ -0,0 +1,93 @@
+import pytest
+
+from app import autocomplete
+from app.autocomplete import (
+    build_index,
+    get_lock_path,
+    get_index,
+    load_index,
+    normalize,
+    rebuild_in_background,
+    refresh_index,
+    title_keys,
+)
+from app.models import Movie
+from app.utils.arrays import try_file_lock
+
+
+@pytest.fixture
+def titles(create_movie):
+    return [
+        create_movie(title="Matrix, The", year=1999, rating_count=10),
+        create_movie(title="Matrix Reloaded, The", year=2003, rating_count=30),
+        create_movie(title="Amélie", year=2001, rating_count=20),
+        create_movie(title="Mad Max", year=1979, rating_count=5),
+    ]
+
+
+def test_normalize():
+    assert normalize("  Amélie (Le Fabuleux Destin d'Amélie Poulain)") == (
+        "amelie le fabuleux destin d amelie poulain"
+    )
+    assert title_keys("Matrix, The") == {b"matrix the", b"the"}
+
+
+@pytest.mark.django_db
+def test_build_index(titles):
+    matrix, reloaded, amelie, mad_max = titles
+    index = build_index()
+
+    # Any word of the title, the most rated movies first.
+    assert index.search("ma") == [
+        (reloaded.id, "Matrix Reloaded, The", 2003),
+        (matrix.id, "Matrix, The", 1999),
+        (mad_max.id, "Mad Max", 1979),
+    ]
+    assert index.search("THE", limit=1) == [(reloaded.id, "Matrix Reloaded, The", 2003)]
+    assert index.search("matrix the") == [(matrix.id, "Matrix, The", 1999)]
+    assert index.search("ame") == index.search("Amé") == [(amelie.id, "Amélie", 2001)]
+    assert index.search("max") == [(mad_max.id, "Mad Max", 1979)]
+    assert index.search("xyz") == []
+    assert index.search("!") == []
+
+
+# The rebuild thread reads the movies through its own connection.
+@pytest.mark.django_db(transaction=True)
+def test_index_refresh(titles):
+    matrix = titles[0]
+    assert load_index() is None
+    refresh_index()
+    assert load_index().search("matrix the") == [(matrix.id, "Matrix, The", 1999)]
+
+    matrix.title = "Matrix"
+    matrix.save()
+    Movie.objects.create(title="Matilda", year=1996)
+
+    # The old index is served while one rebuild runs in the background.
+    assert get_index().search("matrix the") == [(matrix.id, "Matrix, The", 1999)]
+    rebuild = autocomplete._rebuild_thread
+    get_index()
+    assert autocomplete._rebuild_thread is rebuild
+    rebuild.join()
+
+    index = get_index()
+    assert index.search("matrix the") == []
+    assert [title for _, title, _ in index.search("mat")] == [
+        "Matrix Reloaded, The",
+        "Matrix",
+        "Matilda",
+    ]
+    # Saved, the other processes load it instead of building their own.
+    assert load_index().built_at == index.built_at
+    assert get_index() is load_index()
+
+
+@pytest.mark.django_db
+def test_index_is_not_rebuilt_while_locked(titles):
+    index = refresh_index()
+    titles[0].save()
+
+    # Another process holds the lock, the saved index is served as is.
+    with try_file_lock(get_lock_path()):
+        assert rebuild_in_background() is None
+        assert get_index().built_at == index.built_at
@@ -0,0 +1,107 @@
+import pytest
+from django.urls import reverse
+
+from app.cache import invalidate_movies
+from app.models import Movie, Rating
+
+
+@pytest.mark.django_db
+def test_anonymous_list_is_cached(api_client, movie, django_assert_num_queries):
+    url = reverse("movie-list")
+    first = api_client.get(url)
+
+    with django_assert_num_queries(0):
+        second = api_client.get(url)
+
+    assert second.status_code == 200
+    assert second.data == first.data
+    assert second["ETag"] == first["ETag"]
+    assert "Last-Modified" in second
+
+
+@pytest.mark.django_db
+def test_query_params_are_part_of_the_key(api_client, movie):
+    Movie.objects.create(title="Tenet", year=2020, genres="Action")
+    url = reverse("movie-list")
+
+    assert len(api_client.get(url).data["results"]) == 2
+    assert len(api_client.get(url, {"search": "tenet"}).data["results"]) == 1
+
+
+@pytest.mark.django_db
+def test_rating_expires_cached_movie(api_client, movie, user):
+    url = reverse("movie-detail", args=[movie.id])
+    before = api_client.get(url)
+
+    Rating.objects.create(user=user, movie=movie, rate=6.0)
+    after = api_client.get(url)
+
+    assert before.data["rate"] == 0.0
+    assert after.data["rate"] == 6.0
+    assert after["ETag"] != before["ETag"]
+
+
+@pytest.mark.django_db
+def test_movie_save_expires_cached_list(api_client, movie):
+    url = reverse("movie-list")
+    api_client.get(url)
+
+    movie.title = "Inception (Director's Cut)"
+    movie.save()
+
+    assert api_client.get(url).data["results"][0]["title"] == movie.title
+
+
+@pytest.mark.django_db
+def test_catalogue_invalidation(api_client, movie):
+    url = reverse("movie-detail", args=[movie.id])
+    api_client.get(url)
+
+    Movie.objects.filter(id=movie.id).update(title="Updated")
+    assert api_client.get(url).data["title"] == "Inception"
+
+    invalidate_movies()
+    assert api_client.get(url).data["title"] == "Updated"
+
+
+@pytest.mark.django_db
+def test_if_none_match_returns_not_modified(api_client, movie):
+    url = reverse("movie-detail", args=[movie.id])
+    etag = api_client.get(url)["ETag"]
+
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+
+
+@pytest.mark.django_db
+def test_if_modified_since_returns_not_modified(api_client, movie):
+    url = reverse("movie-list")
+    last_modified = api_client.get(url)["Last-Modified"]
+
+    response = api_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db
+def test_errors_are_not_cached(api_client):
+    url = reverse("movie-detail", args=[1])
+    assert api_client.get(url).status_code == 404
+
+    Movie.objects.create(id=1, title="Inception", year=2010)
+    assert api_client.get(url).status_code == 200
+
+
+@pytest.mark.django_db
+def test_authenticated_users_bypass_the_cache(api_client, movie, user):
+    url = reverse("movie-detail", args=[movie.id])
+    api_client.get(url)
+    Movie.objects.filter(id=movie.id).update(title="Updated")
+
+    api_client.force_authenticate(user=user)
+    response = api_client.get(url)
+
+    assert response.data["title"] == "Updated"
+    assert "ETag" not in response
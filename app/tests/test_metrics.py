@@ -0,0 +1,112 @@
+import logging
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from app.metrics import registry
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    registry.reset()
+
+
+def timings(response):
+    entries = [entry.split(";") for entry in response["Server-Timing"].split(", ")]
+    return {name: dict(item.split("=", 1) for item in rest) for name, *rest in entries}
+
+
+def samples(metrics):
+    lines = [line for line in metrics.splitlines() if not line.startswith("#")]
+    return {name: float(value) for name, value in map(str.split, lines)}
+
+
+@pytest.mark.django_db
+def test_request_metrics(api_client, movie):
+    response = api_client.get(reverse("movie-list"))
+    assert response.status_code == 200
+    timing = timings(response)
+    assert timing["db"]["desc"] == '"2 queries"'
+    assert {"serialize", "render", "app", "total"} <= timing.keys()
+
+    api_client.get(reverse("movie-list"))
+    api_client.get("/api/v1/missing/")
+    metrics = samples(api_client.get(reverse("metrics")).content.decode())
+
+    route = 'method="GET",route="movie-list"'
+    assert metrics[f'http_requests_total{{{route},status="200"}}'] == 2
+    assert (
+        metrics['http_requests_total{method="GET",route="unmatched",status="404"}'] == 1
+    )
+    assert metrics[f'http_request_duration_seconds_bucket{{{route},le="+Inf"}}'] == 2
+    # The second request is a cache hit, without queries.
+    assert metrics[f'http_request_db_queries_bucket{{{route},le="0"}}'] == 1
+    assert metrics[f"http_request_db_queries_sum{{{route}}}"] == 2
+    assert metrics[f"http_request_db_queries_count{{{route}}}"] == 2
+    assert metrics[f'http_request_phase_seconds_total{{{route},phase="render"}}'] > 0
+    assert metrics[f'http_request_phase_seconds_total{{{route},phase="serialize"}}'] > 0
+
+
+@pytest.mark.django_db
+def test_async_request_metrics(movie):
+    response = Client().get(reverse("async-movie-detail", args=[movie.id]))
+
+    assert timings(response)["db"]["desc"] == '"1 queries"'
+    metrics = samples(registry.render())
+    route = 'method="GET",route="async-movie-detail"'
+    assert metrics[f'http_requests_total{{{route},status="200"}}'] == 1
+
+
+@pytest.mark.django_db
+def test_slow_query_sampling(api_client, movie, settings, caplog):
+    settings.METRICS_SLOW_QUERY_SECONDS = 0
+    settings.METRICS_SLOW_QUERY_SAMPLE_RATE = 0
+    with caplog.at_level(logging.WARNING, logger="app.metrics"):
+        api_client.get(reverse("movie-detail", args=[movie.id]))
+    assert not caplog.records
+    metrics = samples(registry.render())
+    route = 'method="GET",route="movie-detail"'
+    assert metrics[f"http_request_db_slow_queries_total{{{route}}}"] == 1
+
+    settings.METRICS_SLOW_QUERY_SAMPLE_RATE = 1
+    with caplog.at_level(logging.WARNING, logger="app.metrics"):
+        api_client.get(reverse("movie-list"))
+    assert "Slow query" in caplog.records[0].getMessage()
+    assert "/api/v1/movies/" in caplog.records[0].getMessage()
+
+
+@pytest.mark.django_db
+def test_metrics_only_for_allowed_clients(api_client, create_user, movie, settings):
+    remote = {"REMOTE_ADDR": "203.0.113.7"}
+    assert api_client.get(reverse("metrics"), **remote).status_code == 403
+    response = api_client.get(reverse("movie-detail", args=[movie.id]), **remote)
+    assert response.status_code == 200
+    assert "Server-Timing" not in response
+
+    staff = create_user(username="staff", password="password", is_staff=True)
+    # Authenticated by DRF in the view, after the middleware saw an anonymous user.
+    token = AccessToken.for_user(staff)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    response = api_client.get(reverse("movie-detail", args=[movie.id]), **remote)
+    assert "Server-Timing" in response
+    assert api_client.get(reverse("metrics"), **remote).status_code == 403
+
+    settings.METRICS_ALLOWED_IPS = ["203.0.113.0/24"]
+    assert api_client.get(reverse("metrics"), **remote).status_code == 200
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_timing_only_for_allowed_clients(create_user, movie, settings):
+    settings.METRICS_ALLOWED_IPS = []
+    url = reverse("async-movie-detail", args=[movie.id])
+    client = AsyncClient()
+    response = async_to_sync(client.get)(url)
+    assert response.status_code == 200
+    assert "Server-Timing" not in response
+
+    staff = create_user(username="staff", password="password", is_staff=True)
+    client.force_login(staff)
+    assert "Server-Timing" in async_to_sync(client.get)(url)
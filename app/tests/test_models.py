@@ -0,0 +1,150 @@
+import pytest
+
+from app.models import GENRE_BITS, LeaderboardEntry, Movie, Rating
+
+
+@pytest.mark.django_db
+def test_rating_created_updates_aggregates(movie, create_user):
+    Rating.objects.create(user=create_user(username="u1"), movie=movie, rate=4.0)
+    Rating.objects.create(user=create_user(username="u2"), movie=movie, rate=2.0)
+
+    movie.refresh_from_db()
+    assert movie.rating_count == 2
+    assert movie.rating_sum == 6.0
+    assert movie.rate == 3.0
+
+
+@pytest.mark.django_db
+def test_rating_changed_updates_aggregates(movie, create_user):
+    rating = Rating.objects.create(
+        user=create_user(username="u1"), movie=movie, rate=4.0
+    )
+    rating.rate = 8.0
+    rating.save()
+
+    reloaded = Rating.objects.get(id=rating.id)
+    reloaded.rate = 6.0
+    reloaded.save()
+
+    movie.refresh_from_db()
+    assert movie.rating_count == 1
+    assert movie.rate == 6.0
+
+
+@pytest.mark.django_db
+def test_rating_deleted_updates_aggregates(movie, create_user):
+    Rating.objects.create(user=create_user(username="u1"), movie=movie, rate=4.0)
+    rating = Rating.objects.create(
+        user=create_user(username="u2"), movie=movie, rate=2.0
+    )
+
+    rating.delete()
+    movie.refresh_from_db()
+    assert movie.rating_count == 1
+    assert movie.rate == 4.0
+
+    Rating.objects.all().delete()
+    movie.refresh_from_db()
+    assert movie.rating_count == 0
+    assert movie.rating_sum == 0.0
+    assert movie.rate == 0.0
+
+
+@pytest.mark.django_db
+def test_movie_deleted_with_its_ratings(
+    movie, create_user, django_assert_max_num_queries
+):
+    for index in range(20):
+        Rating.objects.create(
+            user=create_user(username=f"u{index}"), movie=movie, rate=4.0
+        )
+
+    # No per-rating aggregate updates for a movie that goes away.
+    with django_assert_max_num_queries(12):
+        movie.delete()
+    assert not Rating.objects.exists()
+
+
+@pytest.mark.django_db
+def test_rebuild_rates(movie, create_movie, create_user):
+    other = create_movie(title="Memento", year=2000)
+    Rating.objects.create(user=create_user(username="u1"), movie=movie, rate=5.0)
+    Rating.objects.create(user=create_user(username="u2"), movie=movie, rate=3.0)
+    Movie.objects.update(rating_count=10, rating_sum=1.0, rate=0.1)
+
+    assert Movie.rebuild_rates() == 2
+
+    movie.refresh_from_db()
+    other.refresh_from_db()
+    assert (movie.rating_count, movie.rating_sum, movie.rate) == (2, 8.0, 4.0)
+    assert (other.rating_count, other.rating_sum, other.rate) == (0, 0.0, 0.0)
+
+
+@pytest.mark.django_db
+def test_movie_taxonomy_follows_genres_and_tags(create_movie):
+    movie = create_movie(title="Heat", genres="Action|Crime", tags="Heist, LA")
+    assert movie.genre_mask == GENRE_BITS["action"] | GENRE_BITS["crime"]
+    assert sorted(movie.genre_list.values_list("name", flat=True)) == [
+        "Action",
+        "Crime",
+    ]
+    assert sorted(movie.tag_list.values_list("name", flat=True)) == ["heist", "la"]
+
+    movie.genres = "Drama"
+    movie.tags = ""
+    movie.save()
+    assert movie.genre_mask == GENRE_BITS["drama"]
+    assert list(movie.genre_list.values_list("name", flat=True)) == ["Drama"]
+    assert not movie.tag_list.exists()
+
+
+@pytest.mark.django_db
+def test_rating_upsert_many(user, movie, rating, create_user):
+    other = Movie.objects.create(title="Tenet", year=2020)
+    Rating.objects.create(user=create_user(username="u1"), movie=movie, rate=2.0)
+
+    existing = Rating.upsert_many(user, {movie.id: 4.0, other.id: 6.0})
+
+    assert existing == {movie.id}
+    assert Rating.objects.get(movie=movie, user=user).rate == 4.0
+    movie.refresh_from_db()
+    other.refresh_from_db()
+    assert (movie.rating_count, movie.rating_sum, movie.rate) == (2, 6.0, 3.0)
+    assert (other.rating_count, other.rate) == (1, 6.0)
+
+    # The aggregates move by the difference with the previous rates only.
+    assert Rating.upsert_many(user, {movie.id: 4.0, other.id: 8.0}) == {
+        movie.id,
+        other.id,
+    }
+    movie.refresh_from_db()
+    other.refresh_from_db()
+    assert (movie.rating_count, movie.rating_sum) == (2, 6.0)
+    assert (other.rating_count, other.rating_sum, other.rate) == (1, 8.0, 8.0)
+
+
+@pytest.mark.django_db
+def test_leaderboard_follows_ratings_and_genres(settings, create_user, create_movie):
+    settings.LEADERBOARD_PRIOR_COUNT = 2
+    heat = create_movie(title="Heat", year=1995, genres="Action|Crime")
+    users = [create_user(username=f"u{i}") for i in range(3)]
+    for user in users:
+        Rating.objects.create(user=user, movie=heat, rate=8.0)
+
+    # Rebuilt with a prior mean of 8, then rescored as ratings arrive.
+    LeaderboardEntry.rebuild()
+    Rating.objects.create(user=create_user(username="u3"), movie=heat, rate=3.0)
+    entries = LeaderboardEntry.objects.filter(movie=heat)
+    assert sorted(entries.values_list("genre__name", flat=True), key=str) == [
+        "Action",
+        "Crime",
+        None,
+    ]
+    assert {entry.rating_count for entry in entries} == {4}
+    assert {entry.score for entry in entries} == {(2 * 8.0 + 27.0) / (2 + 4)}
+
+    heat.genres = "Drama"
+    heat.save()
+    assert list(entries.exclude(genre=None).values_list("genre__name", flat=True)) == [
+        "Drama"
+    ]
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from app.recommender import build_model, load_model, read_ratings, save_model
+
+
+def clustered_ratings():
+    """
+    Users 0-9 like movies 1-3 and dislike 4-6, users 10-19 the other way around.
+    Movie 7 is rated like movie 1 by half of the users only.
+    """
+    ratings = []
+    for user in range(20):
+        liked, disliked = (
+            ([1, 2, 3], [4, 5, 6]) if user < 10 else ([4, 5, 6], [1, 2, 3])
+        )
+        ratings += [(user, movie, 5.0) for movie in liked]
+        ratings += [(user, movie, 1.0) for movie in disliked]
+        if user % 2:
+            ratings.append((user, 7, 5.0 if user < 10 else 1.0))
+    users, movies, rates = zip(*ratings)
+    return np.array(users), np.array(movies), np.array(rates, dtype=np.float32)
+
+
+def random_ratings(seed, users=60, movies=40, size=1200):
+    rng = np.random.default_rng(seed)
+    pairs = rng.choice(users * movies, size=size, replace=False)
+    rates = rng.uniform(0.5, 5.0, size).astype(np.float32)
+    return pairs // movies, pairs % movies + 1, rates
+
+
+def test_similar_movies():
+    model, recomputed = build_model(clustered_ratings(), neighbours=3, min_ratings=1)
+
+    assert recomputed == 7
+    assert [movie_id for movie_id, _ in model.similar(1)] == [2, 3, 7]
+    assert model.similar(1, limit=1)[0][1] == pytest.approx(20 / 30)
+    assert model.similar(99) == []
+
+
+def test_min_ratings():
+    model, _ = build_model(clustered_ratings(), neighbours=3, min_ratings=15)
+
+    assert model.movie_ids.tolist() == [1, 2, 3, 4, 5, 6]
+    assert [movie_id for movie_id, _ in model.similar(1)] == [2, 3]
+
+
+def test_recommend_neighbours_of_liked_movies():
+    model, _ = build_model(clustered_ratings(), neighbours=3, min_ratings=1)
+
+    recommended = model.recommend({1: 5.0, 4: 1.0})
+
+    assert [movie_id for movie_id, _ in recommended] == [2, 3, 7]
+    assert model.recommend({99: 5.0}) == []
+
+
+def test_incremental_build_matches_full_build():
+    ratings = random_ratings(seed=1)
+    previous, _ = build_model(ratings, neighbours=50, min_ratings=3, shrinkage=5)
+
+    users, movies, rates = ratings
+    rates = rates.copy()
+    rates[movies == 3] = 5.0
+    keep = movies != 8
+    ratings = users[keep], movies[keep], rates[keep]
+
+    full, _ = build_model(ratings, neighbours=50, min_ratings=3, shrinkage=5)
+    incremental, recomputed = build_model(
+        ratings, neighbours=50, min_ratings=3, shrinkage=5, previous=previous
+    )
+
+    assert recomputed == 1
+    assert incremental.movie_ids.tolist() == full.movie_ids.tolist()
+    np.testing.assert_array_equal(incremental.neighbours, full.neighbours)
+    np.testing.assert_allclose(incremental.scores, full.scores, rtol=1e-5)
+
+
+def test_unchanged_ratings_recompute_nothing():
+    ratings = random_ratings(seed=2)
+    previous, _ = build_model(ratings, neighbours=5)
+
+    _, recomputed = build_model(ratings, neighbours=5, previous=previous)
+
+    assert recomputed == 0
+
+
+def test_saved_model_is_memory_mapped(tmp_path):
+    model, _ = build_model(clustered_ratings(), neighbours=3, min_ratings=1)
+    save_model(model, tmp_path)
+    save_model(model, tmp_path)
+
+    loaded = load_model(tmp_path)
+
+    assert isinstance(loaded.neighbours, np.memmap)
+    assert loaded.params == model.params
+    assert loaded.similar(1) == model.similar(1)
+    assert len(list(tmp_path.glob("*.npy"))) == 5
+    assert load_model(tmp_path / "missing") is None
+
+
+@pytest.mark.django_db
+def test_read_ratings(rating, movie, user):
+    users, movies, rates = read_ratings()
+
+    assert (users.dtype, movies.dtype, rates.dtype) == (np.int32, np.int32, np.float32)
+    assert users.tolist() == [user.id]
+    assert movies.tolist() == [movie.id]
+    assert rates.tolist() == [8.0]
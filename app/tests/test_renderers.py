@@ -0,0 +1,27 @@
+from decimal import Decimal
+
+import pytest
+from rest_framework.renderers import JSONRenderer
+
+from app.renderers import FastJSONRenderer
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"results": [{"id": 1, "title": "Amélie", "rate": 7.5, "imdb_url": None}]},
+        {"count": 0, "next": None, "results": []},
+        {"line": "a\u2028b\u2029c", "quote": '"\\/\n'},
+        {"rate": Decimal("7.25"), 1995: [True, False]},
+    ],
+)
+def test_fast_json_renderer_matches_json_renderer(data):
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+def test_fast_json_renderer_indents_like_json_renderer():
+    data = {"results": [1, 2]}
+    media_type = "application/json; indent=2"
+    assert FastJSONRenderer().render(data, media_type) == JSONRenderer().render(
+        data, media_type
+    )
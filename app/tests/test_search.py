@@ -0,0 +1,55 @@
+import pytest
+
+from app.models import Movie
+from app.search import DatabaseSearchBackend, SQLiteFTSSearchBackend
+
+
+def search(backend, query):
+    return list(
+        backend.search(Movie.objects.all(), query).values_list("title", flat=True)
+    )
+
+
+@pytest.fixture
+def movies(create_movie):
+    create_movie(title="Star Wars", year=1977, genres="Action|Sci-Fi", tags="space")
+    create_movie(title="Star Trek", year=2009, genres="Sci-Fi", tags="star wars fans")
+    create_movie(title="Heat", year=1995, genres="Crime", tags="heist")
+
+
+@pytest.mark.django_db
+def test_fts_search_ranks_title_matches_first(movies):
+    backend = SQLiteFTSSearchBackend()
+    assert search(backend, "star wa") == ["Star Wars", "Star Trek"]
+    assert search(backend, "heis") == ["Heat"]
+    assert search(backend, '"; DROP TABLE app_movie --') == []
+
+
+@pytest.mark.django_db
+def test_fts_index_follows_movie_changes(movies):
+    backend = SQLiteFTSSearchBackend()
+    movie = Movie.objects.get(title="Heat")
+    movie.title = "Collateral"
+    movie.save()
+    assert search(backend, "heat") == []
+    assert search(backend, "collat") == ["Collateral"]
+
+    movie.delete()
+    assert search(backend, "collat") == []
+
+
+@pytest.mark.django_db
+def test_fts_rebuild(movies):
+    backend = SQLiteFTSSearchBackend()
+    Movie.objects.filter(title="Heat").update(tags="los angeles")
+    assert search(backend, "angeles") == []
+
+    assert backend.rebuild() == 3
+    assert search(backend, "angeles") == ["Heat"]
+
+
+@pytest.mark.django_db
+def test_database_search_backend(movies):
+    backend = DatabaseSearchBackend()
+    assert sorted(search(backend, "sci star")) == ["Star Trek", "Star Wars"]
+    assert search(backend, "") == []
@@ -0,0 +1,133 @@
+import asyncio
+
+import numpy as np
+import pytest
+from django.contrib.auth.models import User
+
+from app.models import DatasetFile, Movie, MovieGenre, MovieTag, Rating
+from app.snapshot import (
+    datetime_values,
+    encode_strings,
+    export_snapshot,
+    import_snapshot,
+    load_snapshot,
+    read_rating_arrays,
+)
+from app.utils.load_datasets import run
+
+MOVIE_COLUMNS = [
+    "id",
+    "title",
+    "year",
+    "genres",
+    "tags",
+    "imdb_id",
+    "tmdb_id",
+    "genre_mask",
+    "rate",
+    "rating_count",
+]
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "dataset"
+    path.mkdir()
+    (path / "movies.csv").write_text(
+        "movieId,title,genres\n"
+        '1,"Toy Story, The (1995)",Animation|Comedy\n'
+        "2,Amélie (2001),Romance\n"
+    )
+    (path / "tags.csv").write_text(
+        "userId,movieId,tag,timestamp\n1,1,pixar,1\n2,1,Funny,1\n"
+    )
+    (path / "links.csv").write_text("movieId,imdbId,tmdbId\n1,114709,862\n")
+    (path / "ratings.csv").write_text(
+        "userId,movieId,rating,timestamp\n"
+        "1,1,4.0,1427784002\n1,2,3.5,1427784003\n7,1,5.0,789652009\n"
+    )
+    asyncio.run(run(str(path)))
+    return path
+
+
+def snapshot_state():
+    return {
+        "movies": list(Movie.objects.order_by("id").values_list(*MOVIE_COLUMNS)),
+        "genres": sorted(MovieGenre.objects.values_list("movie_id", "genre__name")),
+        "tags": sorted(MovieTag.objects.values_list("movie_id", "tag__name")),
+        "ratings": sorted(
+            Rating.objects.values_list(
+                "user__username", "movie_id", "rate", "timestamp"
+            )
+        ),
+        "files": sorted(DatasetFile.objects.values_list("name", "digest", "chunks")),
+    }
+
+
+def test_encode_strings():
+    data, offsets = encode_strings(["Amélie", None, ""])
+
+    assert data.tobytes() == "Amélie".encode()
+    assert offsets.tolist() == [0, 7, 7, 7]
+
+
+@pytest.mark.django_db
+def test_datetime_values_match_the_stored_format():
+    assert datetime_values(np.array([789652009, 0])).tolist() == [
+        "1995-01-09 11:46:49",
+        "1970-01-01 00:00:00",
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_read_rating_arrays_in_batches(dataset, monkeypatch):
+    Rating.objects.create(
+        user=User.objects.create(username="alice"), movie_id=2, rate=1
+    )
+    monkeypatch.setattr("app.snapshot.FETCH_SIZE", 2)
+
+    arrays = read_rating_arrays()
+
+    assert {name: array.dtype for name, array in arrays.items()} == {
+        "rating_users": np.int32,
+        "rating_movies": np.int32,
+        "rating_rates": np.float32,
+        "rating_timestamps": np.int64,
+    }
+    assert sorted(zip(*(array.tolist() for array in arrays.values()))) == [
+        (1, 1, 4.0, 1427784002),
+        (1, 2, 3.5, 1427784003),
+        (7, 1, 5.0, 789652009),
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_import_snapshot_restores_the_export(dataset, tmp_path):
+    alice = User.objects.create(username="alice")
+    Rating.objects.create(user=alice, movie_id=2, rate=1.0)
+    Movie.rebuild_rates()
+    snapshot_dir = tmp_path / "snapshot"
+
+    counts = export_snapshot(snapshot_dir)
+
+    assert counts == {"movies": 2, "genre links": 3, "tag links": 2, "ratings": 3}
+    assert load_snapshot(snapshot_dir).meta["counts"] == counts
+    # The ratings of API users are left out, so the rates are recomputed.
+    Rating.objects.filter(user=alice).delete()
+    Movie.rebuild_rates()
+    expected = snapshot_state()
+
+    Movie.objects.all().delete()
+    DatasetFile.objects.all().delete()
+    import_snapshot(snapshot_dir)
+
+    assert snapshot_state() == expected
+    assert Movie.objects.get(id=2).title == "Amélie"
+    assert Movie.objects.get(id=2).imdb_id is None
+    assert Movie.objects.get(id=1).rate == 4.5
+
+
+@pytest.mark.django_db
+def test_import_snapshot_without_export(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        import_snapshot(tmp_path)
@@ -0,0 +1,45 @@
+import numpy as np
+
+from app.utils import arrays
+from app.utils.arrays import ColumnBuffer, load_arrays, save_arrays
+
+
+def load(directory):
+    return load_arrays(directory, "meta.json", ["values"], lambda meta, a: a["values"])
+
+
+def test_save_arrays_switches_to_the_new_version(tmp_path):
+    save_arrays(tmp_path, "meta.json", {"values": np.arange(3)}, {})
+    save_arrays(tmp_path, "meta.json", {"values": np.arange(5)}, {})
+
+    assert load(tmp_path).tolist() == [0, 1, 2, 3, 4]
+    assert len(list(tmp_path.glob("values.*.npy"))) == 1
+
+
+def test_save_arrays_never_goes_back_to_an_older_version(tmp_path, monkeypatch):
+    save_arrays(tmp_path, "meta.json", {"values": np.arange(5)}, {})
+    # A save that started before the previous one but finished after it.
+    monkeypatch.setattr(arrays.time, "time_ns", lambda: 1)
+    save_arrays(tmp_path, "meta.json", {"values": np.arange(3)}, {})
+
+    assert load(tmp_path).tolist() == [0, 1, 2, 3, 4]
+    assert len(list(tmp_path.glob("values.*.npy"))) == 1
+
+
+class Cursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+
+def test_column_buffer_fills_typed_columns():
+    buffer = ColumnBuffer([np.int32, np.float32], size=2)
+    buffer.fetch(Cursor([(1, 4.5), (2, 3.0), (3, 0.5)]), 2)
+
+    ids, rates = buffer.arrays()
+    assert (ids.dtype, rates.dtype) == (np.int32, np.float32)
+    assert ids.tolist() == [1, 2, 3]
+    assert rates.tolist() == [4.5, 3.0, 0.5]
@@ -0,0 +1,65 @@
+import pytest
+from django.db import connections
+
+from app.utils.database import set_pragmas
+
+
+@pytest.fixture
+def file_connection(db, tmp_path):
+    default = connections["default"]
+    settings_dict = {**default.settings_dict, "NAME": str(tmp_path / "db.sqlite3")}
+    file_connection = default.__class__(settings_dict)
+    yield file_connection
+    file_connection.close()
+
+
+def pragma(db_connection, name):
+    with db_connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA {name}")
+        return cursor.fetchone()[0]
+
+
+def test_new_connections_get_the_pragma_profile(file_connection):
+    file_connection.ensure_connection()
+
+    assert pragma(file_connection, "journal_mode") == "wal"
+    assert pragma(file_connection, "synchronous") == 1
+    assert pragma(file_connection, "busy_timeout") == 5000
+
+
+def test_set_pragmas_returns_the_previous_values(file_connection, settings):
+    previous = set_pragmas(settings.SQLITE_BULK_LOAD_PRAGMAS, file_connection)
+
+    assert pragma(file_connection, "synchronous") == 0
+    assert pragma(file_connection, "locking_mode") == "exclusive"
+    assert previous["synchronous"] == 1
+
+    set_pragmas(previous, file_connection)
+
+    assert pragma(file_connection, "journal_mode") == "wal"
+    assert pragma(file_connection, "synchronous") == 1
+    assert pragma(file_connection, "locking_mode") == "normal"
+
+
+def test_set_pragmas_releases_the_exclusive_lock(file_connection, settings):
+    other = file_connection.__class__(file_connection.settings_dict)
+    previous = set_pragmas(settings.SQLITE_BULK_LOAD_PRAGMAS, file_connection)
+    with file_connection.cursor() as cursor:
+        cursor.execute("CREATE TABLE t (id INTEGER)")
+
+    set_pragmas(previous, file_connection)
+
+    try:
+        with other.cursor() as cursor:
+            cursor.execute("INSERT INTO t VALUES (1)")
+    finally:
+        other.close()
+
+
+def test_set_pragmas_rejects_invalid_values(file_connection):
+    with pytest.raises(ValueError):
+        set_pragmas({"journal_mode": "WAL; DROP TABLE app_movie"}, file_connection)
+
+
+def test_in_memory_databases_are_left_alone(db):
+    assert set_pragmas({"journal_mode": "OFF"}) == {}
@@ -1,14 +1,40 @@
+import asyncio
+import csv
+import io
+import re
+import timeit
 import pytest
 import pandas as pd
 
-from app.models import Movie
+from contextlib import contextmanager
+from types import SimpleNamespace
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+
+from app.models import GENRE_BITS, DatasetFile, ImportCheckpoint, Movie, Rating, Tag
+from app.utils import load_datasets
+from app.utils.database import copy_frame
 from app.utils.load_datasets import (
+    PIPELINE,
+    Progress,
+    chunk_bytes,
+    map_users,
+    parse_range,
     process_movies,
     process_links,
+    process_ratings,
     process_tags,
+    rating_bucket_digests,
+    run,
+    split_csv,
+    sync_dataset,
     transform_title,
+    transform_titles,
 )
 
+ML_20M_MOVIES = settings.BASE_DIR / "datasets" / "ml-20m" / "movies.csv"
+
 
 @pytest.fixture
 def mock_data():
@@ -34,18 +60,102 @@ def mock_data():
         ('"Toy Story, The (1995)"', ("The Toy Story", "1995")),
         ('"Another Movie (1999)"', ("Another Movie", "1999")),
         ("Invalid Title", ("Invalid Title", None)),
+        (
+            "City of Lost Children, The (Cité des enfants perdus, La) (1995)",
+            ("The City of Lost Children (La Cité des enfants perdus)", "1995"),
+        ),
+        (
+            "Homme qui aimait les femmes, L' (1977)",
+            ("L'Homme qui aimait les femmes", "1977"),
+        ),
+        ("Grand Bleu, Le (1988)", ("Le Grand Bleu", "1988")),
+        ("Twin Peaks (1990-1991)", ("Twin Peaks", "1990")),
+        (
+            "Crouching Tiger, Hidden Dragon (Wo hu cang long) (2000)",
+            ("Crouching Tiger, Hidden Dragon (Wo hu cang long)", "2000"),
+        ),
+        ("Vitelloni, I (1953)", ("I Vitelloni", "1953")),
+        ("Welle, Die (2008)", ("Die Welle", "2008")),
+        # MovieLens only puts articles after a trailing comma, so an article that
+        # is also an English word is still moved. Pinned, not an accident.
+        ("Hello, I (1999)", ("I Hello", "1999")),
+        ("Love, Die (2000)", ("Die Love", "2000")),
+        ("Ocean's Eleven (11) (2001)", ("Ocean's Eleven (11)", "2001")),
+        ("Baby Geniuses (2)", ("Baby Geniuses (2)", None)),
+        ("Anniversary (1999))", ("Anniversary (1999))", None)),
     ],
 )
 def test_transform_title(title, expected):
     assert transform_title(title) == expected
 
 
+def previous_transform_title(title):
+    # transform_title before it moved to string methods, the benchmark baseline.
+    pattern = r'^(?:"?(.+), The \((\d{4})\)"?|"?([^"]+) \((\d{4})\)"?)$'
+    match = re.match(pattern, title)
+    if match:
+        if match.group(2):
+            return f"The {match.group(1)}", match.group(2)
+        return match.group(3), match.group(4)
+    return title, None
+
+
+def benchmark_titles():
+    """
+    The ml-20m titles when the dataset is downloaded, or as many in its shapes.
+    """
+    if ML_20M_MOVIES.exists():
+        return pd.read_csv(ML_20M_MOVIES)["title"].tolist()
+    shapes = 80 * ["{name} ({year})"] + 8 * ["{name}, The ({year})"]
+    shapes += 10 * ["{name} (Autre {name}, La) ({year})"]
+    shapes += ["{name} ({year}-)", "{name}"]
+    return [
+        shapes[index % len(shapes)].format(
+            name=f"Movie {index}", year=1900 + index % 120
+        )
+        for index in range(27000)
+    ]
+
+
+def test_transform_title_is_faster_than_the_regex():
+    titles = benchmark_titles()
+    times = {transform_title: [], previous_transform_title: []}
+    # Interleaved, so both see the same load and clock speed of the machine.
+    for _ in range(9):
+        for transform, runs in times.items():
+            runs.append(timeit.timeit(lambda: [transform(t) for t in titles], number=1))
+
+    ratio = min(times[transform_title]) / min(times[previous_transform_title])
+    # About 0.65, a ratio so the bound does not depend on the machine.
+    assert ratio < 0.9
+
+
+@pytest.mark.skipif(
+    not ML_20M_MOVIES.exists(), reason="the ml-20m dataset is not downloaded"
+)
+def test_transform_titles_of_ml_20m():
+    titles = pd.read_csv(ML_20M_MOVIES)["title"]
+
+    transformed = transform_titles(titles)
+
+    assert len(transformed) == len(titles) > 27000
+    assert transformed["year"].notna().mean() > 0.99
+    assert not transformed["title"].str.endswith(", The").any()
+
+
 @pytest.mark.django_db
 def test_process_movies(mock_data):
     process_movies(mock_data[["movieId", "title", "genres"]])
     assert Movie.objects.count() == 2
     assert Movie.objects.get(id=1).title == "The Toy Story"
 
+    movie = Movie.objects.get(id=1)
+    assert movie.genre_mask == GENRE_BITS["animation"] | GENRE_BITS["comedy"]
+    assert sorted(movie.genre_list.values_list("name", flat=True)) == [
+        "Animation",
+        "Comedy",
+    ]
+
 
 @pytest.mark.django_db
 def test_process_tags(mock_data):
@@ -71,3 +181,367 @@ def test_process_links(mock_data):
     assert movie_one.tmdb_id == "862"
     assert movie_two.imdb_id == "0113497"
     assert movie_two.tmdb_id == "8844"
+
+
+@pytest.mark.django_db
+def test_map_users():
+    users = map_users([7, 8])
+    assert set(users) == {7, 8}
+    assert not User.objects.get(id=users[7]).has_usable_password()
+
+    assert map_users([8, 9])[8] == users[8]
+    assert User.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_process_ratings():
+    movie = Movie.objects.create(id=1, title="Movie One")
+    chunk = pd.DataFrame(
+        {
+            "userId": [1, 1, 2, 2],
+            "movieId": [1, 4, 1, 1],
+            "rating": [3.5, 4.0, 5.0, 1.0],
+            "timestamp": [1112486027, 1112484676, 1112484819, 1112484727],
+        }
+    )
+
+    process_ratings(chunk)
+
+    # Unknown movies and duplicated (user, movie) pairs are skipped.
+    assert Rating.objects.count() == 2
+    rating = Rating.objects.get(user__username="movielens_1")
+    assert rating.rate == 3.5
+    assert rating.timestamp.timestamp() == 1112486027
+
+    # The per-row signal is skipped, rates are rebuilt in one pass.
+    movie.refresh_from_db()
+    assert movie.rating_count == 0
+    Movie.rebuild_rates()
+    movie.refresh_from_db()
+    assert movie.rate == 4.25
+
+
+@pytest.mark.django_db
+def test_process_tags_aggregates_unique_tags():
+    Movie.objects.create(id=1, title="Movie One")
+    chunk = pd.DataFrame(
+        {
+            "movieId": [1, 1, 1, 1, 2],
+            "tag": ["funny", "dark", "funny", None, "lost"],
+        }
+    )
+
+    process_tags(chunk)
+    assert Movie.objects.get(id=1).tags == "funny, dark"
+    assert sorted(Tag.objects.values_list("name", flat=True)) == ["dark", "funny"]
+    assert Movie.objects.get(id=1).tag_list.count() == 2
+    assert not Movie.objects.filter(id=2).exists()
+
+
+def test_split_csv(tmp_path):
+    file_path = tmp_path / "links.csv"
+    file_path.write_text(
+        "movieId,imdbId,tmdbId\n" + "".join(f"{i},{i},{i}\n" for i in range(100))
+    )
+
+    ranges = split_csv(file_path, chunk_bytes=64)
+    chunks = [parse_range(file_path, start, end, lambda x: x) for start, end in ranges]
+
+    assert len(ranges) > 1
+    assert sum(rows for rows, _ in chunks) == 100
+    assert pd.concat(frame for _, frame in chunks)["movieId"].tolist() == list(
+        range(100)
+    )
+    assert split_csv(file_path, chunk_bytes=None) == [
+        (ranges[0][0], file_path.stat().st_size)
+    ]
+    assert split_csv(file_path, chunk_bytes=64, start=ranges[1][0]) == ranges[1:]
+
+
+def test_chunk_bytes_fit_the_memory_budget(monkeypatch):
+    monkeypatch.setattr(load_datasets, "MAX_CHUNK_BYTES", 2**40)
+    ratings = PIPELINE[1][2]
+    budget = 1024**3
+
+    assert chunk_bytes(ratings, budget) * ratings.memory_factor <= budget
+    assert chunk_bytes(ratings, budget, workers=4) == pytest.approx(
+        chunk_bytes(ratings, budget) / 9, abs=1
+    )
+    assert chunk_bytes(ratings, 1) == load_datasets.MIN_CHUNK_BYTES
+    # Tags are read in one piece.
+    assert chunk_bytes(PIPELINE[1][0], budget) is None
+
+
+def test_progress_reports_rates_and_eta(monkeypatch):
+    stream = io.StringIO()
+    stages = []
+    monkeypatch.setattr(
+        load_datasets, "report_stage", lambda *args: stages.append(args[:2])
+    )
+    progress = Progress(interval=0, stream=stream)
+
+    progress.start("ratings.csv", 1000, done_bytes=200, rows=20)
+    progress.advance("ratings.csv", 30, 300)
+
+    line = stream.getvalue()
+    assert line.startswith("\rratings.csv: 50 rows, ")
+    assert re.search(r"[\d,]+ rows/s, [\d.]+ MB/s, 50%, ETA \d+s$", line)
+    assert progress.finish("ratings.csv") == 50
+    assert stages == [("ratings.csv", 50)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_pipelined(tmp_path):
+    (tmp_path / "movies.csv").write_text(
+        "movieId,title,genres\n"
+        '1,"Toy Story, The (1995)",Animation\n'
+        "2,Heat (1995),Action|Crime\n"
+    )
+    (tmp_path / "tags.csv").write_text(
+        "userId,movieId,tag,timestamp\n" "1,1,pixar,1\n" "2,1,funny,1\n"
+    )
+    (tmp_path / "links.csv").write_text(
+        "movieId,imdbId,tmdbId\n" "1,114709,862\n" "2,113277,949\n"
+    )
+    (tmp_path / "ratings.csv").write_text(
+        "userId,movieId,rating,timestamp\n" "1,1,4.0,1\n" "1,2,3.0,1\n" "2,1,5.0,1\n"
+    )
+
+    asyncio.run(run(str(tmp_path), workers=2))
+
+    toy_story = Movie.objects.get(id=1)
+    assert toy_story.title == "The Toy Story"
+    assert toy_story.tags == "pixar, funny"
+    assert toy_story.imdb_id == "0114709"
+    assert toy_story.rate == 4.5
+    assert Movie.objects.get(id=2).tmdb_id == "949"
+    assert Rating.objects.count() == 3
+
+
+def write_dataset(path, movies, ratings, links):
+    (path / "movies.csv").write_text("movieId,title,genres\n" + movies)
+    (path / "tags.csv").write_text("userId,movieId,tag,timestamp\n1,1,pixar,1\n")
+    (path / "links.csv").write_text("movieId,imdbId,tmdbId\n" + links)
+    (path / "ratings.csv").write_text("userId,movieId,rating,timestamp\n" + ratings)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_sync_applies_changes_and_keeps_user_ratings(tmp_path):
+    write_dataset(
+        tmp_path,
+        '1,"Toy Story, The (1995)",Animation\n2,Heat (1995),Action\n',
+        "1,1,4.0,1\n1,2,3.0,1\n2,1,5.0,1\n",
+        "1,114709,862\n2,113277,949\n",
+    )
+    asyncio.run(run(str(tmp_path)))
+    assert DatasetFile.objects.count() == 4
+
+    alice = User.objects.create(username="alice")
+    Rating.objects.create(user=alice, movie_id=2, rate=1.0)
+    api_movie = Movie.objects.create(title="Added Through The API", year=2020)
+
+    write_dataset(
+        tmp_path,
+        '1,"Toy Story, The (1995)",Animation\n3,Jumanji (1995),Adventure\n',
+        "1,1,2.0,1\n2,1,5.0,1\n3,3,4.0,1\n",
+        "1,114709,863\n3,113497,8844\n",
+    )
+    asyncio.run(run(str(tmp_path), sync=True))
+
+    # Heat left the dataset, with its ratings, the API movie stayed.
+    assert set(Movie.objects.values_list("id", flat=True)) == {1, 3, api_movie.id}
+    assert Movie.objects.get(id=3).genre_list.get().name == "Adventure"
+    assert Movie.objects.get(id=1).tmdb_id == "863"
+    assert Movie.objects.get(id=1).tags == "pixar"
+    assert Movie.objects.get(id=1).rate == 3.5
+    assert Rating.objects.count() == 3
+
+    Rating.objects.create(user=alice, movie_id=1, rate=1.0)
+    assert sync_dataset(tmp_path) == set()
+    assert Rating.objects.filter(user=alice).count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("workers", [0, 2])
+def test_run_resumes_an_interrupted_import(tmp_path, monkeypatch, workers):
+    ratings = "".join(
+        f"{user},{movie},4.0,1\n" for user in range(1, 21) for movie in (1, 2)
+    )
+    write_dataset(
+        tmp_path,
+        '1,"Toy Story, The (1995)",Animation\n2,Heat (1995),Action\n',
+        ratings,
+        "1,114709,862\n2,113277,949\n",
+    )
+    monkeypatch.setattr(load_datasets, "MIN_CHUNK_BYTES", 64)
+    saved = []
+
+    def save_ratings(frame):
+        if len(saved) == 3:
+            raise RuntimeError("interrupted")
+        load_datasets.save_ratings(frame)
+        saved.append(len(frame))
+
+    movies, (tags, links, ratings_stage) = PIPELINE
+    interrupted = [movies, [tags, links, ratings_stage._replace(save=save_ratings)]]
+    monkeypatch.setattr(load_datasets, "PIPELINE", interrupted)
+    with pytest.raises(RuntimeError):
+        asyncio.run(run(str(tmp_path), workers=workers, memory_budget=1))
+
+    checkpoint = ImportCheckpoint.objects.get(name="ratings.csv")
+    # Pipelined chunks may commit after a later one, past the checkpoint.
+    assert 0 < checkpoint.rows <= Rating.objects.count() < 40
+    assert checkpoint.offset < checkpoint.size
+    assert ImportCheckpoint.objects.get(name="movies.csv").rows == 2
+
+    monkeypatch.setattr(load_datasets, "PIPELINE", PIPELINE)
+    asyncio.run(run(str(tmp_path), workers=workers, memory_budget=1, resume=True))
+
+    assert Rating.objects.count() == 40
+    assert Movie.objects.get(id=1).rate == 4.0
+    assert Movie.objects.get(id=1).tags == "pixar"
+    assert not ImportCheckpoint.objects.exists()
+    assert DatasetFile.objects.count() == 4
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_does_not_resume_changed_files(tmp_path):
+    write_dataset(tmp_path, "1,Heat (1995),Action\n", "1,1,4.0,1\n", "1,1,1\n")
+    ImportCheckpoint.objects.create(name="movies.csv", size=1, mtime=0, offset=1)
+
+    with pytest.raises(ValueError, match="movies.csv changed"):
+        asyncio.run(run(str(tmp_path), resume=True))
+
+
+def test_rating_bucket_digests_ignore_row_order(tmp_path):
+    rows = [f"{user},{movie},3.5,1\n" for user in (1, 2, 1500) for movie in (1, 2)]
+    ordered, shuffled = tmp_path / "ordered.csv", tmp_path / "shuffled.csv"
+    ordered.write_text("userId,movieId,rating,timestamp\n" + "".join(rows))
+    shuffled.write_text("userId,movieId,rating,timestamp\n" + "".join(rows[::-1]))
+
+    digests = rating_bucket_digests(ordered)
+    assert digests == rating_bucket_digests(shuffled)
+    assert set(digests) == {"0", "1"}
+
+
+class PostgresStandIn:
+    """
+    The test database connection presented as PostgreSQL. COPY FROM STDIN is
+    emulated by parsing the CSV stream into INSERTs, so the staging and merge
+    statements of the PostgreSQL path really run.
+    """
+
+    vendor = "postgresql"
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.copies = []
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def cursor(self):
+        return StandInCursor(self, self.connection.cursor())
+
+
+class StandInCursor:
+    def __init__(self, db, cursor):
+        self.db = db
+        self.wrapped = cursor
+        self.cursor = self
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.wrapped.close()
+
+    @contextmanager
+    def copy(self, sql):
+        table, columns = re.match(r"COPY (\S+) \((.+)\) FROM STDIN", sql).groups()
+        stream = io.StringIO()
+        yield stream
+
+        rows = [
+            [None if value == r"\N" else value for value in row]
+            for row in csv.reader(io.StringIO(stream.getvalue()))
+        ]
+        placeholders = ", ".join(["%s"] * len(columns.split(",")))
+        self.wrapped.executemany(
+            f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows
+        )
+        self.db.copies.append(table)
+
+
+@pytest.fixture
+def postgres(monkeypatch):
+    stand_in = PostgresStandIn(connection)
+    monkeypatch.setattr("app.utils.load_datasets.connection", stand_in)
+    return stand_in
+
+
+@pytest.mark.django_db
+def test_postgres_path_copies_and_merges(postgres, mock_data):
+    Movie.objects.create(id=2, title="Another Movie", year=1999, tags="kept")
+
+    process_movies(mock_data[["movieId", "title", "genres"]])
+    process_tags(mock_data[["movieId", "tag"]])
+    process_links(mock_data[["movieId", "imdbId", "tmdbId"]])
+    process_ratings(
+        pd.DataFrame(
+            {
+                "userId": [1, 1, 2],
+                "movieId": [1, 3, 1],
+                "rating": [3.5, 4.0, 5.0],
+                "timestamp": [1112486027, 1112484676, 1112484819],
+            }
+        )
+    )
+
+    # Movies without a year are skipped, existing ones are left as they are.
+    assert sorted(Movie.objects.values_list("id", flat=True)) == [1, 2]
+    toy_story = Movie.objects.get(id=1)
+    assert (toy_story.year, toy_story.rate, toy_story.tags) == (1995, 0.0, "action")
+    assert toy_story.imdb_id == "0114709"
+    assert sorted(toy_story.genre_list.values_list("name", flat=True)) == [
+        "Animation",
+        "Comedy",
+    ]
+    assert list(toy_story.tag_list.values_list("name", flat=True)) == ["action"]
+    assert Movie.objects.get(id=2).tags == "kept"
+
+    rating = Rating.objects.get(user__username="movielens_1")
+    assert rating.rate == 3.5
+    assert rating.timestamp.timestamp() == 1112486027
+    assert Rating.objects.count() == 2
+
+    assert set(postgres.copies) == {
+        '"app_movie_stage"',
+        '"app_moviegenre_stage"',
+        '"app_movietag_stage"',
+        '"app_rating_stage"',
+    }
+
+
+def test_copy_frame_with_psycopg2_cursor():
+    class Psycopg2Cursor:
+        def copy_expert(self, sql, file):
+            self.sql, self.data = sql, file.read()
+
+    raw_cursor = Psycopg2Cursor()
+    cursor = SimpleNamespace(cursor=raw_cursor, db=connection)
+    frame = pd.DataFrame(
+        {"title": ["Heat", ""], "year": pd.Series([1995, None], dtype="Int64")}
+    )
+
+    copy_frame(cursor, '"app_movie_stage"', frame)
+
+    assert raw_cursor.sql == (
+        'COPY "app_movie_stage" ("title", "year") FROM STDIN '
+        "WITH (FORMAT csv, NULL '\\N')"
+    )
+    # Empty strings are unquoted empty values, which are not NULL with `NULL '\N'`.
+    assert raw_cursor.data == "Heat,1995\n,\\N\n"
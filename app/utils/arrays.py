@@ -0,0 +1,172 @@
+"""
+Versioned NumPy array files with a JSON metadata file, shared by the models and
+stores that are built offline and served memory-mapped.
+
+A save writes `<name>.<version>.npy` for every array, then atomically switches the
+metadata file to the new version, so a reader never sees a half written set. The
+switch holds a file lock: concurrent saves, from threads or processes, never move
+the metadata back to an older version, and only remove the files of versions older
+than the one they switched in. A load memory-maps the arrays of the current version
+and keeps the result per process until the metadata file changes.
+
+ColumnBuffer reads the columns of those arrays from the database.
+"""
+
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+_loaded = {}
+
+
+def rows_column(rows, index, dtype):
+    """
+    Column `index` of the database `rows`, as an array of `dtype`.
+    """
+    return np.fromiter((row[index] for row in rows), dtype, len(rows))
+
+
+class ColumnBuffer:
+    """
+    Typed columns filled from database rows batch by batch, so only one batch is
+    held as Python rows and no float64 copy of every row is made. Room for `size`
+    rows is allocated up front, and the columns grow when more rows arrive.
+    """
+
+    def __init__(self, dtypes, size=0):
+        self.columns = [np.empty(size, dtype) for dtype in dtypes]
+        self.length = 0
+
+    def extend(self, *values):
+        start, self.length = self.length, self.length + len(values[0])
+        if self.length > len(self.columns[0]):
+            size = max(self.length, 2 * len(self.columns[0]))
+            self.columns = [np.resize(column, size) for column in self.columns]
+        for column, value in zip(self.columns, values):
+            column[start : self.length] = value
+
+    def fetch(self, cursor, fetch_size):
+        """
+        Appends the remaining rows of `cursor`, `fetch_size` at a time.
+        """
+        while rows := cursor.fetchmany(fetch_size):
+            self.extend(
+                *(
+                    rows_column(rows, index, column.dtype)
+                    for index, column in enumerate(self.columns)
+                )
+            )
+
+    def arrays(self):
+        return tuple(column[: self.length] for column in self.columns)
+
+
+@contextmanager
+def file_lock(path):
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def try_file_lock(path):
+    """
+    The open file of `path`, locked, or None when the lock is held elsewhere.
+    Closing the file releases the lock, as does the end of the process.
+    """
+    lock_file = open(path, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def read_version(meta_path):
+    try:
+        return int(json.loads(meta_path.read_text())["version"])
+    except FileNotFoundError:
+        return None
+
+
+def array_versions(directory, name):
+    """
+    {version: path} of the saved files of the `name` array.
+    """
+    versions = {}
+    for path in directory.glob(f"{name}.*.npy"):
+        version = path.name[len(name) + 1 : -len(".npy")]
+        if version.isdigit():
+            versions[int(version)] = path
+    return versions
+
+
+def save_arrays(directory, meta_name, arrays, meta):
+    """
+    Write `arrays` under a new version and switch `meta_name` to it, then remove
+    the files of the older versions. When a newer version was switched in
+    meanwhile, the new files are removed instead.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    version = time.time_ns()
+
+    for name, array in arrays.items():
+        np.save(directory / f"{name}.{version}.npy", array)
+
+    meta_path = directory / meta_name
+    with file_lock(directory / f"{meta_name}.lock"):
+        current = read_version(meta_path)
+        if current is None or current < version:
+            temporary = directory / f"{meta_name}.tmp"
+            temporary.write_text(json.dumps({**meta, "version": str(version)}))
+            os.replace(temporary, meta_path)
+            current = version
+        for name in arrays:
+            for saved, path in array_versions(directory, name).items():
+                if saved < current:
+                    path.unlink(missing_ok=True)
+
+
+def load_arrays(directory, meta_name, names, factory):
+    """
+    `factory(meta, arrays)` of the memory-mapped `names` arrays of `directory`, or
+    None when nothing was saved there.
+    """
+    directory = Path(directory)
+    meta_path = directory / meta_name
+    key = (directory, meta_name)
+    while True:
+        try:
+            modified = meta_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        cached = _loaded.get(key)
+        if cached is not None and cached[0] == modified:
+            return cached[1]
+
+        meta = json.loads(meta_path.read_text())
+        version = meta.pop("version")
+        try:
+            arrays = {
+                name: np.load(directory / f"{name}.{version}.npy", mmap_mode="r")
+                for name in names
+            }
+        except FileNotFoundError:
+            # Removed by a newer save since the metadata was read, which switched
+            # the metadata first.
+            if meta_path.stat().st_mtime_ns == modified:
+                raise
+            continue
+        loaded = factory(meta, arrays)
+        _loaded[key] = (modified, loaded)
+        return loaded
@@ -0,0 +1,83 @@
+"""
+Database vendor specific helpers.
+
+SQLite:
+    Every new SQLite connection gets the `SQLITE_PRAGMAS` profile through the
+    `connection_created` signal, see app.signals. `load_datasets` switches its
+    connection to the `SQLITE_BULK_LOAD_PRAGMAS` profile for the duration of an
+    import and restores the previous values afterwards.
+
+PostgreSQL:
+    `copy_frame` streams a pandas DataFrame into a table with `COPY FROM STDIN`,
+    which `load_datasets` uses to fill its staging tables.
+"""
+
+import io
+import re
+
+from django.db import connection as default_connection
+
+
+def is_tunable(connection):
+    """
+    Pragmas only apply to file-backed SQLite databases.
+    """
+    return connection.vendor == "sqlite" and not connection.is_in_memory_db()
+
+
+def set_pragmas(pragmas, connection=default_connection):
+    """
+    Set the given {pragma: value} on the connection, in order, and return the
+    previous values in reverse order, so another call restores them: WAL cannot be
+    entered before leaving the EXCLUSIVE locking mode.
+    """
+    if not pragmas or not is_tunable(connection):
+        return {}
+
+    previous = {}
+    with connection.cursor() as cursor:
+        if "locking_mode" in pragmas:
+            # A WAL database first read in EXCLUSIVE mode can only leave it by
+            # leaving WAL, and the lock is only released by the next read.
+            cursor.execute("SELECT count(*) FROM sqlite_master")
+        for name, value in pragmas.items():
+            if not re.fullmatch(r"\w+", name) or not re.fullmatch(
+                r"[\w-]+", str(value)
+            ):
+                raise ValueError(f"Invalid pragma {name} = {value}")
+            cursor.execute(f"PRAGMA {name}")
+            row = cursor.fetchone()
+            if row is not None:
+                previous[name] = row[0]
+            cursor.execute(f"PRAGMA {name} = {value}")
+            # Some pragmas, such as journal_mode, answer with a row.
+            cursor.fetchall()
+        if "locking_mode" in pragmas:
+            cursor.execute("SELECT count(*) FROM sqlite_master")
+    return dict(reversed(previous.items()))
+
+
+def is_postgresql(connection=default_connection):
+    return connection.vendor == "postgresql"
+
+
+def copy_frame(cursor, table, frame):
+    """
+    Stream the rows of `frame` into the columns of the same names of `table` with
+    COPY FROM STDIN. Missing values are sent as `\\N`, so empty strings stay empty
+    strings. Works with psycopg 3 and psycopg2 cursors.
+    """
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False, na_rep=r"\N")
+
+    qn = cursor.db.ops.quote_name
+    columns = ", ".join(qn(column) for column in frame.columns)
+    sql = f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+
+    raw_cursor = cursor.cursor
+    if hasattr(raw_cursor, "copy"):
+        with raw_cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+    else:
+        buffer.seek(0)
+        raw_cursor.copy_expert(sql, buffer)
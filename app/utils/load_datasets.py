@@ -3,34 +3,143 @@ This script provides functionalities to import and process data from CSV files i
 specifically handling movies, their tags, and external links.
 
 Functions:
-    spinner:
-        Runs a simple CLI spinner indicating loading or processing status.
-
     transform_title(title: str):
         Transforms movie titles to a standardized format and extracts the year.
-        Handles titles formatted as "Title, The (Year)" and "Title (Year)".
+        Handles titles formatted as "Title, The (Year)" and "Title (Year)", the
+        TITLE_ARTICLES of other languages, alternate names in parentheses and series
+        years such as "(2007-)".
 
     process_movies(chunk: pd.DataFrame):
         `movies.csv:  [movieId, title,   genres]`
         Processes a chunk of movie data, transforming titles and saving to the database.
-        Uses bulk_create for efficient database insertion.
+        Movies without a year are skipped. Uses insert_rows for efficient database
+        insertion, and links the movies to their Genre rows and `genre_mask` bits.
+        Every `process_*` function is a `save_*(transform_*(chunk))` pair: the transform
+        is pure pandas and safe to run in a worker process, the save writes to the database.
+
+    insert_rows(model: Model, frame: pd.DataFrame):
+        Inserts the rows of `frame` from its column arrays, skipping conflicting rows,
+        without building model instances.
+
+    existing_movie_ids():
+        Returns the IDs of all movies in the database with a single query.
+
+    staging_table(cursor, model: Model, frame: pd.DataFrame, primary_key: str | None):
+        Context manager creating a temporary table for the columns of `frame` and
+        filling it, with `COPY FROM STDIN` on PostgreSQL.
+
+    copy_rows(model: Model, frame: pd.DataFrame):
+        PostgreSQL path of insert_rows: stages the rows with COPY and merges them with a
+        single `INSERT ... SELECT ... ON CONFLICT DO NOTHING`.
+
+    update_movies(frame: pd.DataFrame):
+        Sets the columns of `frame` on the movies of its index with a single set-based
+        UPDATE through a temporary table, `UPDATE ... FROM` on PostgreSQL.
+
+    save_names(model: Genre | Tag, link_model, movie_ids: pd.Series, names: pd.Series):
+        Links movies to Genre or Tag rows in bulk, creating the missing names first.
 
     process_tags(chunk: pd.DataFrame):
         'tags.csv:    [userId,  movieId, tag,    timestamp]'
         Aggregates tags for movies and updates the respective movie entries in the database.
+        Uses vectorized pandas transforms and a single set-based update per chunk, and links
+        the movies to their normalized Tag rows.
 
     process_links(chunk: pd.DataFrame):
         'links.csv:   [movieId, imdbId,  tmdbId]'
         Processes movie external link data and updates the movie entries with IMDb and TMDb IDs.
+        Uses vectorized pandas transforms and a single set-based update per chunk.
+
+    map_users(user_ids: list[int]):
+        Maps MovieLens user IDs to placeholder auth users, creating the missing ones in bulk.
+
+    process_ratings(chunk: pd.DataFrame):
+        'ratings.csv: [userId,  movieId, rating, timestamp]'
+        Bulk inserts a chunk of ratings without firing the per-row Rating signals.
+
+    split_csv(file_path: str, chunk_bytes: int | None, start: int | None):
+        Splits a CSV file into byte ranges ending on line breaks, from `start`.
+
+    parse_range(file_path: str, start: int, end: int, transform: Callable, dtype: dict):
+        Parses one byte range of a CSV file with the explicit column dtypes of its
+        stage and transforms it, in a worker process in the pipelined mode.
+
+    chunk_bytes(stage: Stage, memory_budget: int, workers: int):
+        Sizes the byte ranges of a stage so the chunks in memory at once fit in the
+        budget, from the peak memory per CSV byte of the stage.
+
+    Progress:
+        Reports the committed rows of the running stages with their rows/s, MB/s and
+        ETA, and the time of each finished stage.
+
+    Checkpoint:
+        Moves the ImportCheckpoint of a file past the committed chunks, in the
+        transaction that saves them.
+
+    import_stage(path: Path, stage: Stage, checkpoint, progress, memory_budget: int):
+        Imports the byte ranges of a file after its checkpoint, one transaction each.
 
-    import_csv(file_path: str, process_function: Callable):
-        Asynchronously processes a CSV file in chunks, applying the given processing function.
+    write_chunks(queue: asyncio.Queue, errors: list, progress: Progress):
+        The single writer, saving the transformed chunks of the queue one at a time.
 
-    run(dataset_path: str):
+    produce_chunks(file_path: Path, stage: Stage, checkpoint, executor, queue, in_flight, size):
+        Submits the byte ranges of a stage to the process pool and queues the results.
+
+    import_pipelined(path: Path, checkpoints, progress, workers: int, memory_budget: int):
+        Runs the PIPELINE with `workers` processes feeding a bounded queue, so parsing,
+        transforming and writing overlap and the stages of a group run concurrently.
+
+    report_stage(name: str, rows: int, start_time: float):
+        Prints the rows handled by a stage and the time it took.
+
+    start_checkpoints(path: Path, resume: bool):
+        Empties the tables and starts a checkpoint per file, or with `resume` picks up
+        the checkpoints of an interrupted import of the same files.
+
+    reset_tables():
+        Deletes all ratings, movies and the search index without loading the ratings
+        into memory.
+
+    reset_sequences():
+        Moves the ID sequences past the imported rows, on the databases using sequences.
+
+    fingerprint_file(file_path: Path, previous: DatasetFile | None):
+        Returns the size, mtime and SHA-256 of a file, reusing the previous digest when
+        the size and mtime did not move.
+
+    rating_bucket_digests(file_path: Path):
+        Returns an order independent digest of the ratings of each RATINGS_BUCKET_USERS
+        block of MovieLens user IDs.
+
+    sync_movies, sync_tags, sync_links, sync_ratings(file_path: Path, previous):
+        Diff a file against the database and apply only the inserts, updates and
+        deletes. Only the movies of the previous import and the ratings of the
+        MovieLens users are ever deleted, and only the changed rating buckets are read.
+
+    sync_dataset(path: Path):
+        Syncs the PIPELINE files whose fingerprint changed, each in one transaction
+        together with its new DatasetFile fingerprint.
+
+    finish_import():
+        Rebuilds the rates, the search index, the statistics store and the
+        autocomplete index after a full import, and resets the ID sequences. Shared
+        with the snapshot import of app.snapshot.
+
+    run(dataset_path: str, workers: int, sync: bool, memory_budget: int, resume: bool):
         Orchestrates the entire data loading and processing workflow.
-        Deletes existing Movie entries and sequentially processes movies, tags, and links CSV files.
+        Switches the connection to the SQLITE_BULK_LOAD_PRAGMAS profile until it is done.
+        Deletes existing Movie entries and processes the PIPELINE CSV files, sequentially
+        or pipelined when `workers` is set, in chunks sized for `memory_budget` bytes,
+        LOAD_MEMORY_BUDGET_MB by default. Each chunk commits with the checkpoint of its
+        file, and with `resume` an interrupted import continues after the last
+        committed chunks instead of starting over. Then computes the movie rates in one
+        set-based pass, rebuilds the search index in bulk, the statistics store and
+        the autocomplete index, reporting each stage's time.
+        Finally records the file fingerprints and expires the cached movie responses.
+        With `sync`, nothing is deleted up front: sync_dataset applies the changes and
+        only the touched movies get their rates and statistics recomputed.
 
-    load_data(dataset_path: str):
+    load_data(dataset_path: str, workers: int, sync: bool, memory_budget: int, resume: bool):
         Entry point to run the data import and processing routine.
 
 Usage:
@@ -39,138 +148,1253 @@ Usage:
 
     Example:
         load_data("path/to/ml-20m/dataset")
+        load_data("path/to/ml-20m/dataset", workers=4)
+        load_data("path/to/ml-20m/dataset", memory_budget=512 * 1024**2, resume=True)
+        load_data("path/to/ml-25m/dataset", sync=True)
 
 Constants:
-    CHUNK_SIZE (int): Defines the size of each chunk to read from CSV files.
+    PIPELINE (list): Groups of Stage to import, in order. Stages of a group only depend on
+        the previous groups.
+    CHUNK_SIZE (int): Defines the size of each chunk the sync reads from CSV files.
+    CHUNK_BYTES (int): Default size of the byte ranges of split_csv.
+    MIN_CHUNK_BYTES, MAX_CHUNK_BYTES (int): Bounds of the chunk sizes of chunk_bytes.
+    PROGRESS_INTERVAL (float): Seconds between two progress lines.
+    *_DTYPE (dict): Column dtypes of each file, 32 bits where the values fit.
+    RATINGS_BUCKET_USERS (int): MovieLens user IDs per fingerprinted block of ratings.
+    FINGERPRINT_BLOCK_BYTES (int): Read size when hashing a file.
+    MOVIELENS_USERNAME (str): Username pattern of the placeholder MovieLens users.
+    TITLE_ARTICLES (set): Leading articles MovieLens moves to the end of titles.
 """
 
+import io
 import re
+import sys
+import hashlib
 import time
 import itertools
-import threading
+import multiprocessing
+import django
 import pandas as pd
 import asyncio
 
+from contextlib import contextmanager
 from asgiref.sync import sync_to_async
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, NamedTuple
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models.constants import OnConflict
 from pathlib import Path
 
-from app.models import Movie
+from app.models import (
+    GENRE_BITS,
+    DatasetFile,
+    Genre,
+    ImportCheckpoint,
+    LeaderboardEntry,
+    Movie,
+    MovieGenre,
+    MovieTag,
+    Rating,
+    Tag,
+)
+from app.analytics import refresh_store
+from app.autocomplete import refresh_index
+from app.cache import invalidate_movies
+from app.search import get_search_backend
+from app.utils.database import copy_frame, is_postgresql, set_pragmas
 
 CHUNK_SIZE = 500_000
+CHUNK_BYTES = 4 * 1024 * 1024
+MIN_CHUNK_BYTES = 256 * 1024
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+PROGRESS_INTERVAL = 0.5
+RATINGS_BUCKET_USERS = 1000
+FINGERPRINT_BLOCK_BYTES = 1024 * 1024
+MOVIES_FILE = "movies.csv"
+RATINGS_FILE = "ratings.csv"
+MOVIELENS_USERNAME = "movielens_{}"
+# Leading articles MovieLens moves to the end of titles, "Matrix, The". Some are
+# also English words, "I" or "Die": MovieLens only writes an article after a
+# trailing comma, so "Vitelloni, I" wins over the rare English title ending so.
+TITLE_ARTICLES = {
+    *("The", "A", "An"),
+    *("Le", "La", "Les", "L'", "Un", "Une"),
+    *("Der", "Die", "Das", "Ein", "Eine"),
+    *("El", "Los", "Las", "Una"),
+    *("Il", "Lo", "Gli", "I", "Uno"),
+    *("O", "Os", "As"),
+    *("De", "Het", "Een", "Den", "Det", "En", "Ett"),
+}
+# The prefix of each article, "L'" is elided.
+TITLE_ARTICLE_PREFIXES = {
+    article: article if article.endswith("'") else f"{article} "
+    for article in TITLE_ARTICLES
+}
+TITLE_YEAR_RANGE = ("-", "\u2013")
+
 
+def move_article(name):
+    # "Matrix, The" becomes "The Matrix", other names are returned as they are.
+    head, _, article = name.rpartition(", ")
+    prefix = TITLE_ARTICLE_PREFIXES.get(article)
+    return prefix + head if prefix and head else name
 
-def spinner():
-    spinner = itertools.cycle(["-", "/", "|", "\\"])
-    while not done:
-        print(f"\r{next(spinner)} Loading...", end="", flush=True)
-        time.sleep(0.2)
+
+def move_articles(title):
+    # Moves the article of the name and of each alternate name in parentheses, such
+    # as "Cité des enfants perdus, La)". An article is only moved from the end of a
+    # name, before its closing parenthesis or the next opening one.
+    pieces = title.split("(")
+    for index, piece in enumerate(pieces):
+        end = piece.find(")")
+        name = piece.rstrip() if end < 0 else piece[:end]
+        moved = move_article(name)
+        if moved is not name:
+            pieces[index] = moved + piece[len(name) :]
+    return "(".join(pieces)
 
 
 def transform_title(title):
-    pattern = r'^(?:"?(.+), The \((\d{4})\)"?|"?([^"]+) \((\d{4})\)"?)$'
-    match = re.match(pattern, title)
-
-    if match:
-        # Check which pattern was matched
-        if match.group(2):
-            # "Title, The (Year)" pattern
-            return f"The {match.group(1)}", match.group(2)
-        else:
-            # "Title (Year)" pattern
-            return match.group(3), match.group(4)
+    # Titles are "Name (Year)", with the leading article moved to the end of the name,
+    # "Matrix, The (1999)", and optional alternate names in parentheses, which move
+    # their own article the same way: "City of Lost Children, The (Cité des enfants
+    # perdus, La) (1995)". Only string methods run, no regular expression.
+    if not isinstance(title, str):
+        return title, None
+
+    title = title.strip().strip('"').rstrip()
+    year = None
+    name, parenthesis, inner = title.rpartition("(")
+    # Series run over several years, "(2007-)" or "(1995-1998)".
+    if (
+        parenthesis
+        and inner[:4].isdigit()
+        and (inner[4:] == ")" or inner[4:5] in TITLE_YEAR_RANGE and inner[-1:] == ")")
+    ):
+        year = inner[:4]
+        title = name.rstrip()
 
-    return title, None  # Return the original title and None for the year if no match
+    if "(" in title:
+        title = move_articles(title)
+    elif ", " in title:
+        title = move_article(title)
+    return title, year
+
+
+def transform_titles(titles):
+    return pd.DataFrame(
+        [transform_title(title) for title in titles],
+        columns=["title", "year"],
+        index=titles.index,
+    )
+
+
+def transform_genre_masks(genres):
+    dummies = (
+        genres.fillna("")
+        .str.lower()
+        .str.replace(r"\s*,\s*", "|", regex=True)
+        .str.get_dummies("|")
+    )
+    masks = pd.Series(0, index=genres.index)
+    for genre in dummies.columns.intersection(list(GENRE_BITS)):
+        masks += dummies[genre] * GENRE_BITS[genre]
+    return masks
+
+
+def transform_movies(chunk):
+    titles = transform_titles(chunk["title"])
+    frame = pd.DataFrame(
+        {
+            "id": chunk["movieId"],
+            "title": titles["title"],
+            "year": pd.to_numeric(titles["year"]).astype("Int64"),
+            "genres": chunk["genres"],
+            "genre_mask": transform_genre_masks(chunk["genres"]),
+        }
+    )
+    # Movies without a year in their title are not imported.
+    return frame.dropna(subset=["year"])
+
+
+def save_movies(frame):
+    insert_rows(Movie, frame[["id", "title", "year", "genres", "genre_mask"]])
+    save_genres(frame)
+
+
+def save_genres(frame):
+    genres = frame.assign(
+        name=frame["genres"].fillna("").str.split(r"\s*[|,]\s*", regex=True)
+    ).explode("name")
+    save_names(Genre, MovieGenre, genres["id"], genres["name"])
 
 
 def process_movies(chunk):
-    movie_dicts = chunk.to_dict("records")
+    save_movies(transform_movies(chunk))
+
+
+def existing_movie_ids():
+    # One scan of the primary key index instead of an `id__in` with a parameter per
+    # row, which would also run into SQLite's bound parameter limit.
+    return list(Movie.objects.values_list("id", flat=True))
 
-    movies = []
-    for movie_dict in movie_dicts:
-        title, year = transform_title(movie_dict["title"])
 
-        movie = Movie(
-            id=movie_dict["movieId"],
-            title=title,
-            year=year,
-            genres=movie_dict["genres"],
+@contextmanager
+def staging_table(cursor, model, frame, primary_key=None):
+    # A temporary table typed after the model fields of the frame columns, filled with
+    # COPY on PostgreSQL and a single executemany elsewhere. rel_db_type is the plain
+    # column type, without serial sequences or check constraints.
+    qn = connection.ops.quote_name
+    stage_table = qn(f"{model._meta.db_table}_stage")
+    columns = ", ".join(
+        f"{qn(name)} {model._meta.get_field(name).rel_db_type(connection)}"
+        + (" PRIMARY KEY" if name == primary_key else "")
+        for name in frame.columns
+    )
+
+    cursor.execute(f"CREATE TEMPORARY TABLE {stage_table} ({columns})")
+    try:
+        if is_postgresql(connection):
+            copy_frame(cursor, stage_table, frame)
+        else:
+            placeholders = ", ".join(["%s"] * len(frame.columns))
+            rows = zip(*(frame[name].tolist() for name in frame.columns))
+            cursor.executemany(
+                f"INSERT INTO {stage_table} VALUES ({placeholders})", list(rows)
+            )
+        yield stage_table
+    finally:
+        cursor.execute(f"DROP TABLE {stage_table}")
+
+
+def default_fields(model, fields):
+    # The columns an INSERT of `fields` must fill with their model default.
+    return [
+        field
+        for field in model._meta.concrete_fields
+        if field not in fields
+        and not field.auto_created
+        and (field.has_default() or not field.null)
+    ]
+
+
+def column_values(column):
+    # Database-ready Python values of a frame column, with None for missing values.
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
+def insert_rows(model, frame):
+    # bulk_create(ignore_conflicts=True) from the column arrays of `frame`, without
+    # building a model instance and compiling an INSERT per batch. The columns are
+    # model field names and must hold database-ready values.
+    if is_postgresql(connection):
+        copy_rows(model, frame)
+        return
+
+    qn = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in frame.columns]
+    defaults = default_fields(model, fields)
+    columns = ", ".join(qn(field.column) for field in fields + defaults)
+    placeholders = ", ".join(["%s"] * (len(fields) + len(defaults)))
+    statement = connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)
+    suffix = connection.ops.on_conflict_suffix_sql(
+        fields, OnConflict.IGNORE, None, None
+    )
+    rows = zip(
+        *(column_values(frame[name]) for name in frame.columns),
+        *(
+            itertools.repeat(field.get_db_prep_save(field.get_default(), connection))
+            for field in defaults
+        ),
+    )
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f"{statement} {qn(model._meta.db_table)} ({columns}) "
+            f"VALUES ({placeholders}) {suffix}",
+            list(rows),
         )
-        movies.append(movie)
 
-    Movie.objects.bulk_create(movies, ignore_conflicts=True)
+
+def copy_rows(model, frame):
+    # PostgreSQL path of insert_rows: the rows are streamed into a staging table and
+    # merged with one INSERT ... ON CONFLICT. Rows with a NULL in a NOT NULL column are
+    # skipped, as SQLite's INSERT OR IGNORE does, and the other columns get their model
+    # defaults.
+    qn = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in frame.columns]
+    defaults = default_fields(model, fields)
+
+    targets = ", ".join(qn(field.column) for field in fields + defaults)
+    values = ", ".join(
+        [qn(name) for name in frame.columns]
+        + [f"CAST(%s AS {field.rel_db_type(connection)})" for field in defaults]
+    )
+    params = [
+        field.get_db_prep_save(field.get_default(), connection) for field in defaults
+    ]
+    required = " AND ".join(
+        f"{qn(name)} IS NOT NULL"
+        for name, field in zip(frame.columns, fields)
+        if not field.null
+    )
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        with staging_table(cursor, model, frame) as stage_table:
+            cursor.execute(
+                f"INSERT INTO {qn(model._meta.db_table)} ({targets}) "
+                f"SELECT {values} FROM {stage_table} "
+                f"WHERE {required or 'TRUE'} ON CONFLICT DO NOTHING",
+                params,
+            )
+
+
+def update_movies(frame):
+    # Stages the new values in a temporary table and applies them with one UPDATE,
+    # instead of the per-row CASE WHEN statements bulk_update builds.
+    qn = connection.ops.quote_name
+    movie_table = qn(Movie._meta.db_table)
+    fields = [Movie._meta.get_field(name) for name in frame.columns]
+    frame = frame.rename_axis("id").reset_index()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        with staging_table(cursor, Movie, frame, primary_key="id") as stage_table:
+            if is_postgresql(connection):
+                assignments = ", ".join(
+                    f"{qn(field.column)} = {stage_table}.{qn(field.name)}"
+                    for field in fields
+                )
+                cursor.execute(
+                    f"UPDATE {movie_table} SET {assignments} FROM {stage_table} "
+                    f"WHERE {movie_table}.id = {stage_table}.id"
+                )
+            else:
+                assignments = ", ".join(
+                    f"{qn(field.column)} = (SELECT {qn(field.name)} "
+                    f"FROM {stage_table} WHERE {stage_table}.id = {movie_table}.id)"
+                    for field in fields
+                )
+                cursor.execute(
+                    f"UPDATE {movie_table} SET {assignments} "
+                    f"WHERE id IN (SELECT id FROM {stage_table})"
+                )
+
+
+def save_names(model, link_model, movie_ids, names):
+    # Links movies to Genre or Tag rows in bulk, creating the missing names first.
+    pairs = pd.DataFrame({"movie_id": movie_ids.values, "name": names.values})
+    pairs = pairs[pairs["name"].notna() & (pairs["name"] != "")].drop_duplicates()
+    pairs = pairs[pairs["movie_id"].isin(existing_movie_ids())]
+
+    model.objects.bulk_create(
+        [model(name=name) for name in pairs["name"].unique()], ignore_conflicts=True
+    )
+    name_ids = dict(model.objects.values_list("name", "id"))
+
+    field = f"{model._meta.model_name}_id"
+    insert_rows(
+        link_model,
+        pd.DataFrame(
+            {"movie_id": pairs["movie_id"], field: pairs["name"].map(name_ids)}
+        ),
+    )
+
+
+def transform_tags(chunk):
+    chunk = (
+        chunk.dropna(subset=["tag"])
+        .astype({"tag": str})
+        .drop_duplicates(["movieId", "tag"])
+    )
+    names = chunk["tag"].str.strip().str.lower()
+    return pd.DataFrame(
+        {
+            "tags": chunk.groupby("movieId")["tag"].agg(", ".join),
+            "tag_names": names.groupby(chunk["movieId"]).agg(list),
+        }
+    )
+
+
+def save_tags(frame):
+    update_movies(frame[["tags"]])
+
+    names = frame["tag_names"].explode()
+    save_names(Tag, MovieTag, names.index.to_series(), names)
 
 
 def process_tags(chunk):
-    aggregated_tags = (
-        chunk.groupby("movieId")["tag"]
-        .apply(lambda x: ", ".join(set(x.astype(str))))
-        .reset_index()
+    save_tags(transform_tags(chunk))
+
+
+def transform_links(chunk):
+    links = pd.DataFrame(
+        {
+            "imdb_id": chunk["imdbId"].fillna(0).astype(int).astype(str).str.zfill(7),
+            "tmdb_id": chunk["tmdbId"].fillna(0).astype(int).astype(str),
+        }
+    ).set_index(chunk["movieId"])
+    return links[~links.index.duplicated(keep="last")]
+
+
+def process_links(chunk):
+    update_movies(transform_links(chunk))
+
+
+def map_users(user_ids):
+    usernames = {MOVIELENS_USERNAME.format(user_id): user_id for user_id in user_ids}
+    users = dict(
+        User.objects.filter(username__in=usernames).values_list("username", "id")
     )
 
-    movies_to_update = []
-    for _, row in aggregated_tags.iterrows():
-        movie_id, tags = row["movieId"], row["tag"]
+    missing = [username for username in usernames if username not in users]
+    if missing:
+        User.objects.bulk_create(
+            [
+                User(username=username, password=UNUSABLE_PASSWORD_PREFIX)
+                for username in missing
+            ],
+            ignore_conflicts=True,
+        )
+        users.update(
+            User.objects.filter(username__in=missing).values_list("username", "id")
+        )
+
+    return {usernames[username]: pk for username, pk in users.items()}
+
+
+def transform_ratings(chunk):
+    return pd.DataFrame(
+        {
+            "userId": chunk["userId"],
+            "movieId": chunk["movieId"],
+            "rating": chunk["rating"],
+            "timestamp": pd.to_datetime(chunk["timestamp"], unit="s", utc=True),
+        }
+    )
+
+
+def save_ratings(frame):
+    frame = frame[frame["movieId"].isin(existing_movie_ids())]
+    users = map_users(frame["userId"].unique().tolist())
+
+    # Neither path sends post_save, the rates are rebuilt once at the end.
+    if is_postgresql(connection):
+        ratings = pd.DataFrame(
+            {
+                "user_id": frame["userId"].map(users),
+                "movie_id": frame["movieId"],
+                "rate": frame["rating"],
+                "timestamp": frame["timestamp"],
+            }
+        )
+        copy_rows(Rating, ratings)
+        return
+
+    ratings = [
+        Rating(user_id=user_id, movie_id=movie_id, rate=rate, timestamp=timestamp)
+        for user_id, movie_id, rate, timestamp in zip(
+            frame["userId"].map(users),
+            frame["movieId"],
+            frame["rating"],
+            frame["timestamp"],
+        )
+    ]
+    Rating.objects.bulk_create(ratings, ignore_conflicts=True)
+
+
+def process_ratings(chunk):
+    save_ratings(transform_ratings(chunk))
+
+
+def split_csv(file_path, chunk_bytes=CHUNK_BYTES, start=None):
+    # Byte ranges of roughly `chunk_bytes` from `start`, the end of the header by
+    # default, each ending on a line break so every range parses on its own. Quoted
+    # fields must not span lines.
+    ranges = []
+    with open(file_path, "rb") as file:
+        size = file.seek(0, io.SEEK_END)
+        if start is None:
+            file.seek(0)
+            file.readline()
+            start = file.tell()
+        while start < size:
+            if chunk_bytes is None or start + chunk_bytes >= size:
+                end = size
+            else:
+                file.seek(start + chunk_bytes)
+                file.readline()
+                end = file.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parse_range(file_path, start, end, transform, dtype=None):
+    # Runs in the worker processes: parses one byte range and transforms it.
+    with open(file_path, "rb") as file:
+        header = file.readline()
+        file.seek(start)
+        data = file.read(end - start)
+
+    chunk = pd.read_csv(io.BytesIO(header + data), dtype=dtype)
+    return len(chunk), transform(chunk)
+
+
+def chunk_bytes(stage, memory_budget, workers=0):
+    # The size of the byte ranges of `stage` so the chunks held at once fit in
+    # `memory_budget` bytes: the one being saved, and in the pipelined mode one being
+    # parsed by each worker and as many queued.
+    if not stage.split:
+        return None
+    chunks = 2 * workers + 1
+    size = int(memory_budget / (chunks * stage.memory_factor))
+    return min(max(size, MIN_CHUNK_BYTES), MAX_CHUNK_BYTES)
+
+
+@dataclass
+class StageProgress:
+    start_time: float
+    total_bytes: int
+    done_bytes: int
+    rows: int
+    resumed_bytes: int = 0
+    resumed_rows: int = 0
+
+
+class Progress:
+    """
+    Reports the committed rows of the running stages on one line, at most every
+    `interval` seconds, with their rows/s, MB/s and the ETA from the bytes left. A
+    finished stage gets its report_stage line.
+    """
+
+    def __init__(self, interval=PROGRESS_INTERVAL, stream=None):
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        self.stages = {}
+        self.reported = 0.0
+        self.width = 0
+
+    def start(self, name, total_bytes, done_bytes=0, rows=0):
+        self.stages[name] = StageProgress(
+            time.time(), total_bytes, done_bytes, rows, done_bytes, rows
+        )
+
+    def advance(self, name, rows, size):
+        stage = self.stages[name]
+        stage.rows += rows
+        stage.done_bytes += size
+        now = time.time()
+        if now - self.reported >= self.interval:
+            self.reported = now
+            self.write(self.status(name, now))
+
+    def status(self, name, now=None):
+        stage = self.stages[name]
+        elapsed = max((now or time.time()) - stage.start_time, 1e-6)
+        rows_per_second = (stage.rows - stage.resumed_rows) / elapsed
+        bytes_per_second = (stage.done_bytes - stage.resumed_bytes) / elapsed
+        left = stage.total_bytes - stage.done_bytes
+        eta = f"{left / bytes_per_second:.0f}s" if bytes_per_second else "?"
+        return (
+            f"{name}: {stage.rows} rows, {rows_per_second:,.0f} rows/s, "
+            f"{bytes_per_second / 1024**2:.1f} MB/s, "
+            f"{stage.done_bytes / max(stage.total_bytes, 1):.0%}, ETA {eta}"
+        )
+
+    def write(self, line):
+        # Pads the line over the longer one it replaces.
+        print(f"\r{line:<{self.width}}", end="", file=self.stream, flush=True)
+        self.width = len(line)
+
+    def finish(self, name):
+        stage = self.stages.pop(name)
+        self.write("")
+        report_stage(name, stage.rows, stage.start_time)
+        return stage.rows
+
+
+def start_progress(progress, path, checkpoint):
+    record = checkpoint.record
+    header = len(read_header(path / record.name))
+    progress.start(
+        record.name, record.size - header, record.offset - header, record.rows
+    )
+
+
+def read_header(file_path):
+    with open(file_path, "rb") as file:
+        return file.readline()
+
+
+class Checkpoint:
+    """
+    The ImportCheckpoint of a file, moved forward in the transaction of each saved
+    chunk. Chunks may be saved out of order in the pipelined mode, the offset only
+    moves past the contiguous ones.
+    """
+
+    def __init__(self, record):
+        self.record = record
+        self.pending = {}
+
+    def commit(self, start, end, rows):
+        self.pending[start] = (end, rows)
+        offset, total = self.record.offset, self.record.rows
+        while offset in self.pending:
+            end, rows = self.pending.pop(offset)
+            offset, total = end, total + rows
+        if offset != self.record.offset:
+            ImportCheckpoint.objects.filter(pk=self.record.pk).update(
+                offset=offset, rows=total
+            )
+            self.record.offset, self.record.rows = offset, total
+
+
+def save_chunk(save, frame, checkpoint, start, end, rows):
+    with transaction.atomic():
+        save(frame)
+        checkpoint.commit(start, end, rows)
+
+
+def import_range(file_path, stage, checkpoint, start, end):
+    rows, frame = parse_range(file_path, start, end, stage.transform, stage.dtype)
+    save_chunk(stage.save, frame, checkpoint, start, end, rows)
+    return rows
+
+
+async def import_stage(path, stage, checkpoint, progress, memory_budget):
+    file_path = path / stage.file_name
+    for start, end in split_csv(
+        file_path, chunk_bytes(stage, memory_budget), checkpoint.record.offset
+    ):
+        rows = await sync_to_async(import_range)(
+            file_path, stage, checkpoint, start, end
+        )
+        progress.advance(stage.file_name, rows, end - start)
+
+
+async def write_chunks(queue, errors, progress):
+    while True:
+        stage, frame, checkpoint, start, end, rows = await queue.get()
         try:
-            movie = Movie.objects.get(id=movie_id)
-            movie.tags = tags
-            movies_to_update.append(movie)
-        except Movie.DoesNotExist:
-            continue
+            if not errors:
+                await sync_to_async(save_chunk)(
+                    stage.save, frame, checkpoint, start, end, rows
+                )
+                progress.advance(stage.file_name, rows, end - start)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            queue.task_done()
 
-    Movie.objects.bulk_update(movies_to_update, ["tags"])
 
+async def produce_chunks(
+    file_path, stage, checkpoint, executor, queue, in_flight, size
+):
+    loop = asyncio.get_running_loop()
+    ranges = split_csv(file_path, size, checkpoint.record.offset)
 
-def process_links(chunk):
-    chunk = chunk.copy()
-    chunk["imdbId"] = chunk["imdbId"].fillna(0).astype(int).astype(str).str.zfill(7)
-    chunk["tmdbId"] = chunk["tmdbId"].fillna(0).astype(int).astype(str)
-
-    movies_to_update = []
-    movie_ids = chunk["movieId"].tolist()
-    existing_movies = {
-        movie.id: movie for movie in Movie.objects.filter(id__in=movie_ids)
-    }
+    async def produce(start, end):
+        try:
+            rows, frame = await loop.run_in_executor(
+                executor,
+                parse_range,
+                file_path,
+                start,
+                end,
+                stage.transform,
+                stage.dtype,
+            )
+            # Blocks while the writer is behind, so parsed chunks do not pile up.
+            await queue.put((stage, frame, checkpoint, start, end, rows))
+        finally:
+            in_flight.release()
 
-    for _, row in chunk.iterrows():
-        movie_id = row["movieId"]
-        imdb_id = row["imdbId"]
-        tmdb_id = row["tmdbId"]
+    tasks = []
+    for start, end in ranges:
+        await in_flight.acquire()
+        tasks.append(asyncio.create_task(produce(start, end)))
+    await asyncio.gather(*tasks)
 
-        if movie_id in existing_movies:
-            movie = existing_movies[movie_id]
-            movie.imdb_id = imdb_id
-            movie.tmdb_id = tmdb_id
-            movies_to_update.append(movie)
 
-    Movie.objects.bulk_update(movies_to_update, ["imdb_id", "tmdb_id"])
+async def import_pipelined(path, checkpoints, progress, workers, memory_budget):
+    queue = asyncio.Queue(maxsize=workers)
+    in_flight = asyncio.Semaphore(workers)
+    errors = []
 
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, context, initializer=django.setup) as executor:
+        writer = asyncio.create_task(write_chunks(queue, errors, progress))
+        try:
+            for stages in PIPELINE:
+                for stage in stages:
+                    start_progress(progress, path, checkpoints[stage.file_name])
+                await asyncio.gather(
+                    *(
+                        produce_chunks(
+                            path / stage.file_name,
+                            stage,
+                            checkpoints[stage.file_name],
+                            executor,
+                            queue,
+                            in_flight,
+                            chunk_bytes(stage, memory_budget, workers),
+                        )
+                        for stage in stages
+                    )
+                )
+                # The next group only starts once the writer committed this one.
+                await queue.join()
+                if errors:
+                    raise errors[0]
+                for stage in stages:
+                    progress.finish(stage.file_name)
+        finally:
+            writer.cancel()
+
+
+def report_stage(name, rows, start_time):
+    print(f"\r{name}: {rows} rows in {round((time.time() - start_time), 1)} second")
+
+
+def start_checkpoints(path, resume=False):
+    # {file name: Checkpoint} of the PIPELINE files. Resuming keeps the rows an
+    # interrupted import committed, as long as the files did not change since.
+    # Otherwise the tables are emptied and every file starts after its header.
+    records = {record.name: record for record in ImportCheckpoint.objects.all()}
+    file_names = [stage.file_name for stages in PIPELINE for stage in stages]
+    if resume and records:
+        for name in file_names:
+            record = records.get(name)
+            stat = (path / name).stat()
+            if record is None or (record.size, record.mtime) != (
+                stat.st_size,
+                stat.st_mtime,
+            ):
+                raise ValueError(
+                    f"{name} changed since the interrupted import, "
+                    "load the dataset again without resuming."
+                )
+        return {name: Checkpoint(records[name]) for name in file_names}
+
+    if resume:
+        print("No interrupted import to resume, importing the whole dataset.")
+    reset_tables()
+    checkpoints = {}
+    for name in file_names:
+        file_path = path / name
+        stat = file_path.stat()
+        record = ImportCheckpoint.objects.create(
+            name=name,
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            offset=len(read_header(file_path)),
+        )
+        checkpoints[name] = Checkpoint(record)
+    return checkpoints
 
-async def import_csv(file_path, process_function):
+
+def reset_tables():
+    # Ratings are removed with a plain DELETE first, so the Movie cascade does not
+    # collect millions of Rating instances to send their post_delete signals.
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {Rating._meta.db_table}")
+        # Emptied up front so the per-movie index removals have nothing to do.
+        get_search_backend().clear()
+        Movie.objects.all().delete()
+        DatasetFile.objects.all().delete()
+        ImportCheckpoint.objects.all().delete()
+
+
+def reset_sequences():
+    # The movies keep their MovieLens IDs, so the ID sequences are moved past them on
+    # the databases that have sequences.
+    models = [Movie, Rating, Genre, Tag, MovieGenre, MovieTag, User]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+def fingerprint_file(file_path, previous=None):
+    # Size and mtime first, the content is only hashed when they moved, so an
+    # unchanged release is recognised without reading it.
+    stat = file_path.stat()
+    fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime}
+    if previous is not None and (previous.size, previous.mtime) == (
+        stat.st_size,
+        stat.st_mtime,
+    ):
+        return {**fingerprint, "digest": previous.digest}
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(FINGERPRINT_BLOCK_BYTES), b""):
+            digest.update(block)
+    return {**fingerprint, "digest": digest.hexdigest()}
+
+
+def rating_buckets(user_ids):
+    return user_ids // RATINGS_BUCKET_USERS
+
+
+def rating_bucket_digests(file_path):
+    # Order independent digests of the rows of each userId bucket: the sum of the
+    # row hashes, wrapping in uint64, and the row count.
+    sums, counts = {}, {}
     for chunk in pd.read_csv(file_path, chunksize=CHUNK_SIZE):
-        await sync_to_async(process_function)(chunk)
+        hashes = pd.util.hash_pandas_object(chunk, index=False)
+        grouped = hashes.groupby(rating_buckets(chunk["userId"]))
+        for bucket, total, count in zip(
+            grouped.sum().index, grouped.sum(), grouped.size()
+        ):
+            key = str(bucket)
+            sums[key] = (sums.get(key, 0) + int(total)) % 2**64
+            counts[key] = counts.get(key, 0) + int(count)
+    return {key: f"{counts[key]}:{sums[key]:016x}" for key in sums}
+
+
+def changed_index(new, old):
+    # The labels of both frames whose values differ in any column of `new`.
+    common = new.index.intersection(old.index)
+    new = new.loc[common].astype(object).where(new.loc[common].notna(), "")
+    old = old.loc[common, new.columns].astype(object)
+    old = old.where(old.notna(), "")
+    return common[(new.astype(str) != old.astype(str)).any(axis=1).to_numpy()]
+
+
+def dataset_movie_ids():
+    fingerprint = DatasetFile.objects.filter(name=MOVIES_FILE).first()
+    return pd.Index(fingerprint.keys if fingerprint else [], dtype="int64")
+
+
+def movie_values(*fields):
+    return pd.DataFrame.from_records(
+        Movie.objects.values_list("id", *fields), columns=["id", *fields]
+    ).set_index("id")
+
+
+def delete_links(link_model, movie_ids):
+    # Links are plain rows without signals, removed so save_names can relink.
+    link_model.objects.filter(movie_id__in=list(movie_ids)).delete()
+
+
+def sync_movies(file_path, previous):
+    columns = ["title", "year", "genres", "genre_mask"]
+    frame = transform_movies(pd.read_csv(file_path)).drop_duplicates("id", keep="last")
+    frame = frame.set_index("id")
+    existing = movie_values(*columns)
+
+    added = frame.index.difference(existing.index)
+    changed = changed_index(frame[columns], existing)
+    # Only movies a previous import created are deleted, never the ones added
+    # through the API.
+    imported = pd.Index(previous.keys if previous else [], dtype="int64")
+    removed = imported.difference(frame.index).intersection(existing.index)
+
+    insert_rows(Movie, frame.loc[added, columns].reset_index())
+    if len(changed):
+        update_movies(frame.loc[changed, columns])
+        delete_links(MovieGenre, changed)
+    save_genres(frame.loc[added.union(changed)].reset_index())
+    # Through the ORM so the search index follows, the ratings go first with a
+    # plain DELETE.
+    Rating.delete_movies(list(removed))
+    Movie.objects.filter(id__in=list(removed)).delete()
+
+    return Synced(
+        len(frame),
+        {*added, *changed, *removed},
+        keys=frame.index.tolist(),
+    )
+
+
+def sync_tags(file_path, previous):
+    frame = transform_tags(pd.read_csv(file_path))
+    existing = movie_values("tags")
+    existing = existing[existing.index.isin(dataset_movie_ids())]
+
+    tags = frame["tags"].reindex(existing.index)
+    changed = changed_index(tags.to_frame(), existing)
+    if len(changed):
+        update_movies(tags.loc[changed].fillna("").to_frame())
+        delete_links(MovieTag, changed)
+        names = frame["tag_names"].reindex(changed).dropna().explode()
+        save_names(Tag, MovieTag, names.index.to_series(), names)
+
+    return Synced(len(frame), set(changed))
+
 
+def sync_links(file_path, previous):
+    frame = transform_links(pd.read_csv(file_path))
+    existing = movie_values("imdb_id", "tmdb_id")
+    existing = existing[existing.index.isin(dataset_movie_ids())]
 
-async def run(dataset_path: str):
-    global done
-    done = False  # type: ignore[name-defined]
-    spinner_thread = threading.Thread(target=spinner)
+    # Dataset movies that lost their links are reset to NULL, as a fresh import
+    # would leave them.
+    links = frame.reindex(existing.index)
+    changed = changed_index(links, existing)
+    if len(changed):
+        links = links.loc[changed]
+        update_movies(links.astype(object).where(links.notna(), None))
 
+    return Synced(len(frame), set(changed))
+
+
+def movielens_users():
+    # {MovieLens user ID: auth user ID} of the placeholder users.
+    prefix = MOVIELENS_USERNAME.format("")
+    users = User.objects.filter(username__startswith=prefix).values_list(
+        "username", "id"
+    )
+    return {
+        int(username[len(prefix) :]): pk
+        for username, pk in users
+        if username[len(prefix) :].isdigit()
+    }
+
+
+def read_rating_buckets(file_path, buckets):
+    return pd.concat(
+        transform_ratings(chunk[rating_buckets(chunk["userId"]).isin(buckets)])
+        for chunk in pd.read_csv(file_path, chunksize=CHUNK_SIZE)
+    )
+
+
+def sync_rating_bucket(incoming, user_ids):
+    # Diffs the ratings of the MovieLens users of one bucket against the file and
+    # applies the inserts, updates and deletes. The ratings of real users are never
+    # read. Returns the touched movie IDs.
+    existing = pd.DataFrame.from_records(
+        Rating.objects.filter(user_id__in=user_ids).values_list(
+            "id", "user_id", "movie_id", "rate", "timestamp"
+        ),
+        columns=["id", "user_id", "movie_id", "rate", "timestamp"],
+    )
+    existing["timestamp"] = pd.to_datetime(existing["timestamp"], utc=True)
+
+    merged = incoming.merge(
+        existing,
+        on=["user_id", "movie_id"],
+        how="outer",
+        suffixes=("", "_old"),
+        indicator=True,
+    )
+    deleted = merged[merged["_merge"] == "right_only"]
+    upserted = merged[
+        (merged["_merge"] == "left_only")
+        | (
+            (merged["_merge"] == "both")
+            & (
+                (merged["rate"] != merged["rate_old"])
+                | (merged["timestamp"] != merged["timestamp_old"])
+            )
+        )
+    ]
+
+    Rating.objects.bulk_create(
+        [
+            Rating(user_id=user_id, movie_id=movie_id, rate=rate, timestamp=timestamp)
+            for user_id, movie_id, rate, timestamp in zip(
+                upserted["user_id"],
+                upserted["movie_id"],
+                upserted["rate"],
+                upserted["timestamp"],
+            )
+        ],
+        update_conflicts=True,
+        unique_fields=["user", "movie"],
+        update_fields=["rate", "timestamp"],
+    )
+    # A plain DELETE, the rates are rebuilt once at the end of the sync.
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {connection.ops.quote_name(Rating._meta.db_table)} "
+            "WHERE id = %s",
+            [(int(pk),) for pk in deleted["id"]],
+        )
+    return {*upserted["movie_id"].tolist(), *deleted["movie_id"].tolist()}
+
+
+def sync_ratings(file_path, previous):
+    digests = rating_bucket_digests(file_path)
+    known = previous.chunks if previous else {}
+    changed = sorted(
+        int(bucket)
+        for bucket in digests.keys() | known.keys()
+        if digests.get(bucket) != known.get(bucket)
+    )
+    rows = sum(int(digest.split(":")[0]) for digest in digests.values())
+    if not changed:
+        return Synced(rows, set(), chunks=digests)
+
+    frame = read_rating_buckets(file_path, changed)
+    frame = frame[frame["movieId"].isin(existing_movie_ids())].drop_duplicates(
+        ["userId", "movieId"], keep="last"
+    )
+    map_users(frame["userId"].unique().tolist())
+    users = movielens_users()
+    incoming = pd.DataFrame(
+        {
+            "user_id": frame["userId"].map(users),
+            "movie_id": frame["movieId"],
+            "rate": frame["rating"],
+            "timestamp": frame["timestamp"],
+            "bucket": rating_buckets(frame["userId"]),
+        }
+    )
+
+    user_ids = pd.Series(users)
+    user_id_buckets = rating_buckets(user_ids.index)
+    movie_ids = set()
+    for bucket in changed:
+        bucket_rows = incoming[incoming["bucket"] == bucket].drop(columns="bucket")
+        movie_ids |= sync_rating_bucket(
+            bucket_rows, user_ids[user_id_buckets == bucket].tolist()
+        )
+
+    return Synced(rows, movie_ids, chunks=digests)
+
+
+def record_fingerprints(path):
+    # After a full import: fingerprints for every file, so the next sync starts
+    # incremental, and the import has nothing left to resume.
+    DatasetFile.objects.all().delete()
+    ImportCheckpoint.objects.all().delete()
+    for stages in PIPELINE:
+        for stage in stages:
+            file_path = path / stage.file_name
+            fields = fingerprint_file(file_path)
+            if stage.file_name == MOVIES_FILE:
+                fields["keys"] = existing_movie_ids()
+            if stage.file_name == RATINGS_FILE:
+                fields["chunks"] = rating_bucket_digests(file_path)
+            DatasetFile.objects.create(name=stage.file_name, **fields)
+
+
+def sync_dataset(path):
+    # Applies only the changes of the PIPELINE files since their last import, each
+    # file in its own transaction with its new fingerprint. Returns the touched
+    # movie IDs.
+    fingerprints = {
+        fingerprint.name: fingerprint for fingerprint in DatasetFile.objects.all()
+    }
+    movie_ids = set()
+    for stages in PIPELINE:
+        for stage in stages:
+            stage_start = time.time()
+            file_path = path / stage.file_name
+            previous = fingerprints.get(stage.file_name)
+            fields = fingerprint_file(file_path, previous)
+
+            if previous is not None and previous.digest == fields["digest"]:
+                DatasetFile.objects.filter(pk=previous.pk).update(**fields)
+                print(f"\r{stage.file_name}: unchanged")
+                continue
+
+            with transaction.atomic():
+                synced = stage.sync(file_path, previous)
+                DatasetFile.objects.update_or_create(
+                    name=stage.file_name,
+                    defaults={
+                        **fields,
+                        "chunks": synced.chunks or {},
+                        "keys": synced.keys or [],
+                    },
+                )
+            movie_ids |= synced.movie_ids
+            report_stage(stage.file_name, synced.rows, stage_start)
+    return movie_ids
+
+
+def finish_sync(movie_ids):
+    stage_start = time.time()
+    Movie.rebuild_rates(list(movie_ids))
+    # Synced movies may be new or have new genres and years.
+    LeaderboardEntry.rebuild(list(movie_ids))
+    report_stage("rates", len(movie_ids), stage_start)
+
+    stage_start = time.time()
+    movies = get_search_backend().rebuild()
+    report_stage("search index", movies, stage_start)
+
+    stage_start = time.time()
+    store = refresh_store(movie_ids)
+    report_stage("statistics", len(store.movie_ids), stage_start)
+
+    stage_start = time.time()
+    index = refresh_index()
+    report_stage("autocomplete index", len(index.movie_ids), stage_start)
+
+    reset_sequences()
+    invalidate_movies()
+
+
+def finish_import():
+    # After every movie and rating is in: the rates, the search index, the
+    # statistics store and the autocomplete index, all rebuilt from scratch.
+    stage_start = time.time()
+    movies = Movie.rebuild_rates()
+    report_stage("rates", movies, stage_start)
+
+    stage_start = time.time()
+    movies = get_search_backend().rebuild()
+    report_stage("search index", movies, stage_start)
+
+    stage_start = time.time()
+    store = refresh_store()
+    report_stage("statistics", len(store.movie_ids), stage_start)
+
+    stage_start = time.time()
+    index = refresh_index()
+    report_stage("autocomplete index", len(index.movie_ids), stage_start)
+
+    reset_sequences()
+
+
+async def import_dataset(path, workers, memory_budget, resume=False):
+    checkpoints = await sync_to_async(start_checkpoints)(path, resume)
+    progress = Progress()
+    if workers:
+        await import_pipelined(path, checkpoints, progress, workers, memory_budget)
+    else:
+        for stages in PIPELINE:
+            for stage in stages:
+                checkpoint = checkpoints[stage.file_name]
+                start_progress(progress, path, checkpoint)
+                await import_stage(path, stage, checkpoint, progress, memory_budget)
+                progress.finish(stage.file_name)
+
+    await sync_to_async(finish_import)()
+    await sync_to_async(record_fingerprints)(path)
+    invalidate_movies()
+
+
+async def run(
+    dataset_path: str,
+    workers: int = 0,
+    sync: bool = False,
+    memory_budget: int | None = None,
+    resume: bool = False,
+):
     path = Path(dataset_path)
+    if memory_budget is None:
+        memory_budget = settings.LOAD_MEMORY_BUDGET_MB * 1024**2
 
-    await sync_to_async(Movie.objects.all().delete)()
+    # The sync commits a whole file at once and has no checkpoint to resume from,
+    # so it keeps the durable default profile.
+    previous_pragmas = await sync_to_async(set_pragmas)(
+        {} if sync else getattr(settings, "SQLITE_BULK_LOAD_PRAGMAS", {})
+    )
 
     start_time = time.time()
     try:
-        spinner_thread.start()
-        await import_csv(path / "movies.csv", process_movies)
-        await import_csv(path / "tags.csv", process_tags)
-        await import_csv(path / "links.csv", process_links)
+        if sync:
+            movie_ids = await sync_to_async(sync_dataset)(path)
+            if movie_ids:
+                await sync_to_async(finish_sync)(movie_ids)
+        else:
+            await import_dataset(path, workers, memory_budget, resume)
     finally:
-        done = True  # type: ignore[name-defined]
-        spinner_thread.join()
+        await sync_to_async(set_pragmas)(previous_pragmas)
 
     print(f"\n\nTotal Time: {round((time.time() - start_time), 1)} second")
 
 
-def load_data(dataset_path: str):
-    asyncio.run(run(dataset_path))
+class Stage(NamedTuple):
+    file_name: str
+    process: Callable
+    transform: Callable
+    save: Callable
+    sync: Callable
+    dtype: dict
+    # Peak memory of a parsed, transformed and saved chunk per byte of CSV.
+    memory_factor: int
+    split: bool = True
+
+
+class Synced(NamedTuple):
+    rows: int
+    movie_ids: set
+    # The DatasetFile fields, empty when None.
+    chunks: dict | None = None
+    keys: list | None = None
+
+
+MOVIES_DTYPE = {"movieId": "int32"}
+TAGS_DTYPE = {"userId": "int32", "movieId": "int32", "timestamp": "int64"}
+# IMDb and TMDb IDs may be missing.
+LINKS_DTYPE = {"movieId": "int32", "imdbId": "Int32", "tmdbId": "Int32"}
+RATINGS_DTYPE = {
+    "userId": "int32",
+    "movieId": "int32",
+    "rating": "float32",
+    "timestamp": "int64",
+}
+
+# Stages of a group only depend on the groups before them, so the pipelined mode
+# parses and writes them concurrently once the previous group is committed.
+PIPELINE = [
+    [
+        Stage(
+            MOVIES_FILE,
+            process_movies,
+            transform_movies,
+            save_movies,
+            sync_movies,
+            MOVIES_DTYPE,
+            memory_factor=24,
+        )
+    ],
+    [
+        # Tags are joined per movie in the order of the file, and saved with an UPDATE
+        # that replaces them, so the file is transformed in one piece whatever the
+        # memory budget: the chunks of the pipelined mode are saved out of order, and
+        # each would overwrite the tags of the others. The file is small, 17 MB in
+        # ml-20m, against 533 MB of ratings.
+        Stage(
+            "tags.csv",
+            process_tags,
+            transform_tags,
+            save_tags,
+            sync_tags,
+            TAGS_DTYPE,
+            memory_factor=12,
+            split=False,
+        ),
+        Stage(
+            "links.csv",
+            process_links,
+            transform_links,
+            update_movies,
+            sync_links,
+            LINKS_DTYPE,
+            memory_factor=16,
+        ),
+        Stage(
+            RATINGS_FILE,
+            process_ratings,
+            transform_ratings,
+            save_ratings,
+            sync_ratings,
+            RATINGS_DTYPE,
+            memory_factor=28,
+        ),
+    ],
+]
+
+
+def load_data(
+    dataset_path: str,
+    workers: int = 0,
+    sync: bool = False,
+    memory_budget: int | None = None,
+    resume: bool = False,
+):
+    asyncio.run(run(dataset_path, workers, sync, memory_budget, resume))
@@ -0,0 +1,94 @@
+"""
+Latency of the title autocomplete, the prefix index lookup alone and the whole
+`/api/v1/movies/autocomplete/` request through the WSGI application.
+
+The titles are synthetic, made of random words, and the queries are prefixes of
+their words of one to five characters.
+
+    python -m benchmarks.autocomplete --movies 60000 --requests 5000
+"""
+
+import argparse
+import os
+import random
+import string
+import time
+
+import django
+
+
+def percentiles(durations):
+    durations = sorted(durations)
+    return [
+        durations[min(int(len(durations) * share), len(durations) - 1)] * 1000
+        for share in (0.5, 0.99)
+    ]
+
+
+def create_titles():
+    from app.models import Movie
+
+    generator = random.Random(0)
+    words = [
+        "".join(generator.choices(string.ascii_lowercase, k=generator.randint(2, 9)))
+        for _ in range(5000)
+    ]
+    rows = list(Movie.objects.only("id", "year"))
+    seen = set()
+    for movie in rows:
+        title = None
+        # Titles are unique per year.
+        while title is None or (title, movie.year) in seen:
+            title = " ".join(generator.choices(words, k=generator.randint(1, 5)))
+        seen.add((title, movie.year))
+        movie.title = title
+        movie.rating_count = generator.randint(0, 5000)
+    Movie.objects.bulk_update(rows, ["title", "rating_count"], batch_size=1000)
+    return words
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--movies", type=int, default=60000)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.settings"
+    django.setup()
+    from app.autocomplete import get_index, refresh_index
+    from benchmarks.load_test import call_wsgi, create_database
+    from core.wsgi import application
+
+    create_database(args.movies)
+    words = create_titles()
+    started = time.perf_counter()
+    refresh_index()
+    print(
+        f"built the index of {args.movies} movies in "
+        f"{time.perf_counter() - started:.2f}s"
+    )
+
+    generator = random.Random(1)
+    queries = [
+        generator.choice(words)[: generator.randint(1, 5)] for _ in range(args.requests)
+    ]
+    index = get_index()
+    durations = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query)
+        durations.append(time.perf_counter() - started)
+    print("lookup   p50 {:.3f} ms  p99 {:.3f} ms".format(*percentiles(durations)))
+
+    durations = []
+    for query in queries:
+        status, duration = call_wsgi(
+            application, f"/api/v1/movies/autocomplete/?q={query}"
+        )
+        assert status == 200, status
+        durations.append(duration)
+    print("request  p50 {:.3f} ms  p99 {:.3f} ms".format(*percentiles(durations)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Synthetic MovieLens-shaped datasets for the benchmarks: `movies.csv`, `tags.csv`,
+`links.csv` and `ratings.csv` in the format `load_datasets` reads.
+
+The sizes follow the proportions of ml-20m from the number of ratings: about one
+movie per 740 ratings, one user per 145 and one tag per 43. Small datasets get at
+least one movie per 10 ratings, up to MIN_MOVIES, like ml-latest-small. Movie
+popularity and user activity are skewed like in MovieLens: a few movies get most of
+the ratings and a few users give most of them. The files only depend on the number
+of ratings and the seed, and are written in chunks of users, so 20M ratings do not
+need to fit in memory.
+
+    python -m benchmarks.generate --ratings 1m --dir /tmp/ml-1m
+"""
+
+import argparse
+import os
+import string
+from pathlib import Path
+
+import django
+import numpy as np
+import pandas as pd
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000, "20m": 20_000_000}
+RATINGS_PER_MOVIE = 740
+RATINGS_PER_USER = 145
+RATINGS_PER_TAG = 43
+MIN_MOVIES = 10_000
+# Ratings generated at once, the users of a chunk are disjoint from the others.
+CHUNK_RATINGS = 1_000_000
+TITLE_WORDS = 3000
+# Unix timestamps of the first and last ratings.
+FIRST_RATING = 789_652_009
+LAST_RATING = 1_427_784_002
+
+
+def parse_scale(value):
+    """
+    The number of ratings of a scale name such as `1m`, or of a plain number.
+    """
+    return SCALES[value.lower()] if value.lower() in SCALES else int(value)
+
+
+def dataset_sizes(ratings):
+    movies = max(ratings // RATINGS_PER_MOVIE, min(ratings // 10, MIN_MOVIES), 10)
+    return {
+        "ratings": ratings,
+        "movies": movies,
+        # A user rates at most half of the movies.
+        "users": max(ratings // RATINGS_PER_USER, -(-ratings // (movies // 2))),
+        "tags": max(ratings // RATINGS_PER_TAG, 10),
+    }
+
+
+def popularity(generator, count, exponent=1.1):
+    """
+    Sampling probabilities of `count` items in a random order, Zipf-like.
+    """
+    weights = 1 / np.arange(10, count + 10) ** exponent
+    generator.shuffle(weights)
+    return weights / weights.sum()
+
+
+def make_titles(generator, movies):
+    words = [
+        "".join(generator.choice(list(string.ascii_lowercase), size=size)).title()
+        for size in generator.integers(2, 10, size=TITLE_WORDS)
+    ]
+    years = generator.integers(1915, 2016, size=movies)
+    titles, seen = [], set()
+    for year in years:
+        name = " ".join(generator.choice(words, size=generator.integers(1, 5)))
+        title, sequel = name, 1
+        while (title, year) in seen:
+            sequel += 1
+            title = f"{name} {sequel}"
+        seen.add((title, year))
+        # MovieLens moves the leading article to the end.
+        if generator.random() < 0.1:
+            title = f"{title}, The"
+        titles.append(f"{title} ({year})")
+    return titles
+
+
+def write_movies(directory, generator, movies):
+    from app.models import GENRES
+
+    genres = np.array(GENRES[:-1])
+    genre_lists = [
+        "|".join(generator.choice(genres, size=size, replace=False))
+        for size in generator.integers(1, 4, size=movies)
+    ]
+    pd.DataFrame(
+        {
+            "movieId": np.arange(1, movies + 1),
+            "title": make_titles(generator, movies),
+            "genres": genre_lists,
+        }
+    ).to_csv(directory / "movies.csv", index=False)
+
+    pd.DataFrame(
+        {
+            "movieId": np.arange(1, movies + 1),
+            "imdbId": generator.integers(1, 9_999_999, size=movies),
+            "tmdbId": generator.integers(1, 999_999, size=movies),
+        }
+    ).to_csv(directory / "links.csv", index=False)
+
+
+def write_tags(directory, generator, sizes, movie_weights):
+    words = [
+        "".join(generator.choice(list(string.ascii_lowercase), size=size))
+        for size in generator.integers(3, 12, size=max(sizes["tags"] // 20, 10))
+    ]
+    count = sizes["tags"]
+    pd.DataFrame(
+        {
+            "userId": generator.integers(1, sizes["users"] + 1, size=count),
+            "movieId": generator.choice(sizes["movies"], size=count, p=movie_weights)
+            + 1,
+            "tag": generator.choice(words, size=count),
+            "timestamp": generator.integers(FIRST_RATING, LAST_RATING, size=count),
+        }
+    ).to_csv(directory / "tags.csv", index=False)
+
+
+def user_rating_counts(generator, sizes):
+    """
+    The number of ratings of each user, summing to about `sizes["ratings"]`.
+    """
+    activity = generator.lognormal(0, 1.2, size=sizes["users"])
+    limit = sizes["movies"] // 2
+    counts = np.clip(np.round(activity * sizes["ratings"] / activity.sum()), 1, limit)
+    # Hands the ratings cut from the most active users to the others.
+    for _ in range(10):
+        missing = sizes["ratings"] - counts.sum()
+        below = counts < limit
+        if missing <= 0 or not below.any():
+            break
+        scale = 1 + missing / counts[below].sum()
+        counts[below] = np.clip(np.round(counts[below] * scale), 1, limit)
+    return counts.astype(int)
+
+
+def write_ratings(directory, generator, sizes, movie_weights):
+    """
+    Ratings sorted by user like MovieLens, a movie rated at most once per user.
+    Returns the number of ratings written.
+    """
+    movie_means = generator.normal(3.5, 0.5, size=sizes["movies"])
+    counts = user_rating_counts(generator, sizes)
+    ends = np.cumsum(counts)
+    bounds = [
+        0,
+        *np.searchsorted(ends, np.arange(CHUNK_RATINGS, ends[-1], CHUNK_RATINGS)),
+        len(counts),
+    ]
+    path = directory / "ratings.csv"
+    written = 0
+    for chunk, (first, last) in enumerate(zip(bounds, bounds[1:])):
+        users = np.repeat(np.arange(first, last) + 1, counts[first:last])
+        movies = generator.choice(sizes["movies"], size=len(users), p=movie_weights)
+        # Draws the duplicate movies of a user again, the popular ones repeat.
+        for _ in range(20):
+            duplicated = pd.DataFrame({"user": users, "movie": movies}).duplicated()
+            if not duplicated.any():
+                break
+            movies[duplicated] = generator.choice(
+                sizes["movies"], size=duplicated.sum(), p=movie_weights
+            )
+        # Half stars between 0.5 and 5, around the mean of each movie.
+        rates = movie_means[movies] + generator.normal(0, 0.9, size=len(movies))
+        frame = pd.DataFrame(
+            {
+                "userId": users,
+                "movieId": movies + 1,
+                "rating": np.clip(np.round(rates * 2) / 2, 0.5, 5.0),
+                "timestamp": generator.integers(
+                    FIRST_RATING, LAST_RATING, size=len(movies)
+                ),
+            }
+        ).drop_duplicates(["userId", "movieId"])
+        frame.sort_values(["userId", "movieId"]).to_csv(
+            path, mode="a" if chunk else "w", header=not chunk, index=False
+        )
+        written += len(frame)
+    return written
+
+
+def generate(directory, ratings, seed=0):
+    """
+    Writes the dataset of about `ratings` ratings to `directory`, and returns its
+    sizes with the number of ratings written.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    generator = np.random.default_rng(seed)
+    sizes = dataset_sizes(ratings)
+
+    movie_weights = popularity(generator, sizes["movies"])
+    write_movies(directory, generator, sizes["movies"])
+    write_tags(directory, generator, sizes, movie_weights)
+    sizes["ratings"] = write_ratings(directory, generator, sizes, movie_weights)
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--ratings",
+        default="1m",
+        help=f"Number of ratings, or one of {', '.join(SCALES)}.",
+    )
+    parser.add_argument("--dir", required=True, help="Directory of the CSV files.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.settings"
+    django.setup()
+    sizes = generate(args.dir, parse_scale(args.ratings), args.seed)
+    print(", ".join(f"{count} {name}" for name, count in sizes.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Artificial latency of the database and of the movies cache, to load test the
+views as if they ran against a remote database or cache server.
+"""
+
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.backends.signals import connection_created
+
+# Seconds added to every database query and to every movies cache operation.
+latency = {"database": 0.0, "cache": 0.0}
+
+
+def delay(kind):
+    if latency[kind]:
+        time.sleep(latency[kind])
+
+
+def delay_query(execute, sql, params, many, context):
+    delay("database")
+    return execute(sql, params, many, context)
+
+
+def add_query_delay(sender, connection, **kwargs):
+    connection.execute_wrappers.append(delay_query)
+
+
+connection_created.connect(add_query_delay)
+
+
+class SlowLocMemCache(LocMemCache):
+    """
+    LocMemCache with one delay per operation, a batch counts as one round trip.
+    """
+
+    def get(self, *args, **kwargs):
+        delay("cache")
+        return super().get(*args, **kwargs)
+
+    def get_many(self, keys, version=None):
+        delay("cache")
+        get = super().get
+        values = {key: get(key, self._missing_key, version) for key in keys}
+        return {
+            key: value
+            for key, value in values.items()
+            if value is not self._missing_key
+        }
+
+    def set(self, *args, **kwargs):
+        delay("cache")
+        return super().set(*args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        delay("cache")
+        return super().add(*args, **kwargs)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        delay("cache")
+        for key, value in data.items():
+            super().set(key, value, timeout, version)
+        return []
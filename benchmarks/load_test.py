@@ -0,0 +1,274 @@
+"""
+Load test of the movie read endpoints: the sync MovieViewSet under WSGI against
+the async views under ASGI.
+
+No server process is started, the applications are called in process. The WSGI
+application is called from a pool of threads, like one gthread worker, and the
+ASGI application from concurrent tasks of one event loop, like one uvicorn worker.
+WSGI runs twice, with `--threads` threads and with one thread per request in
+flight, as the ASGI worker gives each sync request its own thread too: the
+difference between the two WSGI runs is the thread count, not async.
+Each scenario slows down the database or the movies cache, see benchmarks.latency:
+    slow-database: every response misses the cache and waits on its queries.
+    slow-cache: every response is a cache hit that waits on the cache round trips.
+
+    python -m benchmarks.load_test --movies 5000 --requests 2000 --threads 8
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from wsgiref.util import setup_testing_defaults
+
+import django
+
+SCENARIOS = {
+    "slow-database": {"database": 0.1, "cache": 0.0, "cached": False},
+    "slow-cache": {"database": 0.0, "cache": 0.05, "cached": True},
+}
+SERVERS = {
+    "wsgi": "/api/v1/movies/",
+    "asgi": "/api/v1/async/movies/",
+}
+
+
+def reset_database():
+    """
+    An empty, migrated database.
+    """
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connections
+
+    connections.close_all()
+    name = settings.DATABASES["default"]["NAME"]
+    for suffix in ["", "-wal", "-shm"]:
+        Path(f"{name}{suffix}").unlink(missing_ok=True)
+    call_command("migrate", verbosity=0)
+    # The loader switches the journal mode, which needs the only connection.
+    connections.close_all()
+
+
+def create_database(movies):
+    from django.db import connections
+
+    from app.models import GENRES, Movie, genre_mask
+
+    reset_database()
+
+    generator = random.Random(0)
+    rows = []
+    for pk in range(1, movies + 1):
+        genres = generator.sample(GENRES[:-1], 2)
+        rows.append(
+            Movie(
+                id=pk,
+                title=f"Movie {pk}",
+                year=generator.randint(1950, 2020),
+                genres=", ".join(genres),
+                genre_mask=genre_mask(genres),
+                rate=round(generator.uniform(1, 10), 1),
+                rating_count=generator.randint(0, 500),
+            )
+        )
+    Movie.objects.bulk_create(rows, batch_size=1000)
+    connections.close_all()
+
+
+def request_paths(prefix, requests, movies, cached):
+    """
+    An even mix of list pages and movie details. Without the cache, every path
+    gets a unique parameter so the responses are never served from it.
+    """
+    generator = random.Random(1)
+    pages = max(movies // 25, 1)
+    paths = []
+    for index in range(requests):
+        if index % 2:
+            path = f"{prefix}{generator.randint(1, movies)}/?"
+        else:
+            path = f"{prefix}?page={generator.randint(1, pages)}&"
+        paths.append(path if cached else f"{path}nocache={index}")
+    if cached:
+        # A small hot set, every request after the warm up is a cache hit.
+        paths = [paths[index % 50] for index in range(requests)]
+    return paths
+
+
+def call_wsgi(application, path):
+    path, _, query = path.partition("?")
+    environ = {"REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": query}
+    setup_testing_defaults(environ)
+    statuses = []
+
+    started = time.perf_counter()
+    result = application(environ, lambda status, headers: statuses.append(status))
+    try:
+        b"".join(result)
+    finally:
+        result.close()
+    return int(statuses[0].split()[0]), time.perf_counter() - started
+
+
+def run_wsgi(paths, threads, concurrency):
+    """
+    `concurrency` clients sending `paths` to a worker of `threads` threads. The
+    durations include the time spent waiting for a thread.
+    """
+    from core.wsgi import application
+
+    with ThreadPoolExecutor(threads) as worker:
+
+        def call(path):
+            started = time.perf_counter()
+            status, _ = worker.submit(call_wsgi, application, path).result()
+            return status, time.perf_counter() - started
+
+        with ThreadPoolExecutor(concurrency) as clients:
+            started = time.perf_counter()
+            results = list(clients.map(call, paths))
+    return results, time.perf_counter() - started
+
+
+async def call_asgi(application, path):
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": [(b"host", b"testserver")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            # The client never disconnects.
+            await asyncio.Future()
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    statuses = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    started = time.perf_counter()
+    await application(scope, receive, send)
+    return statuses[0], time.perf_counter() - started
+
+
+def runs(args):
+    """
+    (label, server, WSGI threads) of the runs of a scenario.
+    """
+    for threads in sorted({args.threads, args.concurrency}):
+        yield f"wsgi/{threads}", "wsgi", threads
+    yield "asgi", "asgi", None
+
+
+def run(server, paths, args, threads):
+    if server == "wsgi":
+        return run_wsgi(paths, threads, args.concurrency)
+    return run_asgi(paths, args.concurrency)
+
+
+def run_asgi(paths, concurrency):
+    """
+    `concurrency` clients sending `paths` to one event loop.
+    """
+    from core.asgi import application
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(path):
+            async with semaphore:
+                started = time.perf_counter()
+                status, _ = await call_asgi(application, path)
+                return status, time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(call(path) for path in paths))
+        return results, time.perf_counter() - started
+
+    return asyncio.run(run())
+
+
+def report(scenario, server, results, elapsed):
+    durations = sorted(duration for _, duration in results)
+    errors = sum(status != 200 for status, _ in results)
+    p95 = durations[int(len(durations) * 0.95) - 1]
+    print(
+        f"{scenario:<14} {server:<8} {len(results) / elapsed:>9.1f} "
+        f"{statistics.median(durations) * 1000:>9.1f} {p95 * 1000:>9.1f} {errors:>7}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--movies", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument(
+        "--threads", type=int, default=8, help="Threads of the first WSGI run."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=64,
+        help="Requests in flight at once, for both servers.",
+    )
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append")
+    parser.add_argument(
+        "--latency",
+        type=float,
+        help="Seconds added to each query or cache operation, instead of the "
+        "latency of the scenario.",
+    )
+    args = parser.parse_args()
+
+    os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.settings"
+    django.setup()
+    from django.core.cache import caches
+
+    from benchmarks.latency import latency
+
+    create_database(args.movies)
+    print(
+        f"{'scenario':<14} {'server':<8} {'req/s':>9} {'p50 ms':>9} "
+        f"{'p95 ms':>9} {'errors':>7}"
+    )
+    for scenario in args.scenario or SCENARIOS:
+        settings = dict(SCENARIOS[scenario])
+        if args.latency is not None:
+            kind = "cache" if settings["cached"] else "database"
+            settings[kind] = args.latency
+        for label, server, threads in runs(args):
+            for cache in caches.all():
+                cache.clear()
+            paths = request_paths(
+                SERVERS[server], args.requests, args.movies, settings["cached"]
+            )
+            warm_up = paths[:50] if settings["cached"] else paths[:10]
+            latency.update(database=0.0, cache=0.0)
+            run(server, warm_up, args, threads)
+            latency.update(database=settings["database"], cache=settings["cache"])
+            report(scenario, label, *run(server, paths, args, threads))
+            latency.update(database=0.0, cache=0.0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+CPU time of a `page_size=100` movie list request, with the field by field
+serialization and rendering of DRF against the `.values_list()` list serializer
+and the orjson renderer.
+
+Every request misses the response cache, and the requests run one at a time through
+the WSGI application, so the CPU time is the cost of one request.
+
+    python -m benchmarks.serialization --requests 300
+"""
+
+import argparse
+import os
+import time
+from contextlib import ExitStack
+from unittest import mock
+
+import django
+
+MODES = {
+    "drf": {"values": False, "orjson": False},
+    "values": {"values": True, "orjson": False},
+    "values+orjson": {"values": True, "orjson": True},
+}
+
+
+def patch_mode(stack, mode):
+    """
+    Switch the list serializer and the renderer of the movies API to `mode`.
+    """
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.serializers import ListSerializer
+
+    from app.api.v1.serializers.movies import MovieSerializer
+    from app.api.v1.views.movies import MovieViewSet
+
+    if not MODES[mode]["values"]:
+        stack.enter_context(
+            mock.patch.object(
+                MovieSerializer.Meta, "list_serializer_class", ListSerializer
+            )
+        )
+    if not MODES[mode]["orjson"]:
+        stack.enter_context(
+            mock.patch.object(MovieViewSet, "renderer_classes", [JSONRenderer])
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--movies", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.settings"
+    django.setup()
+    from benchmarks.load_test import call_wsgi, create_database
+    from core.wsgi import application
+
+    create_database(args.movies)
+    pages = max(args.movies // args.page_size, 1)
+    print(f"{'mode':<14} {'cpu ms':>8} {'req/s':>8}")
+    for mode in MODES:
+        with ExitStack() as stack:
+            patch_mode(stack, mode)
+            paths = [
+                f"/api/v1/movies/?page_size={args.page_size}"
+                f"&page={index % pages + 1}&nocache={mode}{index}"
+                for index in range(args.requests)
+            ]
+            for path in paths[:10]:
+                call_wsgi(application, path)
+
+            cpu, started = time.process_time(), time.perf_counter()
+            for path in paths:
+                status, _ = call_wsgi(application, path)
+                assert status == 200, status
+            cpu = time.process_time() - cpu
+            elapsed = time.perf_counter() - started
+            print(
+                f"{mode:<14} {cpu / len(paths) * 1000:>8.2f} "
+                f"{len(paths) / elapsed:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Settings of the benchmarks: a throwaway SQLite database and stores, and a movies
+cache whose operations can be slowed down, see `benchmarks.latency`.
+"""
+
+import os
+import tempfile
+
+from core.settings import *  # noqa: F401,F403
+
+DEBUG = False
+ALLOWED_HOSTS = ["*"]
+
+DATABASES["default"]["NAME"] = os.environ.get(  # noqa: F405
+    "LOAD_TEST_DATABASE", os.path.join(tempfile.gettempdir(), "load_test.sqlite3")
+)
+CACHES["movies"] = {  # noqa: F405
+    "BACKEND": "benchmarks.latency.SlowLocMemCache",
+    "LOCATION": "load-test",
+}
+STORES_DIR = os.path.join(tempfile.gettempdir(), "load_test_stores")
+ANALYTICS_STORE_DIR = os.path.join(STORES_DIR, "analytics")
+AUTOCOMPLETE_INDEX_DIR = os.path.join(STORES_DIR, "autocomplete")
+RECOMMENDER_MODEL_DIR = os.path.join(STORES_DIR, "recommender")
+METRICS_ENABLED = METRICS_SERVER_TIMING = True
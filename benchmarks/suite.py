@@ -0,0 +1,374 @@
+"""
+Benchmark suite of the dataset loader and of the API hot paths, with JSON results
+to compare against a baseline before a release.
+
+A run generates a synthetic dataset of `--ratings` ratings, see
+benchmarks.generate, and loads it into a fresh SQLite database with
+`load_datasets`, timing each stage. Each ENDPOINTS scenario is then sent
+`--requests` times through the Django test client from `--concurrency` threads.
+The latency percentiles, the throughput, and the SQL queries per request are read
+from the `Server-Timing` header of app.metrics. GET requests carry a unique
+parameter, so they never hit the response cache.
+
+    python -m benchmarks.suite --ratings 1m --output benchmarks/baselines/1m.json
+    python -m benchmarks.suite --ratings 1m --baseline benchmarks/baselines/1m.json
+
+With `--baseline`, the run fails when a time grew by more than `--tolerance`, or
+when an endpoint runs more queries or fails more requests than in the baseline. Baselines are only
+comparable on the same machine and scale.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import mock
+
+import django
+
+from benchmarks.generate import SCALES, generate, parse_scale
+
+RESULTS_VERSION = 1
+# Time changes below these are noise, whatever their ratio.
+MIN_STAGE_SECONDS = 0.05
+MIN_LATENCY_MS = 1.0
+# The mean queries move a little with the parameters each thread draws.
+MIN_QUERIES = 0.1
+
+
+def movie_list(sample):
+    return "GET", f"/api/v1/movies/?page={sample.page()}"
+
+
+def movie_filter(sample):
+    return "GET", f"/api/v1/movies/?genre={sample.genre()}&ordering=-rate"
+
+
+def movie_search(sample):
+    return "GET", f"/api/v1/movies/?search={sample.word()}"
+
+
+def movie_full_text_search(sample):
+    return "GET", f"/api/v1/movies/?q={sample.word()}"
+
+
+def movie_retrieve(sample):
+    return "GET", f"/api/v1/movies/{sample.movie()}/"
+
+
+def movie_autocomplete(sample):
+    return "GET", f"/api/v1/movies/autocomplete/?q={sample.word()[:3]}"
+
+
+def movie_rate(sample):
+    return "POST", f"/api/v1/movies/{sample.unrated_movie()}/rate/"
+
+
+ENDPOINTS = {
+    "list": movie_list,
+    "filter": movie_filter,
+    "search": movie_search,
+    "full-text-search": movie_full_text_search,
+    "retrieve": movie_retrieve,
+    "autocomplete": movie_autocomplete,
+    "rate": movie_rate,
+}
+
+
+class Sample:
+    """
+    Random request parameters drawn from the loaded movies. `unrated_movie` walks
+    the movies in order, the benchmark users never rated them.
+    """
+
+    def __init__(self, seed):
+        from app.models import GENRES, Movie
+
+        self.generator = random.Random(seed)
+        self.movie_ids = list(Movie.objects.order_by("id").values_list("id", flat=True))
+        self.words = sorted(
+            {
+                word
+                for title in Movie.objects.values_list("title", flat=True)[:5000]
+                for word in title.split()
+                if len(word) > 3 and word.isalpha()
+            }
+        )
+        self.genres = GENRES[:-1]
+        self.rated = 0
+
+    def page(self):
+        return self.generator.randint(1, max(len(self.movie_ids) // 25, 1))
+
+    def movie(self):
+        return self.generator.choice(self.movie_ids)
+
+    def word(self):
+        return self.generator.choice(self.words)
+
+    def genre(self):
+        return self.generator.choice(self.genres)
+
+    def unrated_movie(self):
+        self.rated += 1
+        return self.movie_ids[(self.rated - 1) % len(self.movie_ids)]
+
+
+def dataset(ratings, seed, data_dir):
+    """
+    The directory and sizes of the generated dataset, generated on the first run.
+    """
+    directory = Path(data_dir) / f"ratings-{ratings}-seed-{seed}"
+    sizes_path = directory / "sizes.json"
+    if not sizes_path.exists():
+        sizes = generate(directory, ratings, seed)
+        sizes_path.write_text(json.dumps(sizes))
+    return directory, json.loads(sizes_path.read_text())
+
+
+def run_loader(directory, workers):
+    """
+    Loads the dataset into a fresh database, returning the time of each stage.
+    """
+    from app.utils import load_datasets
+    from benchmarks.load_test import reset_database
+
+    reset_database()
+    stages = {}
+
+    def record_stage(name, rows, start_time):
+        stages[name] = {"rows": rows, "seconds": round(time.time() - start_time, 3)}
+
+    started = time.perf_counter()
+    with mock.patch.object(load_datasets, "report_stage", record_stage):
+        with redirect_stdout(io.StringIO()):
+            load_datasets.load_data(str(directory), workers)
+    return {"stages": stages, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def query_count(response):
+    for entry in response.get("Server-Timing", "").split(", "):
+        if entry.startswith("db;"):
+            return int(entry.split('desc="')[1].split()[0])
+    return None
+
+
+def run_endpoint(name, requests, concurrency, seed):
+    """
+    Sends `requests` requests of the `name` scenario from `concurrency` threads,
+    each with its own clients. GET requests are anonymous, the others are sent
+    with the token of a user of the thread.
+    """
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    build_request = ENDPOINTS[name]
+    local = threading.local()
+    users = iter(range(concurrency))
+    lock = threading.Lock()
+
+    def call(index):
+        if not hasattr(local, "client"):
+            with lock:
+                number = next(users)
+            user, _ = User.objects.get_or_create(username=f"benchmark_{number}")
+            token = RefreshToken.for_user(user).access_token
+            local.client = Client()
+            local.user_client = Client(headers={"Authorization": f"Bearer {token}"})
+            local.sample = Sample(seed * 1000 + number)
+
+        method, path = build_request(local.sample)
+        started = time.perf_counter()
+        if method == "POST":
+            response = local.user_client.post(path, {"rate": 7}, "application/json")
+        else:
+            separator = "&" if "?" in path else "?"
+            response = local.client.get(f"{path}{separator}nocache={index}")
+        duration = time.perf_counter() - started
+        return response.status_code, duration, query_count(response)
+
+    with ThreadPoolExecutor(concurrency) as threads:
+        list(threads.map(call, range(min(concurrency * 2, requests))))
+        started = time.perf_counter()
+        results = list(threads.map(call, range(requests)))
+        elapsed = time.perf_counter() - started
+
+    durations = sorted(duration * 1000 for _, duration, _ in results)
+    queries = [count for _, _, count in results if count is not None]
+
+    def percentile(share):
+        return round(durations[min(int(len(durations) * share), len(durations) - 1)], 3)
+
+    return {
+        "requests": len(results),
+        "errors": sum(status >= 400 for status, _, _ in results),
+        "throughput": round(len(results) / elapsed, 1),
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "queries": round(statistics.mean(queries), 2) if queries else None,
+        "max_queries": max(queries) if queries else None,
+    }
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "workers": args.workers,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+    }
+
+
+def compare(baseline, results, tolerance):
+    """
+    The (name, baseline, current, regressed) rows of the metrics both runs have.
+    """
+    rows = []
+
+    def check(name, old, new, minimum=0.0, higher_is_better=False, allowed=tolerance):
+        if old is None or new is None:
+            return
+        if higher_is_better:
+            regressed = new < old / (1 + allowed)
+        else:
+            regressed = new > old * (1 + allowed) and new - old > minimum
+        rows.append((name, old, new, regressed))
+
+    old_loader, new_loader = baseline["loader"], results["loader"]
+    for stage, old in old_loader["stages"].items():
+        new = new_loader["stages"].get(stage)
+        if new is not None:
+            check(
+                f"loader {stage} s", old["seconds"], new["seconds"], MIN_STAGE_SECONDS
+            )
+    check("loader total s", old_loader["seconds"], new_loader["seconds"])
+
+    for name, old in baseline["endpoints"].items():
+        new = results["endpoints"].get(name)
+        if new is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            check(f"{name} {metric}", old[metric], new[metric], MIN_LATENCY_MS)
+        check(
+            f"{name} req/s", old["throughput"], new["throughput"], higher_is_better=True
+        )
+        check(f"{name} queries", old["queries"], new["queries"], MIN_QUERIES, allowed=0)
+        check(f"{name} errors", old["errors"], new["errors"], allowed=0)
+    return rows
+
+
+def report(results):
+    print("\nloader")
+    for stage, timing in results["loader"]["stages"].items():
+        print(f"  {stage:<22} {timing['rows']:>10} rows {timing['seconds']:>9.2f} s")
+    print(f"  {'total':<22} {'':>15} {results['loader']['seconds']:>9.2f} s")
+
+    print(
+        f"\n{'endpoint':<18} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'queries':>8} {'errors':>7}"
+    )
+    for name, endpoint in results["endpoints"].items():
+        print(
+            f"{name:<18} {endpoint['throughput']:>8.1f} {endpoint['p50_ms']:>8.2f} "
+            f"{endpoint['p95_ms']:>8.2f} {endpoint['p99_ms']:>8.2f} "
+            f"{endpoint['queries']:>8} {endpoint['errors']:>7}"
+        )
+
+
+def report_comparison(rows):
+    print(f"\n{'metric':<30} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, old, new, regressed in rows:
+        change = f"{(new - old) / old:+.0%}" if old else ""
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<30} {old:>10} {new:>10} {change:>8}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--ratings",
+        default="100k",
+        help=f"Ratings of the dataset, or one of {', '.join(SCALES)}.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--data-dir",
+        default=os.path.join(tempfile.gettempdir(), "movielens-benchmarks"),
+        help="Where the generated datasets are kept between runs.",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=0, help="Processes of the pipelined loader."
+    )
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--endpoint", choices=ENDPOINTS, action="append")
+    parser.add_argument("--output", help="Path of the JSON results.")
+    parser.add_argument("--baseline", help="JSON results to compare with.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Relative slowdown allowed before a time is a regression.",
+    )
+    args = parser.parse_args()
+
+    os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.settings"
+    django.setup()
+
+    ratings = parse_scale(args.ratings)
+    directory, sizes = dataset(ratings, args.seed, args.data_dir)
+    results = {
+        "version": RESULTS_VERSION,
+        "scale": args.ratings,
+        "dataset": sizes,
+        "meta": metadata(args),
+        "loader": run_loader(directory, args.workers),
+        "endpoints": {
+            name: run_endpoint(name, args.requests, args.concurrency, args.seed)
+            for name in args.endpoint or ENDPOINTS
+        },
+    }
+    report(results)
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=2) + "\n")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        rows = compare(baseline, results, args.tolerance)
+        report_comparison(rows)
+        if any(regressed for *_, regressed in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
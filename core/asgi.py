@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+# Under ASGI the sync code of every request runs in its own thread, so persistent
+# connections are never reused and pile up. Django advises against them there.
+os.environ.setdefault("DATABASE_CONN_MAX_AGE", "0")
 
 application = get_asgi_application()
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
+
 from datetime import timedelta
 
 from pathlib import Path
@@ -49,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the metrics cover the time of every other middleware.
+    "app.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -83,8 +87,48 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "app.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
 }
 
+# Ranked full-text search of the `q` parameter on the movies endpoint.
+# Use "app.search.DatabaseSearchBackend" on databases without FTS5.
+MOVIE_SEARCH_BACKEND = "app.search.SQLiteFTSSearchBackend"
+
+# Item-item similarity model built by the `build_recommender` command.
+RECOMMENDER_MODEL_DIR = BASE_DIR / "database/recommender"
+
+# Columnar dataset statistics, rebuilt by `load_datasets` and `build_stats`.
+ANALYTICS_STORE_DIR = BASE_DIR / "database/analytics"
+
+# Title prefix index of the autocomplete endpoint, rebuilt by `load_datasets`.
+AUTOCOMPLETE_INDEX_DIR = BASE_DIR / "database/autocomplete"
+
+# Default directory of the `export_snapshot` and `import_snapshot` commands.
+SNAPSHOT_DIR = BASE_DIR / "database/snapshot"
+
+# Request metrics of app.metrics, on `/metrics` and in `Server-Timing` headers.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+METRICS_SERVER_TIMING = os.environ.get("METRICS_SERVER_TIMING", "1") == "1"
+# Addresses and networks allowed to read `/metrics` and to get `Server-Timing`
+# headers, which staff users also get. Matched on REMOTE_ADDR: behind a proxy on the
+# same host, list the networks of the clients the proxy forwards instead.
+METRICS_ALLOWED_IPS = [
+    network.strip()
+    for network in os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+    if network.strip()
+]
+# Queries at least this slow are counted, and this share of them is logged.
+METRICS_SLOW_QUERY_SECONDS = float(os.environ.get("METRICS_SLOW_QUERY_SECONDS", 0.1))
+METRICS_SLOW_QUERY_SAMPLE_RATE = float(
+    os.environ.get("METRICS_SLOW_QUERY_SAMPLE_RATE", 0.1)
+)
+
+# Weight, in ratings, of the leaderboard mean in the Bayesian average of a movie.
+LEADERBOARD_PRIOR_COUNT = 25
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
@@ -98,9 +142,80 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "database/db.sqlite3",
+        # Connections are reused across requests instead of opened per request. Under
+        # ASGI, core.asgi defaults DATABASE_CONN_MAX_AGE to 0.
+        "CONN_MAX_AGE": int(os.environ.get("DATABASE_CONN_MAX_AGE", 600)),
+        "CONN_HEALTH_CHECKS": True,
+    }
+}
+
+# PostgreSQL is used when POSTGRES_DB is set, `load_datasets` then loads through COPY.
+if os.environ.get("POSTGRES_DB"):
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ["POSTGRES_DB"],
+        "USER": os.environ.get("POSTGRES_USER", ""),
+        "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+        "HOST": os.environ.get("POSTGRES_HOST", ""),
+        "PORT": os.environ.get("POSTGRES_PORT", ""),
+        "CONN_MAX_AGE": DATABASES["default"]["CONN_MAX_AGE"],
+        "CONN_HEALTH_CHECKS": True,
     }
+
+# Applied to every new SQLite connection. WAL lets readers run while a rating is
+# written, and NORMAL synchronous is durable across application crashes in WAL mode.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -64000,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+
+# Used by `load_datasets` for the duration of an import, which starts by emptying
+# the tables. The journal stays on so each chunk commits atomically with its import
+# checkpoint, and `load_datasets --resume` continues after a crash of the process.
+# Without fsync, a crash of the machine may lose the last commits or corrupt the
+# database. The exclusive lock keeps other processes out until the import is done.
+SQLITE_BULK_LOAD_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "OFF",
+    "locking_mode": "EXCLUSIVE",
+    "cache_size": -512000,
+    "temp_store": "MEMORY",
 }
 
+# Memory in MB the chunks `load_datasets` holds at once are sized for, on top of the
+# memory of the process itself.
+LOAD_MEMORY_BUDGET_MB = int(os.environ.get("LOAD_MEMORY_BUDGET_MB", 512))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# The `movies` alias holds the movie list/retrieve responses. locmem is per process,
+# set a shared backend when running several workers, e.g.
+#   MOVIES_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+#   MOVIES_CACHE_LOCATION=/var/tmp/movies_cache
+# or
+#   MOVIES_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#   MOVIES_CACHE_LOCATION=redis://127.0.0.1:6379
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "movies": {
+        "BACKEND": os.environ.get(
+            "MOVIES_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("MOVIES_CACHE_LOCATION", "movies"),
+    },
+}
+
+MOVIES_CACHE_ALIAS = "movies"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
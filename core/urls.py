@@ -4,6 +4,7 @@ from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
+from app.metrics import metrics_view
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -21,6 +22,12 @@ urlpatterns = [
         include(
             [
                 path("movies/", include("app.api.v1.urls.movies")),
+                path("async/movies/", include("app.api.v1.urls.async_movies")),
+                path(
+                    "recommendations/",
+                    include("app.api.v1.urls.recommendations"),
+                ),
+                path("stats/", include("app.api.v1.urls.stats")),
                 path(
                     "auth/",
                     include(("app.api.v1.urls.auth", "auth"), namespace="auth"),
@@ -28,6 +35,7 @@ urlpatterns = [
             ]
         ),
     ),
+    path("metrics", metrics_view, name="metrics"),
     path("admin/", admin.site.urls),
     re_path(
         r"^swagger(?P<format>\.json|\.yaml)$",
@@ -0,0 +1,32 @@
+"""
+Gunicorn configuration of the image, `gunicorn -c gunicorn.conf.py`.
+
+By default every worker serves `core.wsgi` from a pool of `GUNICORN_THREADS`
+threads. With enough threads, this beats the async views at the same concurrency
+in benchmarks.load_test. `GUNICORN_ASGI=1` serves `core.asgi` from uvicorn workers
+instead: the async movie views of one event loop serve many requests while they
+wait on the database or the cache, and the sync views run in a thread per request.
+"""
+
+import multiprocessing
+import os
+
+asgi = os.environ.get("GUNICORN_ASGI", "0") == "1"
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+if asgi:
+    wsgi_app = "core.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "core.wsgi:application"
+    worker_class = "gthread"
+    threads = int(os.environ.get("GUNICORN_THREADS", 64))
+# A worker only runs Python on one core at a time.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = 30
+keepalive = 5
+# Recycle the workers to bound the growth of their memory.
+max_requests = 10_000
+max_requests_jitter = 1_000
+accesslog = "-"